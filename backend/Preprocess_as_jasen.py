@@ -1,12 +1,23 @@
 """
 Pre-compute all LST data locally and save as JSON files
 Run this ONCE locally, then deploy the JSON files with your backend
+Months are computed concurrently; re-running skips months that are already up to date
+Any month range can be computed, e.g. --start 2000-02 --end 2024-12 (MOD11A2 starts in Feb 2000)
 """
 
 import ee
+import argparse
+import hashlib
 import json
 import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from month_store import build_snapshot, month_label
+from lst_cube import NY_BBOX, CUBE_RESOLUTION, GRIDS_DIR, STATE_GEOMETRY_FILE, cube_shape, save_month_grid, build_cube
+from climatology import update_climatology
+from distributions import build_distributions
 
 # Initialize GEE locally
 def initialize_gee():
@@ -26,20 +37,33 @@ NY_GEOM = ee.FeatureCollection('TIGER/2018/States') \
     .geometry()
 
 # Months configuration
-MONTHS = [
-    {"label": "January 2024", "value": "2024-01", "start": "2024-01-01", "end": "2024-02-01"},
-    {"label": "February 2024", "value": "2024-02", "start": "2024-02-01", "end": "2024-03-01"},
-    {"label": "March 2024", "value": "2024-03", "start": "2024-03-01", "end": "2024-04-01"},
-    {"label": "April 2024", "value": "2024-04", "start": "2024-04-01", "end": "2024-05-01"},
-    {"label": "May 2024", "value": "2024-05", "start": "2024-05-01", "end": "2024-06-01"},
-    {"label": "June 2024", "value": "2024-06", "start": "2024-06-01", "end": "2024-07-01"},
-    {"label": "July 2024", "value": "2024-07", "start": "2024-07-01", "end": "2024-08-01"},
-    {"label": "August 2024", "value": "2024-08", "start": "2024-08-01", "end": "2024-09-01"},
-    {"label": "September 2024", "value": "2024-09", "start": "2024-09-01", "end": "2024-10-01"},
-    {"label": "October 2024", "value": "2024-10", "start": "2024-10-01", "end": "2024-11-01"},
-    {"label": "November 2024", "value": "2024-11", "start": "2024-11-01", "end": "2024-12-01"},
-    {"label": "December 2024", "value": "2024-12", "start": "2024-12-01", "end": "2025-01-01"}
-]
+DEFAULT_START = '2024-01'
+DEFAULT_END = '2024-12'
+
+def month_specs(start, end):
+    """Month specs (label, value, start/end dates) for an inclusive YYYY-MM range"""
+    year, month = map(int, start.split('-'))
+    end_year, end_month = map(int, end.split('-'))
+    specs = []
+    while (year, month) <= (end_year, end_month):
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        specs.append({
+            "label": month_label(f"{year}-{month:02d}"),
+            "value": f"{year}-{month:02d}",
+            "start": f"{year}-{month:02d}-01",
+            "end": f"{next_year}-{next_month:02d}-01"
+        })
+        year, month = next_year, next_month
+    return specs
+
+OUTPUT_DIR = "precomputed_data"
+
+# Bump when the computation changes so existing outputs are regenerated
+PIPELINE_VERSION = 2
+
+# Simplified sampling grid across NY (lat 41-44, lng -79 to -73)
+GRID_LATS = range(41, 45)
+GRID_LNGS = range(-79, -72)
 
 VIS_PARAMS = {
     'min': 0,
@@ -51,6 +75,99 @@ def lst_celsius(image):
     """Convert MODIS LST to Celsius"""
     return image.select('LST_Day_1km').multiply(0.02).subtract(273.15).rename('LST_C')
 
+def lst_celsius_qc(image):
+    """Convert MODIS LST to Celsius keeping good/marginal QC_Day pixels (same as app.py)"""
+    day_mask = image.select('QC_Day').bitwiseAnd(3).lte(1)
+    return lst_celsius(image).updateMask(day_mask)
+
+def fetch_lst_grid(image):
+    """Download a 1km LST image over the NY bounding box as a float32 grid (NaN = masked)"""
+    rows, cols = cube_shape(NY_BBOX, CUBE_RESOLUTION)
+    nodata = -9999
+    
+    pixels = ee.data.computePixels({
+        'expression': image.select('LST_C').toFloat().unmask(nodata),
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': {
+            'dimensions': {'width': cols, 'height': rows},
+            'affineTransform': {
+                'scaleX': CUBE_RESOLUTION,
+                'shearX': 0,
+                'translateX': NY_BBOX['west'],
+                'shearY': 0,
+                'scaleY': -CUBE_RESOLUTION,
+                'translateY': NY_BBOX['north']
+            },
+            'crsCode': 'EPSG:4326'
+        }
+    })
+    
+    grid = np.asarray(pixels['LST_C'], dtype=np.float32)
+    grid[grid <= nodata] = np.nan
+    return grid
+
+def sample_grid_points(image):
+    """Sample every grid point with one reduceRegions call instead of one getInfo() per cell"""
+    points = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([lng, lat]), {'lat': lat, 'lng': lng})
+        for lat in GRID_LATS
+        for lng in GRID_LNGS
+    ])
+    
+    sampled = image.select('LST_C').reduceRegions(
+        collection=points,
+        reducer=ee.Reducer.first().setOutputs(['LST_C']),
+        scale=1000
+    ).getInfo()
+    
+    grid_points = []
+    for feature in sampled['features']:
+        properties = feature['properties']
+        if properties.get('LST_C') is not None:
+            grid_points.append({
+                'lat': properties['lat'],
+                'lng': properties['lng'],
+                'temp': round(properties['LST_C'], 2)
+            })
+    
+    grid_points.sort(key=lambda p: (p['lat'], p['lng']))
+    return grid_points
+
+def month_fingerprint(month_spec):
+    """Hash of everything that determines a month's output"""
+    inputs = {
+        'version': PIPELINE_VERSION,
+        'month': month_spec,
+        'vis_params': VIS_PARAMS,
+        'grid': [list(GRID_LATS), list(GRID_LNGS)],
+        'cube': [NY_BBOX, CUBE_RESOLUTION]
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_existing_month(output_dir, month_spec):
+    """Previously computed month data if it is complete and up to date, else None"""
+    month_file = os.path.join(output_dir, f"{month_spec['value']}.json")
+    grid_file = os.path.join(output_dir, GRIDS_DIR, f"{month_spec['value']}.npy")
+    if not (os.path.exists(month_file) and os.path.exists(grid_file)):
+        return None
+    
+    try:
+        with open(month_file, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if data.get('input_fingerprint') != month_fingerprint(month_spec):
+        return None
+    return data
+
 def compute_month_data(month_spec):
     """Compute data for a single month"""
     print(f"\n📅 Processing {month_spec['label']}...")
@@ -72,6 +189,11 @@ def compute_month_data(month_spec):
         scaled = collection.map(lst_celsius)
         monthly_avg = scaled.mean().clip(NY_GEOM)
         
+        # Export the QC-masked composite grid for the local raster cube
+        print(f"  Exporting 1km grid...")
+        qc_avg = collection.map(lst_celsius_qc).mean()
+        save_month_grid(OUTPUT_DIR, month_spec['value'], fetch_lst_grid(qc_avg))
+        
         # Generate map tiles
         map_id = monthly_avg.getMapId(VIS_PARAMS)
         
@@ -89,29 +211,9 @@ def compute_month_data(month_spec):
             maxPixels=1e9
         ).getInfo()
         
-        # Sample points for time series (grid across NY)
+        # Sample points for time series (grid across NY) in a single request
         print(f"  Sampling grid points...")
-        grid_points = []
-        for lat in range(41, 45):  # Simplified grid
-            for lng in range(-79, -72):
-                point = ee.Geometry.Point([lng, lat])
-                try:
-                    sample = monthly_avg.sample(
-                        region=point,
-                        scale=1000,
-                        numPixels=1
-                    ).first()
-                    
-                    if sample:
-                        value = sample.get('LST_C').getInfo()
-                        if value is not None:
-                            grid_points.append({
-                                'lat': lat,
-                                'lng': lng,
-                                'temp': round(value, 2)
-                            })
-                except:
-                    pass
+        grid_points = sample_grid_points(monthly_avg)
         
         print(f"  ✅ Computed successfully")
         print(f"     Stats: Min={stats.get('LST_C_min', 0):.1f}°C, Max={stats.get('LST_C_max', 0):.1f}°C")
@@ -130,6 +232,7 @@ def compute_month_data(month_spec):
             },
             'grid_points': grid_points,
             'image_count': collection_size,
+            'input_fingerprint': month_fingerprint(month_spec),
             'computed_at': datetime.now().isoformat()
         }
         
@@ -137,46 +240,103 @@ def compute_month_data(month_spec):
         print(f"  ❌ Error: {str(e)}")
         return None
 
+def process_month(output_dir, month_spec):
+    """Compute and atomically save one month; returns (data, seconds)"""
+    started = time.perf_counter()
+    data = compute_month_data(month_spec)
+    if data:
+        month_file = os.path.join(output_dir, f"{month_spec['value']}.json")
+        write_json_atomic(month_file, data)
+        print(f"  Saved to {month_file}")
+    return data, round(time.perf_counter() - started, 2)
+
 def main():
     """Pre-compute all data and save to files"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('PRECOMPUTE_WORKERS', '4')),
+                        help='months computed concurrently')
+    parser.add_argument('--force', action='store_true',
+                        help='recompute months even if up-to-date output exists')
+    parser.add_argument('--start', default=DEFAULT_START, help='first month (YYYY-MM)')
+    parser.add_argument('--end', default=DEFAULT_END, help='last month (YYYY-MM, inclusive)')
+    args = parser.parse_args()
+    months = month_specs(args.start, args.end)
+    
     print("="*60)
     print("PRE-COMPUTING LST DATA FOR DEPLOYMENT")
     print("="*60)
     
     # Create output directory
-    output_dir = "precomputed_data"
+    output_dir = OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
     
+    # State boundary for ingest.py, so offline statistics cover the same region
+    geometry_file = os.path.join(output_dir, STATE_GEOMETRY_FILE)
+    if not os.path.exists(geometry_file):
+        write_json_atomic(geometry_file, NY_GEOM.getInfo())
+    
+    started = time.perf_counter()
     all_data = {}
-    successful = 0
-    
-    # Process each month
-    for month_spec in MONTHS:
-        data = compute_month_data(month_spec)
-        if data:
-            # Save individual month file
-            month_file = os.path.join(output_dir, f"{month_spec['value']}.json")
-            with open(month_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            
-            all_data[month_spec['value']] = data
-            successful += 1
-            print(f"  Saved to {month_file}")
+    timings = {}
+    skipped = []
+    pending = []
+    
+    # Resume: keep months whose output matches the current inputs
+    for month_spec in months:
+        existing = None if args.force else load_existing_month(output_dir, month_spec)
+        if existing:
+            all_data[month_spec['value']] = existing
+            skipped.append(month_spec['value'])
+            print(f"⏭️  {month_spec['label']} is up to date")
+        else:
+            pending.append(month_spec)
+    
+    # Process the remaining months concurrently (EE calls are I/O bound)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(process_month, output_dir, spec): spec for spec in pending}
+        for future in as_completed(futures):
+            month_spec = futures[future]
+            try:
+                data, seconds = future.result()
+            except Exception as e:
+                print(f"  ❌ {month_spec['label']} failed: {e}")
+                continue
+            timings[month_spec['value']] = seconds
+            if data:
+                all_data[month_spec['value']] = data
+    
+    successful = len(all_data)
     
     # Save summary file
     summary = {
         'generated_at': datetime.now().isoformat(),
-        'total_months': len(MONTHS),
+        'total_months': len(months),
         'successful': successful,
-        'months': list(all_data.keys())
+        'months': sorted(all_data.keys()),
+        'skipped': skipped,
+        'workers': args.workers,
+        'timings_seconds': dict(sorted(timings.items())),
+        'wall_clock_seconds': round(time.perf_counter() - started, 2)
     }
     
-    summary_file = os.path.join(output_dir, "summary.json")
-    with open(summary_file, 'w') as f:
-        json.dump(summary, f, indent=2)
+    write_json_atomic(os.path.join(output_dir, "summary.json"), summary)
+    
+    # Compact binary snapshot of every month on disk (not just this run's range)
+    build_snapshot(output_dir)
+    
+    # Assemble the memory-mapped cube served by app.py
+    cube_meta = build_cube(output_dir)
+    if cube_meta:
+        print(f"🧊 LST cube: {len(cube_meta['months'])} months, {cube_meta['rows']}x{cube_meta['cols']} pixels")
+    
+    # Fold newly computed months into the per-pixel normals (only new months are read)
+    update_climatology(output_dir)
+    # Per-month histograms and quantile sketches for /api/distribution
+    build_distributions(output_dir)
     
     print("\n" + "="*60)
-    print(f"✅ COMPLETE! Pre-computed {successful}/{len(MONTHS)} months")
+    print(f"✅ COMPLETE! Pre-computed {successful}/{len(months)} months ({len(skipped)} already up to date)")
+    print(f"⏱️  Wall clock: {summary['wall_clock_seconds']}s")
     print(f"📁 Data saved to: {output_dir}/")
     print("\nNext steps:")
     print("1. Add the 'precomputed_data' folder to your Flask project")
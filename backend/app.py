@@ -1,71 +1,140 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, g
 from flask_cors import CORS
-import json
+import atexit
+import gc
+import hmac
+import math
 import os
-import glob
-import ee
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import numpy as np
 from datetime import datetime
-from functools import lru_cache
-import random
+from lst_cube import LSTCube, CUBE_FILE
+from ee_sampling import create_sampler
+from micro_batch import PointBatcher
+from result_cache import create_result_cache, MISSING
+from estimation import estimate_pixel_value, estimate_pixel_values
+from tiles import create_tile_service, MIN_ZOOM, MAX_ZOOM
+from spatial_index import PointIndex
+from month_store import MonthStore, MONTH_PATTERN, month_label
+from static_responses import ResponseCache, columnar_grid_points
+from circuit_breaker import CircuitBreaker, Deadline
+from zonal import MaskCache, zonal_stats
+from climatology import Climatology
+from distributions import Distributions
+from metrics import REGISTRY, TRACE_HEADER, span, start_trace, end_trace, with_context
+from hot_reload import DataWatcher, invalidatable_lru_cache
+from cache_warmer import HotSet, CacheWarmer
+from export import FORMATS, grid_size, grid_blocks, coordinate_blocks, stream_export
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize Earth Engine
-EE_INITIALIZED = False
+DATA_DIR = os.getenv('LST_DATA_DIR', 'precomputed_data')
+# Set by gunicorn.conf.py: the master imports this module once (preload_app) and
+# forks the workers, which start their background threads in after_fork()
+PRELOAD = os.getenv('LST_PRELOAD', '0') == '1'
+MAX_BULK_POINTS = int(os.getenv('LST_MAX_BULK_POINTS', '10000'))
+MAX_EXPORT_POINTS = int(os.getenv('LST_MAX_EXPORT_POINTS', '1000000'))
+EXPORT_BLOCK_SIZE = int(os.getenv('LST_EXPORT_BLOCK_SIZE', '2048'))
+# Month payloads are loaded per month on demand from the binary snapshot (or JSON
+# files) into a bounded LRU; any number of YYYY-MM months can be served
+PRECOMPUTED_DATA = MonthStore(DATA_DIR)
+print(f"Found {len(PRECOMPUTED_DATA)} months ({PRECOMPUTED_DATA.source})")
+
+# Time series without start/end cover the most recent months
+DEFAULT_SERIES_MONTHS = int(os.getenv('LST_DEFAULT_SERIES_MONTHS', '12'))
+
+def requested_months(args):
+    """Months selected by optional inclusive start/end (YYYY-MM) query args"""
+    start, end = args.get('start'), args.get('end')
+    for value in (start, end):
+        if value and not MONTH_PATTERN.match(value):
+            raise ValueError(f"Invalid month '{value}', expected YYYY-MM")
+    if not start and not end:
+        return PRECOMPUTED_DATA.keys()[-DEFAULT_SERIES_MONTHS:]
+    return PRECOMPUTED_DATA.range(start, end)
+
+def query_coordinates(args):
+    """(lat, lng) from query args; ValueError if either is missing, not a finite number or out of range"""
+    coordinates = []
+    for name, limit in (('lat', 90), ('lng', 180)):
+        if args.get(name) is None:
+            raise ValueError(f'{name} is required')
+        value = float(args[name])
+        if not math.isfinite(value) or abs(value) > limit:
+            raise ValueError(f'{name} must be a number within [-{limit}, {limit}]')
+        coordinates.append(value)
+    return tuple(coordinates)
+
+def latest_month():
+    """Newest month whose data loads (an unreadable month is dropped on first read)"""
+    for month in reversed(PRECOMPUTED_DATA.keys()):
+        if PRECOMPUTED_DATA.get(month) is not None:
+            return month
+    return None
+
+# Memory-mapped raster cube exported by Preprocess_as_jasen.py
+LST_CUBE = None
 try:
-    # Check if we have service account credentials in environment
-    if os.getenv('GEE_SERVICE_ACCOUNT') and os.getenv('GEE_PRIVATE_KEY'):
-        try:
-            credentials = ee.ServiceAccountCredentials(
-                email=os.getenv('GEE_SERVICE_ACCOUNT'),
-                key_data=os.getenv('GEE_PRIVATE_KEY')
-            )
-            ee.Initialize(credentials)
-            EE_INITIALIZED = True
-            print("✓ Earth Engine initialized with service account")
-        except Exception as e:
-            print(f"✗ Service account initialization failed: {e}")
-            # Try default authentication as fallback
-            try:
-                ee.Initialize()
-                EE_INITIALIZED = True
-                print("✓ Earth Engine initialized with default auth")
-            except Exception as e2:
-                print(f"✗ Default auth also failed: {e2}")
-                EE_INITIALIZED = False
-    else:
-        # Try default authentication
-        try:
-            ee.Initialize()
-            EE_INITIALIZED = True
-            print("✓ Earth Engine initialized with default auth")
-        except Exception as e:
-            print(f"✗ Default initialization failed: {e}")
-            EE_INITIALIZED = False
+    LST_CUBE = LSTCube.open(DATA_DIR)
+    if LST_CUBE is not None:
+        print(f"Loaded LST cube: {len(LST_CUBE.months)} months, {LST_CUBE.rows}x{LST_CUBE.cols} pixels")
 except Exception as e:
-    print(f"✗ Earth Engine initialization failed completely: {e}")
-    print("  Using pre-computed data and estimates only")
-    EE_INITIALIZED = False
+    print(f"Warning: Could not open LST cube: {e}")
+    LST_CUBE = None
 
-DATA_DIR = 'precomputed_data'
-PRECOMPUTED_DATA = {}
+# Per-pixel calendar-month normals (climatology.py), updated after each precompute/ingest
+CLIMATOLOGY = None
+try:
+    CLIMATOLOGY = Climatology.open(DATA_DIR)
+    if CLIMATOLOGY is not None:
+        print(f"Loaded climatology: {len(CLIMATOLOGY.months)} months folded in")
+except Exception as e:
+    print(f"Warning: Could not open climatology: {e}")
+    CLIMATOLOGY = None
 
-# Load JSON files
+# Per-month histograms and quantile sketches (distributions.py), merged per request
+DISTRIBUTIONS = None
 try:
-    for json_file in glob.glob(f'{DATA_DIR}/2024-*.json'):
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-            PRECOMPUTED_DATA[data['value']] = data
-            print(f"Loaded {data['value']}")
+    DISTRIBUTIONS = Distributions.open(DATA_DIR)
 except Exception as e:
-    print(f"Warning: Could not load precomputed data: {e}")
+    print(f"Warning: Could not open distributions: {e}")
+
+# Per-month spatial index over the sampled grid_points for interpolated fallbacks
+IDW_NEIGHBOURS = int(os.getenv('LST_IDW_NEIGHBOURS', '8'))
+IDW_MAX_DISTANCE = float(os.getenv('LST_IDW_MAX_DISTANCE', '1.0'))  # degrees
+SPATIAL_INDEX = {}
+
+def get_spatial_index(month):
+    """KD-tree over a month's grid_points, built on first use (None if too sparse)"""
+    if month not in SPATIAL_INDEX:
+        index = PointIndex.from_grid_points(PRECOMPUTED_DATA.get(month, {}).get('grid_points'))
+        SPATIAL_INDEX[month] = index if index is not None and len(index) >= 3 else None
+    return SPATIAL_INDEX[month]
 
-# Cache for Earth Engine images
-@lru_cache(maxsize=12)
+# Map tiles rendered locally from the cube (no expiring Earth Engine map IDs)
+TILE_SERVICE = create_tile_service(LST_CUBE, CLIMATOLOGY)
+
+# Rasterized bbox/polygon masks for zonal statistics, reused across requests
+ZONE_MASKS = MaskCache(maxsize=int(os.getenv('LST_ZONE_MASK_CACHE', '256')))
+# Pixel-months one zonal request may read (held as float64, so 20M is ~160 MB)
+ZONAL_MAX_VALUES = int(os.getenv('LST_ZONAL_MAX_VALUES', '20000000'))
+
+# Cache for Earth Engine images (per-month invalidation on hot reload), sized so
+# a series over every served month doesn't evict its own composites
+COMPOSITE_CACHE_SIZE = int(os.getenv('LST_COMPOSITE_CACHE_SIZE',
+                                     str(max(len(PRECOMPUTED_DATA), DEFAULT_SERIES_MONTHS))))
+
+@invalidatable_lru_cache(maxsize=COMPOSITE_CACHE_SIZE)
 def get_monthly_composite(year_month):
     """Get or create Earth Engine monthly composite with caching - DAYTIME ONLY"""
+    with span('composite'):
+        return build_monthly_composite(year_month)
+
+def build_monthly_composite(year_month):
+    """Build the monthly daytime composite (uncached)"""
     if not EE_INITIALIZED:
         return None
     
@@ -86,10 +155,6 @@ def get_monthly_composite(year_month):
             .filterDate(start_date, end_date) \
             .select(['LST_Day_1km', 'QC_Day'])  # Only daytime bands
         
-        # Check collection size
-        collection_size = collection.size()
-        print(f"Found {collection_size.getInfo()} images for {year_month}")
-        
         # Process images - daytime only
         def process_image(image):
             # Quality mask for daytime (bits 0-1: 00=good, 01=marginal)
@@ -122,99 +187,494 @@ def get_monthly_composite(year_month):
         print(f"Error creating composite for {year_month}: {e}")
         return None
 
-def get_pixel_value_from_ee(lat, lng, month):
-    """Get actual pixel value from Earth Engine - DAYTIME AVERAGE"""
-    if not EE_INITIALIZED:
+# Earth Engine is initialized in the background so the app can serve
+# precomputed and local data (and pass health checks) immediately
+EE_INITIALIZED = False
+EE_STATUS = 'initializing'
+EE_SAMPLER = None
+POINT_BATCHER = None
+ee = None  # imported by initialize_earth_engine; the import alone takes ~0.5s
+
+def initialize_earth_engine():
+    """Authenticate with Earth Engine; returns True on success"""
+    global ee
+    try:
+        import ee
+        # Check if we have service account credentials in environment
+        if os.getenv('GEE_SERVICE_ACCOUNT') and os.getenv('GEE_PRIVATE_KEY'):
+            try:
+                credentials = ee.ServiceAccountCredentials(
+                    email=os.getenv('GEE_SERVICE_ACCOUNT'),
+                    key_data=os.getenv('GEE_PRIVATE_KEY')
+                )
+                ee.Initialize(credentials)
+                print("✓ Earth Engine initialized with service account")
+                return True
+            except Exception as e:
+                print(f"✗ Service account initialization failed: {e}")
+                # Try default authentication as fallback
+                try:
+                    ee.Initialize()
+                    print("✓ Earth Engine initialized with default auth")
+                    return True
+                except Exception as e2:
+                    print(f"✗ Default auth also failed: {e2}")
+                    return False
+        else:
+            # Try default authentication
+            try:
+                ee.Initialize()
+                print("✓ Earth Engine initialized with default auth")
+                return True
+            except Exception as e:
+                print(f"✗ Default initialization failed: {e}")
+                return False
+    except Exception as e:
+        print(f"✗ Earth Engine initialization failed completely: {e}")
+        print("  Using pre-computed data and estimates only")
+        return False
+
+def setup_sampling():
+    """Initialize Earth Engine (unless faked) and install the sampler and micro-batcher"""
+    global EE_INITIALIZED, EE_STATUS, EE_SAMPLER, POINT_BATCHER
+    
+    if os.getenv('LST_EE_BACKEND', 'earth_engine') == 'earth_engine':
+        EE_INITIALIZED = initialize_earth_engine()
+    
+    # Sampling backend (real Earth Engine, or LST_EE_BACKEND=fake for offline benchmarks)
+    sampler = create_sampler(get_monthly_composite, EE_INITIALIZED)
+    
+    # Concurrent single-month lookups share one reduceRegions call
+    if sampler is not None and os.getenv('LST_BATCH_ENABLED', '1') == '1':
+        POINT_BATCHER = PointBatcher(
+            sampler.sample_points,
+            max_batch_size=int(os.getenv('LST_BATCH_MAX_SIZE', '64')),
+            max_wait=float(os.getenv('LST_BATCH_MAX_WAIT_MS', '5')) / 1000,
+            timeout=EE_BUDGET
+        )
+    EE_SAMPLER = sampler
+    EE_STATUS = 'ready' if sampler is not None else 'not available'
+    if sampler is not None:
+        CACHE_WARMER.trigger('startup')
+
+def earth_engine_status():
+    return 'initialized' if EE_INITIALIZED else EE_STATUS
+
+# Serialized-once bodies for /api/months and /api/lst-layer
+RESPONSE_CACHE = ResponseCache(max_age=int(os.getenv('LST_STATIC_MAX_AGE', '3600')),
+                               maxsize=int(os.getenv('LST_RESPONSE_CACHE_SIZE', '256')))
+GRID_FORMATS = ('records', 'columnar')
+
+# Sampled values keyed by (month, MODIS pixel), shared by all point endpoints
+RESULT_CACHE = create_result_cache()
+
+# Prometheus metrics (GET /metrics); cache figures are read at scrape time
+REQUEST_SECONDS = REGISTRY.histogram('lst_http_request_duration_seconds', 'Request latency by route',
+                                     ['route', 'method', 'status'])
+IN_FLIGHT = REGISTRY.gauge('lst_http_requests_in_flight', 'Requests currently being served', ['route'])
+EE_CALLS = REGISTRY.counter('lst_ee_calls_total', 'Earth Engine lookups per month by outcome', ['month', 'outcome'])
+EE_CALL_SECONDS = REGISTRY.histogram('lst_ee_call_duration_seconds', 'Earth Engine round-trip latency per month', ['month'])
+VALUE_SOURCES = REGISTRY.counter('lst_values_total', 'Returned temperatures by source', ['source'])
+
+def cache_counts(field):
+    counts = {
+        ('result',): RESULT_CACHE.stats()[field],
+        ('composite',): getattr(get_monthly_composite.cache_info(), field),
+        ('zone_mask',): ZONE_MASKS.stats()[field]
+    }
+    if TILE_SERVICE is not None:
+        counts[('tile',)] = TILE_SERVICE.cache.stats()[field]
+    return counts
+
+def cache_sizes():
+    sizes = {
+        ('result',): RESULT_CACHE.stats()['size'],
+        ('composite',): get_monthly_composite.cache_info().currsize,
+        ('response',): len(RESPONSE_CACHE),
+        ('zone_mask',): len(ZONE_MASKS)
+    }
+    if TILE_SERVICE is not None:
+        sizes[('tile',)] = TILE_SERVICE.cache.stats()['tiles']
+    return sizes
+
+REGISTRY.callback('lst_cache_hits_total', 'Cache hits', lambda: cache_counts('hits'), ['cache'], kind='counter')
+REGISTRY.callback('lst_cache_misses_total', 'Cache misses', lambda: cache_counts('misses'), ['cache'], kind='counter')
+REGISTRY.callback('lst_cache_entries', 'Cached entries', cache_sizes, ['cache'])
+REGISTRY.callback('lst_ee_circuit_open', '1 while the Earth Engine circuit breaker is not closed',
+                  lambda: int(EE_BREAKER.state != 'closed'))
+REGISTRY.callback('lst_point_batches_total', 'Micro-batches sent to Earth Engine',
+                  lambda: POINT_BATCHER.stats()['batches'] if POINT_BATCHER is not None else None, kind='counter')
+REGISTRY.callback('lst_point_batch_lookups_total', 'Point lookups resolved through micro-batches',
+                  lambda: POINT_BATCHER.stats()['lookups'] if POINT_BATCHER is not None else None, kind='counter')
+
+def record_ee_call(months, outcome, duration=None):
+    for month_key in months:
+        EE_CALLS.inc(month=month_key, outcome=outcome)
+        if duration is not None:
+            EE_CALL_SECONDS.observe(duration, month=month_key)
+
+# Every request gets one latency budget for all of its Earth Engine calls, and a
+# circuit breaker short-circuits to fallback values while EE is failing or slow
+EE_BUDGET = float(os.getenv('LST_EE_BUDGET_MS', '3000')) / 1000
+# The one pool every Earth Engine call runs on (Flask and ASGI alike); a queued
+# single-month lookup holds a thread while its micro-batch fills, so keep it at
+# least LST_BATCH_MAX_SIZE or batches can never fill
+EE_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv('LST_EE_THREADS', '64')), thread_name_prefix='ee-call')
+
+def probe_earth_engine():
+    """Known-good query used by the breaker's half-open probe, bounded by the request budget"""
+    latest = PRECOMPUTED_DATA.latest()
+    if latest is None:
+        raise RuntimeError('no months to probe with')
+    future = EE_EXECUTOR.submit(EE_SAMPLER.sample_months, 40.7128, -74.0060, [latest])
+    try:
+        future.result(timeout=EE_BUDGET)
+    except FuturesTimeoutError:
+        raise TimeoutError(f'probe exceeded the {EE_BUDGET:.1f}s budget') from None
+
+EE_BREAKER = CircuitBreaker(
+    failure_threshold=int(os.getenv('LST_BREAKER_FAILURES', '5')),
+    slow_call_threshold=float(os.getenv('LST_BREAKER_SLOW_MS', '2000')) / 1000,
+    reset_timeout=float(os.getenv('LST_BREAKER_RESET_S', '30')),
+    probe_fn=probe_earth_engine
+)
+
+def _sample_remote(lat, lng, months):
+    if len(months) == 1 and POINT_BATCHER is not None:
+        # Single-month lookups go through the cross-request micro-batcher
+        return {months[0]: POINT_BATCHER.submit(months[0], lat, lng)}
+    return EE_SAMPLER.sample_months(lat, lng, months)
+
+def start_remote_call(lat, lng, months, deadline):
+    """Submit one Earth Engine round trip to EE_EXECUTOR; returns (started, future),
+    or None when it is skipped (no sampler, budget spent or breaker open)"""
+    if EE_SAMPLER is None or not months:
         return None
+    if deadline.expired() or not EE_BREAKER.allow():
+        record_ee_call(months, 'skipped')
+        return None
+    return time.monotonic(), EE_EXECUTOR.submit(with_context(_sample_remote, lat, lng, months))
+
+def finish_remote_call(months, started, deadline, values=None, error=None, timed_out=False):
+    """Record a start_remote_call outcome with the breaker and metrics; returns
+    the values, or {} if the call failed or overran the deadline"""
+    duration = time.monotonic() - started
+    if timed_out:
+        print(f"Earth Engine call exceeded the {deadline.budget:.1f}s request budget")
+        EE_BREAKER.record_failure()
+        record_ee_call(months, 'timeout', duration)
+        return {}
+    if error is not None:
+        print(f"Error sampling pixel: {error}")
+        EE_BREAKER.record_failure()
+        record_ee_call(months, 'error', duration)
+        return {}
+    
+    EE_BREAKER.record_success(duration)
+    record_ee_call(months, 'ok', duration)
+    return values
+
+def get_pixel_values_from_ee(lat, lng, months, deadline=None):
+    """Get actual pixel values for several months in a single round trip - DAYTIME AVERAGE
     
+    Returns {month: value or None} for the months Earth Engine answered; months
+    missing from the result failed (or were skipped) and should not be cached.
+    """
+    if deadline is None:
+        deadline = Deadline(EE_BUDGET)
+    call = start_remote_call(lat, lng, months, deadline)
+    if call is None:
+        return {}
+    
+    started, future = call
     try:
-        composite = get_monthly_composite(month)
-        if composite is None:
-            return None
+        with span('sample'):
+            values = future.result(timeout=deadline.remaining())
+    except FuturesTimeoutError:
+        return finish_remote_call(months, started, deadline, timed_out=True)
+    except Exception as e:
+        return finish_remote_call(months, started, deadline, error=e)
+    return finish_remote_call(months, started, deadline, values)
+
+def get_pixel_value_from_ee(lat, lng, month):
+    """Get actual pixel value from Earth Engine - DAYTIME AVERAGE"""
+    return get_pixel_values_from_ee(lat, lng, [month]).get(month)
+
+def fallback_value(lat, lng, month):
+    """Interpolate from nearby grid_points, or use the heuristic estimate"""
+    with span('estimate'):
+        index = get_spatial_index(month)
+        if index is not None:
+            temperature, nearest = index.idw(lat, lng, IDW_NEIGHBOURS)
+            if nearest <= IDW_MAX_DISTANCE:
+                return temperature, 'interpolated'
         
-        # Create point
-        point = ee.Geometry.Point([lng, lat])
+        statistics = PRECOMPUTED_DATA.get(month, {}).get('statistics', {})
+        return estimate_pixel_value(lat, lng, statistics), 'estimated'
+
+def fallback_values(lats, lngs, months):
+    """Vectorized fallback_value: (temperatures, sources) arrays"""
+    with span('estimate'):
+        return _fallback_values(lats, lngs, months)
+
+def _fallback_values(lats, lngs, months):
+    temperatures = np.full(lats.shape, np.nan)
+    sources = np.full(lats.shape, 'estimated', dtype=object)
+    
+    for month_key in np.unique(months):
+        index = get_spatial_index(month_key)
+        if index is None:
+            continue
+        selected = np.flatnonzero(months == month_key)
+        values, nearest = index.idw_many(lats[selected], lngs[selected], IDW_NEIGHBOURS)
+        close = nearest <= IDW_MAX_DISTANCE
+        temperatures[selected[close]] = values[close]
+        sources[selected[close]] = 'interpolated'
+    
+    missing = np.isnan(temperatures)
+    if missing.any():
+        statistics = [PRECOMPUTED_DATA.get(m, {}).get('statistics', {}) for m in months[missing]]
+        temperatures[missing] = estimate_pixel_values(lats[missing], lngs[missing], statistics)
+    return temperatures, sources
+
+def plan_pixel_series(lat, lng, months):
+    """Local phase of a lookup: one cube read plus pixel-cache hits
+    
+    Returns (cube_series, remote_values, remote_months) where remote_months
+    still need an Earth Engine round trip.
+    """
+    with span('cube'):
+        cube_series = LST_CUBE.series(lat, lng) if LST_CUBE is not None else None
+    
+    remote_values = {}
+    remote_months = []
+    for month_key in months:
+        if cube_series is not None and month_key in cube_series:
+            continue
+        cached = RESULT_CACHE.get(month_key, lat, lng)
+        if cached is MISSING:
+            remote_months.append(month_key)
+        else:
+            remote_values[month_key] = cached
+    
+    return cube_series, remote_values, remote_months
+
+def fetch_remote_values(lat, lng, months, deadline=None):
+    """Remote phase: all months in one Earth Engine round trip, cached per pixel"""
+    return cache_remote_values(lat, lng, get_pixel_values_from_ee(lat, lng, months, deadline))
+
+def cache_remote_values(lat, lng, values):
+    for month_key, value in values.items():
+        RESULT_CACHE.put(month_key, lat, lng, value)
+    return values
+
+def finish_pixel_series(lat, lng, months, cube_series, remote_values):
+    """Combine cube and remote values, filling gaps with interpolation/estimation"""
+    results = {}
+    for month_key in months:
+        if cube_series is not None and month_key in cube_series:
+            temperature, source = cube_series[month_key], 'raster_cube'
+            if np.isnan(temperature):
+                temperature = None
+        else:
+            temperature, source = remote_values.get(month_key), 'earth_engine'
         
-        # Sample the daytime temperature at the point
-        sample = composite.reduceRegion(
-            reducer=ee.Reducer.first(),
-            geometry=point,
-            scale=1000  # MODIS resolution
-        ).getInfo()
+        if temperature is None:
+            temperature, source = fallback_value(lat, lng, month_key)
+        results[month_key] = (temperature, source)
+    
+    return results
+
+def get_pixel_series(lat, lng, months, deadline=None):
+    """Get (temperature, source) per month - one cube read plus at most one EE round trip"""
+    cube_series, remote_values, remote_months = plan_pixel_series(lat, lng, months)
+    remote_values.update(fetch_remote_values(lat, lng, remote_months, deadline))
+    return finish_pixel_series(lat, lng, months, cube_series, remote_values)
+
+# Background cache warming for the most requested pixels (see cache_warmer.py)
+HOT_SET = HotSet(maxsize=int(os.getenv('LST_HOT_SET_SIZE', '5000')))
+HOT_SET_FILE = os.getenv('LST_HOT_SET_FILE', 'cache_state/hot_set.json')
+HOT_SET.load(HOT_SET_FILE)
+WARM_MAX_IN_FLIGHT = int(os.getenv('LST_WARM_MAX_IN_FLIGHT', '2'))
+
+def warm_pixel(lat, lng, months):
+    """Fetch the months of one pixel that are neither in the cube nor cached; returns the count"""
+    missing = [m for m in months
+               if not (LST_CUBE is not None and LST_CUBE.covers(lat, lng, m))
+               and not RESULT_CACHE.contains(m, lat, lng)]
+    if missing:
+        fetch_remote_values(lat, lng, missing, Deadline(EE_BUDGET))
+    return len(missing)
+
+def warm_months():
+    """Most requested months that still exist (none until Earth Engine is ready)"""
+    if EE_SAMPLER is None:
+        return []
+    hot = HOT_SET.top_months(int(os.getenv('LST_WARM_MONTHS', str(DEFAULT_SERIES_MONTHS))))
+    return sorted(m for m in hot if m in PRECOMPUTED_DATA)
+
+def warmer_busy():
+    """Pause warming while more than WARM_MAX_IN_FLIGHT live requests are in flight
+    or Earth Engine is failing"""
+    return IN_FLIGHT.total() > WARM_MAX_IN_FLIGHT or EE_BREAKER.stats()['state'] != 'closed'
+
+CACHE_WARMER = CacheWarmer(
+    HOT_SET, warm_pixel, warm_months, busy=warmer_busy,
+    top_n=int(os.getenv('LST_WARM_TOP_N', '200')),
+    rate=float(os.getenv('LST_WARM_RATE', '2')),
+    path=HOT_SET_FILE,
+    save_interval=float(os.getenv('LST_HOT_SET_SAVE_S', '300'))
+)
+if not PRELOAD:
+    CACHE_WARMER.start()
+atexit.register(CACHE_WARMER.save)
+
+def start_sampling():
+    if os.getenv('LST_EE_INIT', 'background') == 'background':
+        threading.Thread(target=setup_sampling, name='ee-init', daemon=True).start()
+    else:
+        setup_sampling()
+
+if not PRELOAD:
+    start_sampling()
+
+# Hot reload: new or changed files in DATA_DIR are validated and swapped in by a
+# background watcher (LST_RELOAD_INTERVAL_S, 0 disables) or POST /admin/reload
+RELOAD_LOCK = threading.Lock()
+LAST_RELOAD = None
+
+def reload_data(changed_files=None):
+    """Swap in changed month data, cube and climatology; only entries for
+    changed months are invalidated and warm pre-serialized responses are rebuilt"""
+    global LST_CUBE, CLIMATOLOGY, DISTRIBUTIONS, TILE_SERVICE, LAST_RELOAD
+    
+    with RELOAD_LOCK:
+        started = time.perf_counter()
+        # Open and validate everything before swapping anything, so a failure
+        # keeps the previous months, cube, climatology and caches all in service
+        cube = LST_CUBE
+        cube_path = os.path.join(DATA_DIR, CUBE_FILE)
+        if os.path.exists(cube_path) and (cube is None or format(os.stat(cube_path).st_mtime_ns, 'x') != cube.version):
+            # No metadata yet (export still writing it): keep serving the current cube;
+            # the metadata file appearing is itself a change that triggers another reload
+            cube = LSTCube.open(DATA_DIR) or LST_CUBE
+            if cube is not None and cube.cube.shape != (len(cube.months), cube.rows, cube.cols):
+                raise ValueError('LST cube and its metadata disagree (export still running?)')
         
-        # Return daytime temperature
-        if 'daytime_temperature' in sample and sample['daytime_temperature'] is not None:
-            return sample['daytime_temperature']
+        climatology = CLIMATOLOGY
+        new_climatology = Climatology.open(DATA_DIR)
+        if new_climatology is not None and (climatology is None or new_climatology.version != climatology.version):
+            climatology = new_climatology
         
-        return None
+        distributions = DISTRIBUTIONS
+        new_distributions = Distributions.open(DATA_DIR)
+        if new_distributions is not None and (distributions is None or new_distributions.version != distributions.version):
+            distributions = new_distributions
         
-    except Exception as e:
-        print(f"Error sampling pixel: {e}")
-        return None
+        month_update = PRECOMPUTED_DATA.prepare_refresh()
+        
+        cube_changed = cube is not LST_CUBE
+        climatology_changed = climatology is not CLIMATOLOGY
+        distributions_changed = distributions is not DISTRIBUTIONS
+        
+        # Swap: each global is a single reference assignment, so requests see old or new
+        changed = PRECOMPUTED_DATA.apply_refresh(month_update)
+        LST_CUBE, CLIMATOLOGY, DISTRIBUTIONS = cube, climatology, distributions
+        if TILE_SERVICE is None:
+            TILE_SERVICE = create_tile_service(cube, climatology)
+        else:
+            TILE_SERVICE.cube, TILE_SERVICE.climatology = cube, climatology
+        
+        for month in changed:
+            SPATIAL_INDEX.pop(month, None)
+            get_monthly_composite.cache_invalidate(month)
+            if month not in PRECOMPUTED_DATA:
+                RESULT_CACHE.invalidate_month(month)
+        
+        RESPONSE_CACHE.invalidate(lambda key: key[0] == 'lst-layer' and key[1] not in PRECOMPUTED_DATA)
+        # lst-layer bodies embed tile URLs and quantiles from the cube, climatology and distributions
+        layers_stale = cube_changed or climatology_changed or distributions_changed
+        rebuilt = RESPONSE_CACHE.rebuild(lambda key: (key == ('months',) and bool(changed))
+                                         or (key[0] == 'lst-layer' and (layers_stale or key[1] in changed)))
+        
+        LAST_RELOAD = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'changed_files': len(changed_files) if changed_files is not None else None,
+            'changed_months': changed,
+            'cube_reloaded': cube_changed,
+            'climatology_reloaded': climatology_changed,
+            'distributions_reloaded': distributions_changed,
+            'responses_rebuilt': rebuilt,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+    if changed:
+        CACHE_WARMER.trigger('reload')
+    if changed or cube_changed or climatology_changed:
+        print(f"✓ Reloaded {len(changed)} month(s), cube {'reloaded' if cube_changed else 'unchanged'}, "
+              f"climatology {'reloaded' if climatology_changed else 'unchanged'}")
+    return LAST_RELOAD
+
+DATA_WATCHER = DataWatcher(DATA_DIR, reload_data, interval=float(os.getenv('LST_RELOAD_INTERVAL_S', '30')),
+                           subdirs=('climatology',))
+if not PRELOAD:
+    DATA_WATCHER.start()
+
+def prepare_for_fork():
+    """Master-only, before workers fork: build the read-mostly state every worker
+    would otherwise build itself, so it lives once in copy-on-write shared pages"""
+    started = time.perf_counter()
+    months = PRECOMPUTED_DATA.keys()[-int(os.getenv('LST_PRELOAD_MONTHS', str(DEFAULT_SERIES_MONTHS))):]
+    for month in months:
+        RESPONSE_CACHE.get(('lst-layer', month, 'records'), lambda m=month: build_lst_layer_payload(m))
+        get_spatial_index(month)
+    if months:
+        RESPONSE_CACHE.get(('months',), build_months_payload)
+    # Keep the collector from touching (and so copying) every preloaded object in each worker
+    gc.collect()
+    gc.freeze()
+    print(f"✓ Preloaded {len(months)} months for the workers in {time.perf_counter() - started:.2f}s")
+
+def after_fork():
+    """Worker-only, right after fork: start the per-process threads and handles"""
+    if not PRELOAD:
+        return
+    PRECOMPUTED_DATA.after_fork()
+    start_sampling()
+    CACHE_WARMER.start()
+    DATA_WATCHER.start()
 
-def estimate_pixel_value(lat, lng, statistics):
-    """Enhanced estimation with detailed geographic variation"""
-    mean = statistics.get('mean', 20)
-    std_dev = statistics.get('stdDev', 2)
-    min_val = statistics.get('min', mean - 5)
-    max_val = statistics.get('max', mean + 5)
-    
-    # Temperature decreases ~0.6°C per degree latitude northward
-    lat_effect = (43.0 - lat) * 0.6
-    
-    # Lake effect - cooler near Great Lakes
-    lake_effect = 0
-    if lng < -77 and lat > 43:  # Near Lake Ontario
-        lake_effect = -1.0
-    elif lng < -79 and lat > 42:  # Near Lake Erie  
-        lake_effect = -0.8
-    
-    # Urban heat islands with actual city locations
-    urban_adjustments = [
-        (40.7128, -74.0060, 3.0),   # NYC - strongest
-        (40.6892, -74.0445, 2.5),   # Jersey City
-        (40.7614, -73.9776, 2.8),   # Manhattan
-        (40.6782, -73.9442, 2.2),   # Brooklyn
-        (40.7282, -73.7949, 2.0),   # Queens
-        (40.8448, -73.8648, 1.8),   # Bronx
-        (42.8864, -78.8784, 1.5),   # Buffalo
-        (43.0481, -76.1474, 1.2),   # Syracuse
-        (42.6526, -73.7562, 1.2),   # Albany
-        (43.1566, -77.6088, 1.2),   # Rochester
-        (42.0987, -75.9180, 0.8),   # Binghamton
-        (44.9808, -74.7095, 0.5),   # Massena
-        (43.1009, -75.2327, 0.8),   # Utica
-    ]
-    
-    urban_effect = 0
-    for city_lat, city_lng, intensity in urban_adjustments:
-        distance = ((lat - city_lat)**2 + (lng - city_lng)**2) ** 0.5
-        if distance < 0.3:  # Within ~30km
-            effect = intensity * (0.3 - distance) / 0.3
-            urban_effect = max(urban_effect, effect)
-    
-    # Elevation effects for major geographic features
-    elevation_effect = 0
-    if 43.5 < lat < 44.8 and -74.7 < lng < -73.5:  # Adirondacks High Peaks
-        elevation_effect = -3.5
-    elif 43.0 < lat < 43.5 and -74.5 < lng < -73.8:  # Southern Adirondacks
-        elevation_effect = -2.5
-    elif 41.9 < lat < 42.3 and -74.5 < lng < -74:  # Catskills
-        elevation_effect = -2.0
-    elif lat > 43.5 and -76 < lng < -75:  # Tug Hill Plateau
-        elevation_effect = -1.8
-    elif 42.0 < lat < 42.5 and -77 < lng < -76:  # Finger Lakes region
-        elevation_effect = -0.5
-    
-    # Calculate final temperature
-    temperature = mean + lat_effect + lake_effect + urban_effect + elevation_effect
-    
-    # Add small consistent random variation for realism
-    random.seed(int(lat * 10000 + lng * 10000 + hash(str(statistics))))
-    temperature += random.uniform(-0.5, 0.5)
-    
-    # Clamp to realistic range
-    return max(min_val, min(max_val, temperature))
+ADMIN_TOKEN = os.getenv('LST_ADMIN_TOKEN')
+
+def request_route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc(route=request_route())
+    if request.headers.get(TRACE_HEADER):
+        start_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.request_started
+    REQUEST_SECONDS.observe(elapsed, route=request_route(), method=request.method, status=response.status_code)
+    trace = end_trace()
+    if trace is not None:
+        trace.add('total', elapsed)
+        response.headers['Server-Timing'] = trace.server_timing()
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'request_started' in g:
+        IN_FLIGHT.dec(route=request_route())
+    end_trace()
+
+def json_response(payload):
+    with span('serialize'):
+        return jsonify(payload)
 
 @app.route('/')
 def home():
@@ -222,174 +682,602 @@ def home():
     return jsonify({
         'name': 'LST Temperature Analysis API',
         'status': 'running',
-        'earth_engine': 'initialized' if EE_INITIALIZED else 'not available',
+        'earth_engine': earth_engine_status(),
         'months_loaded': len(PRECOMPUTED_DATA),
+        'raster_cube': 'loaded' if LST_CUBE is not None else 'not available',
         'endpoints': [
             '/api/lst-layer',
             '/api/point',
+            '/api/location',
+            '/api/points',
             '/api/time-series',
             '/api/pixel-stats',
+            '/api/zonal-stats',
+            '/api/export',
+            '/api/distribution',
+            '/api/climatology',
+            '/api/anomaly',
             '/api/months',
-            '/health'
+            '/tiles/<month>/<z>/<x>/<y>.png',
+            '/tiles/anomaly/<month>/<z>/<x>/<y>.png',
+            '/health',
+            '/metrics'
         ]
     })
 
 @app.route('/api/lst-layer')
 def get_lst_layer():
-    """Get pre-computed LST layer for a month"""
-    month = request.args.get('month', '2024-08')
-    if month in PRECOMPUTED_DATA:
-        data = PRECOMPUTED_DATA[month].copy()
-        # Add note that this is daytime temperature
-        data['temperature_type'] = 'daytime_average'
-        return jsonify(data)
+    """Get pre-computed LST layer for a month (pre-serialized, ETag'd and compressed)"""
+    month = request.args.get('month') or latest_month()
+    grid_format = request.args.get('grid_format', 'records')
+    if grid_format not in GRID_FORMATS:
+        return jsonify({'error': f"grid_format must be one of {', '.join(GRID_FORMATS)}"}), 400
+    if PRECOMPUTED_DATA.get(month) is not None:
+        with span('serialize'):
+            prepared = RESPONSE_CACHE.get(('lst-layer', month, grid_format),
+                                          lambda: build_lst_layer_payload(month, grid_format))
+            return prepared.to_response(request)
     return jsonify({'error': 'Month not found'}), 404
 
+def build_lst_layer_payload(month, grid_format='records'):
+    """Response body for /api/lst-layer; grid_format='columnar' packs grid_points as arrays"""
+    data = PRECOMPUTED_DATA[month].copy()
+    # Add note that this is daytime temperature
+    data['temperature_type'] = 'daytime_average'
+    if TILE_SERVICE is not None and LST_CUBE.has_month(month):
+        data['local_tile_url'] = f'/tiles/{month}/{{z}}/{{x}}/{{y}}.png'
+        if CLIMATOLOGY is not None:
+            data['anomaly_tile_url'] = f'/tiles/anomaly/{month}/{{z}}/{{x}}/{{y}}.png'
+    if DISTRIBUTIONS is not None:
+        # Real pixel quantiles for the frontend legend and colour scale
+        summary = DISTRIBUTIONS.summary([month])
+        if summary is not None:
+            data['quantiles'] = summary['quantiles']
+    if grid_format == 'columnar':
+        data['grid_columns'] = columnar_grid_points(data.pop('grid_points', None) or [])
+    return data
+
+def sample_location(lat, lng, months=None):
+    """Sample a coordinate once for the requested months (the latest months by default)"""
+    if months is None:
+        months = PRECOMPUTED_DATA.keys()[-DEFAULT_SERIES_MONTHS:]
+    HOT_SET.record(lat, lng, months)
+    deadline = Deadline(EE_BUDGET)
+    return build_samples(months, get_pixel_series(lat, lng, months, deadline))
+
+def build_samples(months, values):
+    """Sample records from get_pixel_series output"""
+    samples = []
+    for month_key in months:
+        temperature, source = values[month_key]
+        if temperature is not None:
+            VALUE_SOURCES.inc(source=source)
+            samples.append({
+                'month': month_key,
+                'label': month_label(month_key),
+                'temperature': temperature,
+                'source': source
+            })
+    return samples
+
+def build_point_payload(lat, lng, sample):
+    """Response body for a single month at a point"""
+    return {
+        'temperature': round(sample['temperature'], 2),
+        'temperature_type': 'daytime_average',
+        'label': sample['label'],
+        'source': sample['source'],
+        'coordinates': {'lat': lat, 'lng': lng}
+    }
+
+def build_time_series_payload(lat, lng, samples):
+    """Response body for the monthly time series at a point"""
+    series = [{
+        'month': sample['month'],
+        'label': sample['label'],
+        'temperature': round(sample['temperature'], 2),
+        'temperature_type': 'daytime_average',
+        'source': sample['source']
+    } for sample in samples]
+    
+    return {
+        'time_series': series,
+        'temperature_type': 'daytime_average',
+        'coordinates': {'lat': lat, 'lng': lng}
+    }
+
+def build_pixel_stats_payload(lat, lng, samples):
+    """Response body for annual statistics at a point, or None without data"""
+    if not samples:
+        return None
+    
+    temps_array = np.array([sample['temperature'] for sample in samples])
+    monthly_data = [{
+        'month': sample['month'],
+        'temperature': round(sample['temperature'], 2),
+        'label': sample['label'],
+        'source': sample['source']
+    } for sample in samples]
+    
+    # Find warmest and coolest months
+    warmest_idx = np.argmax(temps_array)
+    coolest_idx = np.argmin(temps_array)
+    
+    return {
+        'coordinates': {'lat': lat, 'lng': lng},
+        'temperature_type': 'daytime_average',
+        'annual_stats': {
+            'mean': round(float(np.mean(temps_array)), 2),
+            'min': round(float(np.min(temps_array)), 2),
+            'max': round(float(np.max(temps_array)), 2),
+            'std_dev': round(float(np.std(temps_array)), 2),
+            'range': round(float(np.max(temps_array) - np.min(temps_array)), 2)
+        },
+        'monthly_data': monthly_data,
+        'warmest_month': monthly_data[warmest_idx],
+        'coolest_month': monthly_data[coolest_idx]
+    }
+
+@app.route('/tiles/<month>/<int:z>/<int:x>/<int:y>.png')
+def get_tile(month, z, x, y):
+    """XYZ map tile rendered from the local cube with the VIS_PARAMS palette"""
+    if TILE_SERVICE is None:
+        return jsonify({'error': 'Tiles not available'}), 404
+    if not MIN_ZOOM <= z <= MAX_ZOOM:
+        return jsonify({'error': f'Zoom must be between {MIN_ZOOM} and {MAX_ZOOM}'}), 400
+    
+    data = TILE_SERVICE.tile(month, z, x, y)
+    if data is None:
+        return jsonify({'error': 'Tile not found'}), 404
+    
+    response = Response(data, mimetype='image/png')
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+@app.route('/tiles/anomaly/<month>/<int:z>/<int:x>/<int:y>.png')
+def get_anomaly_tile(month, z, x, y):
+    """XYZ tile of the month's difference from its calendar-month normal (diverging palette)"""
+    if TILE_SERVICE is None or CLIMATOLOGY is None:
+        return jsonify({'error': 'Anomaly tiles not available'}), 404
+    if not MIN_ZOOM <= z <= MAX_ZOOM:
+        return jsonify({'error': f'Zoom must be between {MIN_ZOOM} and {MAX_ZOOM}'}), 400
+    
+    data = TILE_SERVICE.anomaly_tile(month, z, x, y)
+    if data is None:
+        return jsonify({'error': 'Tile not found'}), 404
+    
+    response = Response(data, mimetype='image/png')
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
 @app.route('/api/point')
 def get_point():
-    """Get pixel value for a specific point - always tries Earth Engine first"""
+    """Get pixel value for a specific point - local cube, then Earth Engine"""
     month = request.args.get('month')
-    lat = float(request.args.get('lat'))
-    lng = float(request.args.get('lng'))
+    try:
+        lat, lng = query_coordinates(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if month not in PRECOMPUTED_DATA:
         return jsonify({'error': 'Month not found'}), 404
     
-    data = PRECOMPUTED_DATA[month]
-    statistics = data.get('statistics', {})
+    samples = sample_location(lat, lng, [month])
+    return json_response(build_point_payload(lat, lng, samples[0]))
+
+@app.route('/api/time-series')
+def get_time_series():
+    """Get the monthly time series at a point (optionally ?start=YYYY-MM&end=YYYY-MM)"""
+    try:
+        lat, lng = query_coordinates(request.args)
+        months = requested_months(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Always try Earth Engine first if available
-    temperature = None
-    source = 'estimated'
+    samples = sample_location(lat, lng, months)
+    return json_response(build_time_series_payload(lat, lng, samples))
+
+@app.route('/api/pixel-stats')
+def get_pixel_stats():
+    """Get detailed statistics for a pixel across months (optionally ?start=&end=)"""
+    try:
+        lat, lng = query_coordinates(request.args)
+        months = requested_months(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if EE_INITIALIZED:
-        print(f"Attempting Earth Engine query for {lat}, {lng} in {month}")
-        ee_value = get_pixel_value_from_ee(lat, lng, month)
-        if ee_value is not None:
-            temperature = ee_value
-            source = 'earth_engine'
-            print(f"Got Earth Engine daytime value: {temperature}°C")
+    samples = sample_location(lat, lng, months)
+    payload = build_pixel_stats_payload(lat, lng, samples)
+    if payload is None:
+        return jsonify({'error': 'No data available'}), 404
+    return json_response(payload)
+
+@app.route('/api/location')
+def get_location():
+    """Point value, time series and annual statistics from one pass over the months"""
+    month = request.args.get('month')
+    try:
+        lat, lng = query_coordinates(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if month not in PRECOMPUTED_DATA:
+        return jsonify({'error': 'Month not found'}), 404
+    try:
+        months = sorted(set(requested_months(request.args)) | {month})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    samples = sample_location(lat, lng, months)
+    return json_response(build_location_payload(lat, lng, month, samples))
+
+def build_location_payload(lat, lng, month, samples):
+    """Response body for /api/location"""
+    selected = next((sample for sample in samples if sample['month'] == month), None)
+    
+    return {
+        'coordinates': {'lat': lat, 'lng': lng},
+        'temperature_type': 'daytime_average',
+        'point': build_point_payload(lat, lng, selected) if selected else None,
+        'time_series': build_time_series_payload(lat, lng, samples)['time_series'],
+        'pixel_stats': build_pixel_stats_payload(lat, lng, samples)
+    }
+
+def parse_coordinates(lats, lngs):
+    """lat/lng float arrays from JSON lists; ValueError unless every value is a finite, in-range number"""
+    for name, values in (('lats', lats), ('lngs', lngs)):
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            raise ValueError(f'{name} must all be numbers')
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if lats.shape != lngs.shape or lats.ndim != 1:
+        raise ValueError('lats and lngs must be lists of the same length')
+    if not (np.isfinite(lats).all() and np.isfinite(lngs).all()):
+        raise ValueError('coordinates must be finite numbers')
+    if (np.abs(lats) > 90).any() or (np.abs(lngs) > 180).any():
+        raise ValueError('lat must be within [-90, 90] and lng within [-180, 180]')
+    return lats, lngs
+
+def sample_points_local(lats, lngs, months):
+    """Vectorized values for many (lat, lng, month) triples from the cube, interpolation or estimation"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    months = np.asarray(months)
+    
+    temperatures = np.full(lats.shape, np.nan)
+    if LST_CUBE is not None:
+        for month_key in np.unique(months):
+            selected = months == month_key
+            temperatures[selected] = LST_CUBE.values(lats[selected], lngs[selected], month_key)
+    
+    from_cube = ~np.isnan(temperatures)
+    sources = np.full(lats.shape, 'raster_cube', dtype=object)
+    missing = ~from_cube
+    if missing.any():
+        temperatures[missing], sources[missing] = fallback_values(lats[missing], lngs[missing], months[missing])
+    
+    return temperatures, sources
+
+@app.route('/api/points', methods=['POST'])
+def get_points():
+    """Bulk values for many coordinates in one request (local data only, no EE round trips)"""
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    try:
+        if 'points' in body:
+            coords = body['points']
+            lats = [p['lat'] if isinstance(p, dict) else p[0] for p in coords]
+            lngs = [p['lng'] if isinstance(p, dict) else p[1] for p in coords]
         else:
-            print("Earth Engine returned no value, using estimation")
+            lats = body.get('lats', [])
+            lngs = body.get('lngs', [])
+        # One month for every point, or one month per point
+        months = body.get('months') or [body.get('month') or latest_month()] * len(lats)
+        if not all(isinstance(values, list) for values in (lats, lngs, months)):
+            raise TypeError('points, lats, lngs and months must be lists')
+        if not all(isinstance(m, str) for m in months):
+            raise TypeError('months must be YYYY-MM strings')
+    except (KeyError, IndexError, TypeError) as e:
+        return jsonify({'error': f'Invalid points: {e}'}), 400
     
-    # Fallback to estimation if EE didn't work
-    if temperature is None:
-        temperature = estimate_pixel_value(lat, lng, statistics)
-        source = 'estimated'
+    if len(lats) != len(lngs):
+        return jsonify({'error': 'lats and lngs must have the same length'}), 400
+    if len(lats) > MAX_BULK_POINTS:
+        return jsonify({'error': f'At most {MAX_BULK_POINTS} points per request'}), 400
+    if len(months) != len(lats):
+        return jsonify({'error': 'months must have one entry per point'}), 400
+    unknown = sorted(set(months) - set(PRECOMPUTED_DATA))
+    if unknown:
+        return jsonify({'error': f'Month not found: {unknown[0]}'}), 404
     
-    return jsonify({
-        'temperature': round(temperature, 2),
+    try:
+        temperatures, sources = sample_points_local(*parse_coordinates(lats, lngs), months)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid coordinates: {e}'}), 400
+    
+    for source, count in zip(*np.unique(sources.astype(str), return_counts=True)):
+        VALUE_SOURCES.inc(int(count), source=source)
+    
+    return json_response({
+        'count': len(lats),
         'temperature_type': 'daytime_average',
-        'label': data['label'],
-        'source': source,
-        'coordinates': {'lat': lat, 'lng': lng}
+        'lats': lats,
+        'lngs': lngs,
+        'months': months,
+        'temperatures': np.round(temperatures, 2).tolist(),
+        'sources': sources.tolist()
     })
 
-@app.route('/api/time-series')
-def get_time_series():
-    """Get time series for all months at a specific point"""
-    lat = float(request.args.get('lat'))
-    lng = float(request.args.get('lng'))
+def sample_export_block(lats, lngs, month):
+    """One month for a block of export points (local data only)"""
+    temperatures, sources = sample_points_local(lats, lngs, np.full(len(lats), month))
+    for source, count in zip(*np.unique(sources.astype(str), return_counts=True)):
+        VALUE_SOURCES.inc(int(count), source=source)
+    return temperatures, sources
+
+@app.route('/api/export', methods=['GET', 'POST'])
+def export_series():
+    """Stream monthly series for many points as NDJSON or CSV (local data only, no EE round trips)
     
-    series = []
+    GET ?bbox=west,south,east,north&step=0.01[&start=&end=&format=csv]
+    POST {"points": [[lat, lng], ...] | "lats": [...], "lngs": [...] | "bbox", "step", "start", "end", "format"}
+    """
+    params = request.args.to_dict()
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        params.update(body)
+    if params.get('month'):
+        params['start'] = params['end'] = params['month']
+    fmt = params.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
     
-    for month_key, data in sorted(PRECOMPUTED_DATA.items()):
-        temperature = None
-        
-        # Try Earth Engine first
-        if EE_INITIALIZED:
-            temperature = get_pixel_value_from_ee(lat, lng, month_key)
-        
-        # Fallback to estimation
-        if temperature is None:
-            temperature = estimate_pixel_value(lat, lng, data.get('statistics', {}))
-        
-        if temperature is not None:
-            series.append({
-                'month': month_key,
-                'label': data['label'],
-                'temperature': round(temperature, 2),
-                'temperature_type': 'daytime_average'
-            })
+    try:
+        months = requested_months(params)
+        if params.get('bbox') is not None:
+            rows, cols = grid_size(params['bbox'], params.get('step', 0.01))
+            count = rows * cols
+            blocks = grid_blocks(params['bbox'], params.get('step', 0.01), EXPORT_BLOCK_SIZE)
+        else:
+            if 'points' in params:
+                coords = params['points']
+                lats = [p['lat'] if isinstance(p, dict) else p[0] for p in coords]
+                lngs = [p['lng'] if isinstance(p, dict) else p[1] for p in coords]
+            else:
+                lats, lngs = params.get('lats', []), params.get('lngs', [])
+            lats, lngs = parse_coordinates(lats, lngs)
+            count = len(lats)
+            blocks = coordinate_blocks(lats, lngs, EXPORT_BLOCK_SIZE)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid export request: {e}'}), 400
     
-    return jsonify({
-        'time_series': series,
+    if not count:
+        return jsonify({'error': 'Provide points, lats/lngs or a bbox and step'}), 400
+    if count > MAX_EXPORT_POINTS:
+        return jsonify({'error': f'At most {MAX_EXPORT_POINTS} points per export ({count} requested)'}), 400
+    
+    response = Response(stream_export(blocks, months, sample_export_block, fmt), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=lst_export.{fmt}'
+    response.headers['X-Export-Points'] = str(count)
+    response.headers['X-Export-Months'] = str(len(months))
+    return response
+
+@app.route('/api/zonal-stats', methods=['GET', 'POST'])
+def get_zonal_stats():
+    """Region statistics for a bbox or GeoJSON polygon over a month range (local cube only)
+    
+    GET ?bbox=west,south,east,north[&month=|&start=&end=]
+    POST {"geometry": <GeoJSON Polygon/MultiPolygon/Feature> | "bbox": [...], "month" | "start", "end"}
+    """
+    if LST_CUBE is None:
+        return jsonify({'error': 'Raster cube not available'}), 503
+    
+    params = request.args.to_dict()
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        params.update(body)
+    if params.get('month'):
+        params['start'] = params['end'] = params['month']
+    if not params.get('geometry') and not params.get('bbox'):
+        return jsonify({'error': 'Provide a bbox or a GeoJSON geometry'}), 400
+    
+    try:
+        months = requested_months(params)
+        with span('rasterize'):
+            zone = ZONE_MASKS.get(LST_CUBE, bbox=params.get('bbox'), geometry=params.get('geometry'))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid region: {e}'}), 400
+    
+    values = zone.pixel_count * sum(1 for m in months if LST_CUBE.has_month(m))
+    if values > ZONAL_MAX_VALUES:
+        return jsonify({'error': f'Region and months cover {values} pixel-months, at most {ZONAL_MAX_VALUES} '
+                                 f'per request; narrow the region or the month range'}), 400
+    with span('zonal'):
+        monthly, overall, missing = zonal_stats(LST_CUBE, zone, months)
+    
+    for row in monthly:
+        row['label'] = month_label(row['month'])
+    
+    return json_response({
+        'zone': {
+            'type': 'geometry' if params.get('geometry') else 'bbox',
+            'pixels': zone.pixel_count,
+            'resolution': LST_CUBE.resolution
+        },
         'temperature_type': 'daytime_average',
-        'coordinates': {'lat': lat, 'lng': lng}
+        'source': 'raster_cube',
+        'monthly': monthly,
+        'summary': overall,
+        'missing_months': missing
     })
 
-@app.route('/api/pixel-stats')
-def get_pixel_stats():
-    """Get detailed statistics for a pixel across all months"""
-    lat = float(request.args.get('lat'))
-    lng = float(request.args.get('lng'))
+@app.route('/api/distribution')
+def get_distribution():
+    """Pixel value percentiles and histogram for a month or month range, merged from precomputed sketches
     
-    temperatures = []
-    monthly_data = []
+    ?month=YYYY-MM | start=&end= [&region=<name>&quantiles=0.05,0.5,0.95]
+    """
+    if DISTRIBUTIONS is None:
+        return jsonify({'error': 'Distributions not available'}), 503
+    params = request.args.to_dict()
+    if params.get('month'):
+        params['start'] = params['end'] = params['month']
+    region = params.get('region', 'all')
+    if region not in DISTRIBUTIONS.region_index:
+        return jsonify({'error': f'Unknown region: {region}', 'regions': DISTRIBUTIONS.regions}), 404
+    try:
+        months = requested_months(params)
+        quantiles = [float(q) for q in params['quantiles'].split(',')] if params.get('quantiles') else None
+        if quantiles is not None and not all(0 <= q <= 1 for q in quantiles):
+            raise ValueError('quantiles must be between 0 and 1')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    for month_key, data in sorted(PRECOMPUTED_DATA.items()):
-        temperature = None
-        
-        # Try Earth Engine first
-        if EE_INITIALIZED:
-            temperature = get_pixel_value_from_ee(lat, lng, month_key)
-        
-        # Fallback to estimation
-        if temperature is None:
-            temperature = estimate_pixel_value(lat, lng, data.get('statistics', {}))
-        
-        if temperature is not None:
-            temperatures.append(temperature)
-            monthly_data.append({
-                'month': month_key,
-                'temperature': round(temperature, 2),
-                'label': data['label']
-            })
+    with span('distribution'):
+        summary = DISTRIBUTIONS.summary(months, region, *([quantiles] if quantiles else []))
+    if summary is None:
+        return jsonify({'error': 'No data for these months'}), 404
     
-    if temperatures:
-        temps_array = np.array(temperatures)
-        
-        # Find warmest and coolest months
-        warmest_idx = np.argmax(temps_array)
-        coolest_idx = np.argmin(temps_array)
-        
-        return jsonify({
-            'coordinates': {'lat': lat, 'lng': lng},
-            'temperature_type': 'daytime_average',
-            'annual_stats': {
-                'mean': round(float(np.mean(temps_array)), 2),
-                'min': round(float(np.min(temps_array)), 2),
-                'max': round(float(np.max(temps_array)), 2),
-                'std_dev': round(float(np.std(temps_array)), 2),
-                'range': round(float(np.max(temps_array) - np.min(temps_array)), 2)
-            },
-            'monthly_data': monthly_data,
-            'warmest_month': monthly_data[warmest_idx] if warmest_idx < len(monthly_data) else None,
-            'coolest_month': monthly_data[coolest_idx] if coolest_idx < len(monthly_data) else None
-        })
+    return json_response({
+        'region': region,
+        'months': [m for m in months if m in DISTRIBUTIONS.month_index],
+        'temperature_type': 'daytime_average',
+        'source': 'precomputed_sketch',
+        **summary
+    })
+
+@app.route('/api/climatology')
+def get_climatology():
+    """Calendar-month normals (mean, std dev, min, max, years) at a point"""
+    if CLIMATOLOGY is None:
+        return jsonify({'error': 'Climatology not available'}), 503
+    try:
+        lat, lng = query_coordinates(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with span('climatology'):
+        normals = CLIMATOLOGY.normals(lat, lng)
+    if not any(normals):
+        return jsonify({'error': 'No climatology at this location'}), 404
     
-    return jsonify({'error': 'No data available'}), 404
+    return json_response({
+        'coordinates': {'lat': lat, 'lng': lng},
+        'temperature_type': 'daytime_average',
+        'period': CLIMATOLOGY.stats(),
+        'normals': normals
+    })
+
+@app.route('/api/anomaly')
+def get_anomaly():
+    """Monthly anomalies (value minus calendar-month normal) at a point
+    
+    ?lat=&lng=&month=YYYY-MM, or ?start=&end= for a range (latest months by default)
+    """
+    if CLIMATOLOGY is None:
+        return jsonify({'error': 'Climatology not available'}), 503
+    params = request.args.to_dict()
+    if params.get('month'):
+        params['start'] = params['end'] = params['month']
+    try:
+        lat, lng = query_coordinates(params)
+        months = requested_months(params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    samples = sample_location(lat, lng, months)
+    anomalies = []
+    with span('climatology'):
+        for sample in samples:
+            result = CLIMATOLOGY.anomaly(lat, lng, sample['month'], sample['temperature'])
+            if result is None:
+                continue
+            anomalies.append({
+                'month': sample['month'],
+                'label': sample['label'],
+                'temperature': round(sample['temperature'], 2),
+                'normal': result['normal']['mean'],
+                'anomaly': result['anomaly'],
+                'z_score': result['z_score'],
+                'years': result['normal']['years'],
+                'source': sample['source']
+            })
+    if not anomalies:
+        return jsonify({'error': 'No data available'}), 404
+    
+    return json_response({
+        'coordinates': {'lat': lat, 'lng': lng},
+        'temperature_type': 'daytime_average',
+        'period': CLIMATOLOGY.stats(),
+        'anomalies': anomalies
+    })
 
 @app.route('/api/months')
 def get_months():
     """Get list of available months"""
-    return jsonify([{
-        'value': k,
-        'label': v['label'],
-        'statistics': v['statistics'],
-        'temperature_type': 'daytime_average'
-    } for k, v in sorted(PRECOMPUTED_DATA.items())])
+    return RESPONSE_CACHE.get(('months',), build_months_payload).to_response(request)
+
+def build_months_payload():
+    payload = []
+    for month in PRECOMPUTED_DATA.keys():
+        data = PRECOMPUTED_DATA.get(month)
+        if data is None:
+            continue  # unreadable file, dropped from the store until it changes
+        payload.append({
+            'value': month,
+            'label': data['label'],
+            'statistics': data['statistics'],
+            'temperature_type': 'daytime_average'
+        })
+    return payload
 
 @app.route('/health')
 def health():
     return jsonify({
         'status': 'healthy',
+        'ready': EE_STATUS != 'initializing',
         'months_loaded': len(PRECOMPUTED_DATA),
-        'earth_engine': 'initialized' if EE_INITIALIZED else 'not available',
+        'month_data': PRECOMPUTED_DATA.stats(),
+        'earth_engine': earth_engine_status(),
+        'sampler': EE_SAMPLER.name if EE_SAMPLER is not None else None,
+        'point_batcher': POINT_BATCHER.stats() if POINT_BATCHER is not None else None,
+        'ee_circuit_breaker': EE_BREAKER.stats(),
+        'result_cache': RESULT_CACHE.stats(),
+        'tile_cache': TILE_SERVICE.cache.stats() if TILE_SERVICE is not None else None,
+        'zone_masks': ZONE_MASKS.stats(),
+        'climatology': CLIMATOLOGY.stats() if CLIMATOLOGY is not None else None,
+        'distributions': DISTRIBUTIONS.stats() if DISTRIBUTIONS is not None else None,
+        'data_watcher': DATA_WATCHER.stats(),
+        'cache_warmer': CACHE_WARMER.stats(),
+        'last_reload': LAST_RELOAD,
+        'raster_cube': LST_CUBE.months if LST_CUBE is not None else [],
         'temperature_type': 'daytime_average',
         'months': list(PRECOMPUTED_DATA.keys())
     })
 
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload changed data now (requires the LST_ADMIN_TOKEN in X-Admin-Token)"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints disabled (set LST_ADMIN_TOKEN)'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        return jsonify(reload_data())
+    except Exception as e:
+        return jsonify({'error': f'Reload failed, still serving previous data: {e}'}), 500
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition (per process)"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     # Get port from environment variable (Render sets this)
     port = int(os.environ.get('PORT', 5000))
@@ -398,13 +1286,13 @@ if __name__ == '__main__':
     print("LST PIXEL VALUE SERVER - DAYTIME TEMPERATURES ONLY")
     print("="*60)
     print(f"✓ Loaded {len(PRECOMPUTED_DATA)} months of data")
-    print(f"{'✓' if EE_INITIALIZED else '✗'} Earth Engine: {'Ready' if EE_INITIALIZED else 'Not initialized'}")
+    print(f"{'✓' if LST_CUBE is not None else '✗'} Raster cube: {'Loaded' if LST_CUBE is not None else 'Not found'}")
+    print(f"{'✓' if EE_INITIALIZED else '…'} Earth Engine: {earth_engine_status()}")
     print("✓ Using DAYTIME temperatures only (LST_Day_1km)")
     print("✓ Using MODIS/061/MOD11A2 dataset")
     
     if not EE_INITIALIZED:
-        print("\nRunning with pre-computed data only")
-        print("Earth Engine features disabled")
+        print("\nServing pre-computed and local data until Earth Engine is ready")
     
     print(f"\nServer starting on port {port}")
     print("="*60 + "\n")
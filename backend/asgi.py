@@ -0,0 +1,167 @@
+"""
+ASGI serving mode
+The point routes run natively on asyncio: Earth Engine calls go to the app's
+EE_EXECUTOR pool (LST_EE_THREADS) and are awaited within the request deadline,
+and identical in-flight lookups (same months, same MODIS pixel) share one
+upstream call. Every other route is the Flask app via WsgiToAsgi.
+
+Run with:  uvicorn asgi:application --host 0.0.0.0 --port $PORT
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as lst_app
+from micro_batch import SingleFlight
+from result_cache import modis_pixel_index
+from circuit_breaker import Deadline
+from metrics import TRACE_HEADER, span, start_trace, end_trace
+
+
+class AsyncSampler:
+    """Runs remote lookups off the event loop, one EE_EXECUTOR thread per call"""
+
+    def __init__(self):
+        self.single_flight = SingleFlight()
+
+    async def _fetch(self, lat, lng, months, deadline):
+        call = lst_app.start_remote_call(lat, lng, months, deadline)
+        if call is None:
+            return {}
+        started, future = call
+        try:
+            values = await asyncio.wait_for(asyncio.wrap_future(future), deadline.remaining())
+        except asyncio.TimeoutError:
+            return lst_app.finish_remote_call(months, started, deadline, timed_out=True)
+        except Exception as e:
+            return lst_app.finish_remote_call(months, started, deadline, error=e)
+        values = lst_app.finish_remote_call(months, started, deadline, values)
+        return lst_app.cache_remote_values(lat, lng, values)
+
+    async def sample_location(self, lat, lng, months=None):
+        """Async counterpart of app.sample_location"""
+        if months is None:
+            months = lst_app.PRECOMPUTED_DATA.keys()[-lst_app.DEFAULT_SERIES_MONTHS:]
+        lst_app.HOT_SET.record(lat, lng, months)
+
+        cube_series, remote_values, remote_months = lst_app.plan_pixel_series(lat, lng, months)
+        if remote_months and lst_app.EE_SAMPLER is not None:
+            deadline = Deadline(lst_app.EE_BUDGET)
+            key = (tuple(remote_months), modis_pixel_index(lat, lng))
+            fetched = await self.single_flight.do(key, lambda: self._fetch(lat, lng, remote_months, deadline))
+            remote_values.update(fetched)
+
+        values = lst_app.finish_pixel_series(lat, lng, months, cube_series, remote_values)
+        return lst_app.build_samples(months, values)
+
+
+SAMPLER = AsyncSampler()
+
+
+def serialize(payload):
+    with span('serialize'):
+        return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+
+
+async def send_json(send, body, status=200, extra_headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *extra_headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def point_route(args):
+    month = args.get('month')
+    lat, lng = lst_app.query_coordinates(args)
+    if month not in lst_app.PRECOMPUTED_DATA:
+        return {'error': 'Month not found'}, 404
+    samples = await SAMPLER.sample_location(lat, lng, [month])
+    return lst_app.build_point_payload(lat, lng, samples[0]), 200
+
+
+async def time_series_route(args):
+    lat, lng = lst_app.query_coordinates(args)
+    samples = await SAMPLER.sample_location(lat, lng, lst_app.requested_months(args))
+    return lst_app.build_time_series_payload(lat, lng, samples), 200
+
+
+async def pixel_stats_route(args):
+    lat, lng = lst_app.query_coordinates(args)
+    samples = await SAMPLER.sample_location(lat, lng, lst_app.requested_months(args))
+    payload = lst_app.build_pixel_stats_payload(lat, lng, samples)
+    if payload is None:
+        return {'error': 'No data available'}, 404
+    return payload, 200
+
+
+async def location_route(args):
+    month = args.get('month')
+    lat, lng = lst_app.query_coordinates(args)
+    if month not in lst_app.PRECOMPUTED_DATA:
+        return {'error': 'Month not found'}, 404
+    months = sorted(set(lst_app.requested_months(args)) | {month})
+    samples = await SAMPLER.sample_location(lat, lng, months)
+    return lst_app.build_location_payload(lat, lng, month, samples), 200
+
+
+ASYNC_ROUTES = {
+    '/api/point': point_route,
+    '/api/time-series': time_series_route,
+    '/api/pixel-stats': pixel_stats_route,
+    '/api/location': location_route,
+}
+
+flask_application = WsgiToAsgi(lst_app.app)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                lst_app.EE_EXECUTOR.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    route = ASYNC_ROUTES.get(scope.get('path')) if scope['type'] == 'http' else None
+    if route is None or scope['method'] != 'GET':
+        await flask_application(scope, receive, send)
+        return
+
+    path = scope['path']
+    started = time.perf_counter()
+    tracing = any(name.decode().lower() == TRACE_HEADER.lower() for name, _ in scope.get('headers', []))
+    if tracing:
+        start_trace()
+    lst_app.IN_FLIGHT.inc(route=path)
+    try:
+        args = {k: v[0] for k, v in parse_qs(scope['query_string'].decode()).items()}
+        try:
+            payload, status = await route(args)
+        except (KeyError, ValueError) as e:
+            payload, status = {'error': f'Invalid parameters: {e}'}, 400
+        body = serialize(payload)
+    finally:
+        lst_app.IN_FLIGHT.dec(route=path)
+        trace = end_trace()
+
+    elapsed = time.perf_counter() - started
+    lst_app.REQUEST_SECONDS.observe(elapsed, route=path, method='GET', status=status)
+    extra_headers = []
+    if trace is not None:
+        trace.add('total', elapsed)
+        extra_headers = [(b'server-timing', trace.server_timing().encode()), (b'timing-allow-origin', b'*')]
+    await send_json(send, body, status, extra_headers)
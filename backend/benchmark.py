@@ -0,0 +1,392 @@
+"""
+Benchmark and load-test suite
+Drives the API through Flask's test client and/or a real gunicorn process with
+the fake Earth Engine backend (configurable latency and error rate), using
+click locations clustered the way real users click over New York. Also times
+the estimator and month data loading. Results are JSON so two commits can be
+compared directly.
+
+    python benchmark.py --output before.json
+    python benchmark.py --mode gunicorn --workers 4 --concurrency 32
+    python benchmark.py --compare before.json after.json
+"""
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics as stats
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from lst_cube import NY_BBOX
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (lat, lng, spread in degrees, weight) - most clicks land on the cities
+CLICK_HOTSPOTS = [
+    (40.7128, -74.0060, 0.08, 0.40),  # New York City
+    (40.7900, -73.2000, 0.25, 0.10),  # Long Island
+    (42.8864, -78.8784, 0.06, 0.08),  # Buffalo
+    (43.1566, -77.6088, 0.05, 0.06),  # Rochester
+    (43.0481, -76.1474, 0.05, 0.05),  # Syracuse
+    (42.6526, -73.7562, 0.05, 0.06),  # Albany
+]
+UNIFORM_WEIGHT = 0.25
+REPEAT_RATE = 0.15  # users re-click a spot they already looked at
+
+ENDPOINT_MIX = [
+    ('point', 0.35),
+    ('time-series', 0.20),
+    ('pixel-stats', 0.15),
+    ('lst-layer', 0.15),
+    ('months', 0.15),
+]
+
+
+def generate_clicks(n, seed=0):
+    """n (lat, lng) clicks from the hotspot mixture, clipped to the state bbox"""
+    rng = random.Random(seed)
+    weights = [w for *_, w in CLICK_HOTSPOTS] + [UNIFORM_WEIGHT]
+    clicks = []
+    for _ in range(n):
+        if clicks and rng.random() < REPEAT_RATE:
+            clicks.append(rng.choice(clicks))
+            continue
+        choice = rng.choices(range(len(weights)), weights)[0]
+        if choice == len(CLICK_HOTSPOTS):
+            lat = rng.uniform(NY_BBOX['south'], NY_BBOX['north'])
+            lng = rng.uniform(NY_BBOX['west'], NY_BBOX['east'])
+        else:
+            center_lat, center_lng, spread, _ = CLICK_HOTSPOTS[choice]
+            lat = rng.gauss(center_lat, spread)
+            lng = rng.gauss(center_lng, spread)
+        lat = min(max(lat, NY_BBOX['south']), NY_BBOX['north'])
+        lng = min(max(lng, NY_BBOX['west']), NY_BBOX['east'])
+        clicks.append((round(lat, 5), round(lng, 5)))
+    return clicks
+
+
+def generate_requests(n, months, seed=0):
+    """Deterministic (endpoint, path) workload following ENDPOINT_MIX"""
+    rng = random.Random(seed + 1)
+    clicks = generate_clicks(n, seed)
+    names = [name for name, _ in ENDPOINT_MIX]
+    weights = [w for _, w in ENDPOINT_MIX]
+    requests = []
+    for lat, lng in clicks:
+        endpoint = rng.choices(names, weights)[0]
+        month = rng.choice(months)
+        if endpoint == 'point':
+            path = f'/api/point?lat={lat}&lng={lng}&month={month}'
+        elif endpoint in ('time-series', 'pixel-stats'):
+            path = f'/api/{endpoint}?lat={lat}&lng={lng}'
+        elif endpoint == 'lst-layer':
+            path = f'/api/lst-layer?month={month}'
+        else:
+            path = '/api/months'
+        requests.append((endpoint, path))
+    return requests
+
+
+def run_load(send, requests, concurrency):
+    """Replay requests with a thread pool; send(path) returns the status code"""
+    records = []
+    lock = threading.Lock()
+
+    def one(item):
+        endpoint, path = item
+        started = time.perf_counter()
+        try:
+            ok = send(path) < 500
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            records.append((endpoint, elapsed, ok))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, requests))
+    return summarize(records, time.perf_counter() - started)
+
+
+def summarize(records, wall_time):
+    """Throughput and latency percentiles per endpoint and overall"""
+    by_endpoint = {}
+    for endpoint, elapsed, ok in records:
+        by_endpoint.setdefault(endpoint, []).append((elapsed, ok))
+    by_endpoint['all'] = [(elapsed, ok) for _, elapsed, ok in records]
+
+    summary = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = np.array([elapsed for elapsed, _ in rows]) * 1000
+        summary[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, ok in rows if not ok),
+            'throughput_rps': round(len(rows) / wall_time, 2),
+            'mean_ms': round(float(latencies.mean()), 3),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+            'max_ms': round(float(latencies.max()), 3)
+        }
+    summary['wall_time_s'] = round(wall_time, 3)
+    return summary
+
+
+def configure_environment(args):
+    """Point the app at the fake Earth Engine backend, the benchmark data dir and
+    throwaway cache state before it is imported
+
+    The hot set, tile cache and shared result table live in a temporary
+    directory, so a run never writes its synthetic traffic into the
+    deployment's cache_state/ or tile_cache/.
+    """
+    state_dir = tempfile.mkdtemp(prefix='lst-bench-')
+    # Registered before the app's own atexit hooks, so it runs after they have saved
+    atexit.register(shutil.rmtree, state_dir, ignore_errors=True)
+    env = {
+        'LST_EE_BACKEND': 'fake',
+        'LST_EE_INIT': 'sync',
+        'LST_FAKE_EE_LATENCY_MS': str(args.latency_ms),
+        'LST_FAKE_EE_ERROR_RATE': str(args.error_rate),
+        'LST_DATA_DIR': os.path.join(BACKEND_DIR, args.data_dir),
+        'LST_HOT_SET_FILE': os.path.join(state_dir, 'hot_set.json'),
+        'LST_TILE_CACHE_DIR': os.path.join(state_dir, 'tiles'),
+        'LST_SHARED_CACHE_PATH': os.path.join(state_dir, 'result-cache'),
+    }
+    os.environ.update(env)
+    return env
+
+
+def bench_test_client(args, requests):
+    import app as lst_app
+
+    local = threading.local()
+
+    def send(path):
+        if not hasattr(local, 'client'):
+            local.client = lst_app.app.test_client()
+        return local.client.get(path).status_code
+
+    run_load(send, requests[:args.warmup], args.concurrency)
+    result = run_load(send, requests, args.concurrency)
+
+    sampler = lst_app.EE_SAMPLER
+    result['earth_engine'] = {
+        'round_trips': getattr(sampler, 'round_trips', None),
+        'errors': getattr(sampler, 'errors', None),
+        'point_batcher': lst_app.POINT_BATCHER.stats() if lst_app.POINT_BATCHER is not None else None,
+        'circuit_breaker': lst_app.EE_BREAKER.stats(),
+        'result_cache': lst_app.RESULT_CACHE.stats()
+    }
+    return result
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def bench_gunicorn(args, requests, env):
+    # gunicorn.conf.py turns the shared result table on; --shared-cache measures that deployed default
+    env = {**env, 'LST_SHARED_CACHE': '1' if args.shared_cache else '0'}
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        '--log-level', 'warning'
+    ]
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                with urllib.request.urlopen(f'{base_url}/health', timeout=2) as response:
+                    if json.loads(response.read()).get('ready'):
+                        break
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError('gunicorn did not become ready')
+            time.sleep(0.2)
+
+        def send(path):
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=30) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        run_load(send, requests[:args.warmup], args.concurrency)
+        return run_load(send, requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def time_it(fn, repeat=5, number=1):
+    """Best and median wall time of fn() in ms per call"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number * 1000)
+    return {'best_ms': round(min(timings), 4), 'median_ms': round(stats.median(timings), 4)}
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def bench_micro(args):
+    from estimation import estimate_pixel_value, estimate_pixel_values
+    from month_store import MonthStore, read_snapshot
+
+    data_dir = os.path.join(BACKEND_DIR, args.data_dir)
+    store = MonthStore(data_dir)
+    months = sorted(store)
+    statistics = store[months[0]]['statistics'] if months else {'mean': 20}
+    clicks = generate_clicks(args.micro_points, args.seed)
+    lats = [lat for lat, _ in clicks]
+    lngs = [lng for _, lng in clicks]
+
+    results = {
+        'estimate_pixel_value': time_it(lambda: [estimate_pixel_value(lat, lng, statistics) for lat, lng in clicks]),
+        'estimate_pixel_values': time_it(lambda: estimate_pixel_values(lats, lngs, statistics)),
+        'month_store_discover': time_it(lambda: MonthStore(data_dir), number=10),
+        'month_store_load': time_it(lambda: MonthStore(data_dir)[months[0]]) if months else None,
+        'month_json_load': time_it(lambda: [load_json(os.path.join(data_dir, f'{month}.json')) for month in months])
+    }
+    results['estimate_pixel_value']['points'] = len(clicks)
+    results['estimate_pixel_values']['points'] = len(clicks)
+    if 'snapshot' in store.source:
+        results['snapshot_read'] = time_it(lambda: read_snapshot(store.snapshot_path))
+
+    from lst_cube import LSTCube
+    if LSTCube.open(data_dir) is not None:
+        results['cube_open'] = time_it(lambda: LSTCube.open(data_dir))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def flatten(data, prefix=''):
+    flat = {}
+    for key, value in data.items():
+        name = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(before_path, after_path):
+    """Print every numeric result that differs between two runs"""
+    with open(before_path) as f:
+        before = flatten(json.load(f)['results'])
+    with open(after_path) as f:
+        after = flatten(json.load(f)['results'])
+
+    print(f"{'metric':<55} {'before':>12} {'after':>12} {'change':>9}")
+    for name in sorted(set(before) | set(after)):
+        old, new = before.get(name), after.get(name)
+        if old == new:
+            continue
+        change = f'{(new - old) / old * 100:+.1f}%' if old and new is not None else ''
+        print(f"{name:<55} {str(old):>12} {str(new):>12} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the LST API')
+    parser.add_argument('--mode', nargs='+', default=['test-client', 'micro'],
+                        choices=['test-client', 'gunicorn', 'micro'])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--shared-cache', action='store_true',
+                        help='keep the shared result table gunicorn.conf.py enables (off by default)')
+    parser.add_argument('--micro-points', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='precomputed_data')
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='diff two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    env = configure_environment(args)
+    from month_store import MonthStore
+    months = sorted(MonthStore(os.path.join(BACKEND_DIR, args.data_dir)))
+    if not months:
+        print(f"✗ No month data in {args.data_dir}")
+        return
+    requests = generate_requests(args.requests, months, args.seed)
+
+    results = {}
+    for mode in args.mode:
+        print(f"Running {mode} benchmark...")
+        if mode == 'test-client':
+            results[mode] = bench_test_client(args, requests)
+        elif mode == 'gunicorn':
+            results[mode] = bench_gunicorn(args, requests, env)
+        else:
+            results[mode] = bench_micro(args)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': vars(args)
+        },
+        'results': results
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"✓ Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
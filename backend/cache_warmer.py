@@ -0,0 +1,204 @@
+"""
+Access-log-driven pre-warming of the pixel result cache
+Point lookups are counted per MODIS pixel and month in a bounded hot set that
+is persisted to disk. On startup (once Earth Engine is ready) and after a data
+reload, a background thread samples the most requested pixels for the most
+requested months, rate-limited and paused while live requests are in flight,
+so a freshly deployed worker starts with a warm cache.
+"""
+
+import json
+import os
+import threading
+import time
+
+from result_cache import modis_pixel_index
+
+
+class HotSet:
+    """Request counts per MODIS pixel and per month (bounded, heaviest kept)"""
+
+    def __init__(self, maxsize=5000):
+        self.maxsize = maxsize
+        self._pixels = {}   # (row, col) -> [lat, lng, count]
+        self._months = {}
+        self._lock = threading.Lock()
+
+    def record(self, lat, lng, months):
+        key = modis_pixel_index(lat, lng)
+        with self._lock:
+            entry = self._pixels.get(key)
+            if entry is None:
+                entry = self._pixels[key] = [round(lat, 4), round(lng, 4), 0]
+            entry[2] += 1
+            for month in months:
+                self._months[month] = self._months.get(month, 0) + 1
+            if len(self._pixels) > 2 * self.maxsize:
+                self._trim()
+
+    def _trim(self):
+        heaviest = sorted(self._pixels.items(), key=lambda item: item[1][2], reverse=True)
+        self._pixels = dict(heaviest[:self.maxsize])
+
+    def top_pixels(self, n):
+        """[(lat, lng)] of the n most requested pixels"""
+        with self._lock:
+            entries = sorted(self._pixels.values(), key=lambda entry: entry[2], reverse=True)
+        return [(lat, lng) for lat, lng, _ in entries[:n]]
+
+    def top_months(self, n):
+        with self._lock:
+            return sorted(self._months, key=self._months.get, reverse=True)[:n]
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def load(self, path, decay=0.5):
+        """Merge a persisted hot set, scaling its counts by decay so it drifts with traffic"""
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        with self._lock:
+            for lat, lng, count in saved.get('pixels', []):
+                key = modis_pixel_index(lat, lng)
+                entry = self._pixels.setdefault(key, [lat, lng, 0])
+                entry[2] = max(entry[2], count * decay)
+            for month, count in saved.get('months', {}).items():
+                self._months[month] = max(self._months.get(month, 0), count * decay)
+            self._trim()
+        return len(saved.get('pixels', []))
+
+    def save(self, path, decay=0.5, min_count=0.1):
+        """Persist the hot set, merged (by max count) with what other workers saved
+
+        The saved counts are scaled by decay before the merge and ours right
+        after it, so every save halves the weight of past traffic and pixels
+        that stop being requested fall below min_count and age out.
+        """
+        merged = HotSet(self.maxsize)
+        merged.load(path, decay=decay)
+        with self._lock:
+            for key, (lat, lng, count) in self._pixels.items():
+                entry = merged._pixels.setdefault(key, [lat, lng, 0])
+                entry[2] = max(entry[2], count)
+            for month, count in self._months.items():
+                merged._months[month] = max(merged._months.get(month, 0), count)
+
+            self._pixels = {key: entry for key, entry in self._pixels.items() if entry[2] * decay >= min_count}
+            for entry in self._pixels.values():
+                entry[2] *= decay
+            self._months = {month: count * decay for month, count in self._months.items()
+                            if count * decay >= min_count}
+        merged._pixels = {key: entry for key, entry in merged._pixels.items() if entry[2] >= min_count}
+        merged._months = {month: count for month, count in merged._months.items() if count >= min_count}
+        merged._trim()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'pixels': sorted(merged._pixels.values(), key=lambda entry: entry[2], reverse=True),
+                'months': merged._months
+            }, f)
+        os.replace(tmp_path, path)
+
+
+class CacheWarmer:
+    """Background thread warming the top pixels whenever trigger() is called
+
+    warm_pixel(lat, lng, months) does the lookups for one pixel and returns
+    how many months it had to fetch; busy() returning True pauses warming.
+    """
+
+    def __init__(self, hot_set, warm_pixel, months, busy=lambda: False, top_n=200,
+                 rate=2.0, path=None, save_interval=300.0):
+        self.hot_set = hot_set
+        self.warm_pixel = warm_pixel
+        self.months = months
+        self.busy = busy
+        self.top_n = top_n
+        self.rate = rate
+        self.path = path
+        self.save_interval = save_interval
+        self._wake = threading.Event()
+        self._reason = None
+        self._thread = None
+        self.runs = 0
+        self.pixels_warmed = 0
+        self.months_fetched = 0
+        self.last_run = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+            self._thread.start()
+        return self
+
+    def trigger(self, reason):
+        self._reason = reason
+        self._wake.set()
+
+    def _run(self):
+        last_saved = time.monotonic()
+        while True:
+            woken = self._wake.wait(timeout=self.save_interval)
+            if woken:
+                self._wake.clear()
+                try:
+                    self.warm(self._reason)
+                except Exception as e:
+                    print(f"✗ Cache warming failed: {e}")
+            if self.path and time.monotonic() - last_saved >= self.save_interval:
+                self.save()
+                last_saved = time.monotonic()
+
+    def warm(self, reason=None):
+        """Warm the top pixels for the hot months, at most `rate` pixels per second"""
+        started = time.perf_counter()
+        months = self.months()
+        pixels = self.hot_set.top_pixels(self.top_n) if months else []
+        warmed = fetched = 0
+        for lat, lng in pixels:
+            while self.busy():
+                time.sleep(0.5)
+            if self._wake.is_set():
+                break  # a newer trigger (e.g. another reload) restarts warming
+            count = self.warm_pixel(lat, lng, months)
+            if count:
+                warmed += 1
+                fetched += count
+                time.sleep(1.0 / self.rate)
+
+        self.runs += 1
+        self.pixels_warmed += warmed
+        self.months_fetched += fetched
+        self.last_run = {
+            'reason': reason,
+            'pixels': len(pixels),
+            'months': len(months),
+            'pixels_warmed': warmed,
+            'months_fetched': fetched,
+            'seconds': round(time.perf_counter() - started, 1)
+        }
+        if warmed:
+            print(f"✓ Warmed {warmed} hot pixels ({fetched} month lookups) after {reason}")
+        return self.last_run
+
+    def save(self):
+        try:
+            self.hot_set.save(self.path)
+        except OSError as e:
+            print(f"Warning: Could not save hot set: {e}")
+
+    def stats(self):
+        return {
+            'hot_pixels': len(self.hot_set),
+            'top_n': self.top_n,
+            'rate_per_second': self.rate,
+            'runs': self.runs,
+            'pixels_warmed': self.pixels_warmed,
+            'months_fetched': self.months_fetched,
+            'last_run': self.last_run
+        }
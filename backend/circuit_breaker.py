@@ -0,0 +1,115 @@
+"""
+Latency budgets and a circuit breaker for Earth Engine calls
+A request gets one Deadline shared by all of its remote calls. The breaker opens
+after repeated failures or slow calls; while open, callers fall back immediately
+and a background probe decides when to close it again.
+"""
+
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class Deadline:
+    """Latency budget for one request"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires = time.monotonic() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures or slow calls;
+    open -> half-open after reset_timeout, when a single background probe runs;
+    a successful probe closes the breaker, a failed one re-opens it."""
+
+    def __init__(self, failure_threshold=5, slow_call_threshold=2.0, reset_timeout=30.0, probe_fn=None):
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_fn = probe_fn
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """True if a call may go upstream; starts a probe once the reset timeout passes"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            self.rejected += 1
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                if self.probe_fn is not None:
+                    threading.Thread(target=self._probe, name='breaker-probe', daemon=True).start()
+            return False
+
+    def _probe(self):
+        started = time.monotonic()
+        try:
+            self.probe_fn()
+            ok = time.monotonic() - started <= self.slow_call_threshold
+        except Exception as e:
+            print(f"Circuit breaker probe failed: {e}")
+            ok = False
+
+        with self._lock:
+            if ok:
+                self.state = CLOSED
+                self.consecutive_failures = 0
+                print("✓ Earth Engine circuit closed")
+            else:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def record_success(self, duration):
+        """Record a completed call; calls slower than the threshold count as failures"""
+        if duration > self.slow_call_threshold:
+            with self._lock:
+                self.slow_calls += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+                print(f"✗ Earth Engine circuit opened after {self.consecutive_failures} failures")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'successes': self.successes,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened
+            }
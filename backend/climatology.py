@@ -0,0 +1,231 @@
+"""
+Per-pixel monthly climatology (long-term normals) built incrementally
+For each calendar month and cube pixel we keep a running count, Welford mean
+and M2 (for the variance), min and max. Adding a month only touches its
+calendar-month slice, so new months are folded in without reprocessing the
+archive, and normals/anomalies are O(1) lookups at serve time.
+
+Update after a precompute or ingest run:  python climatology.py
+"""
+
+import calendar
+import json
+import math
+import os
+
+import numpy as np
+
+from lst_cube import CUBE_META_FILE, GRIDS_DIR
+
+CLIMATOLOGY_DIR = 'climatology'
+CLIMATOLOGY_META = 'climatology.json'
+FIELDS = {
+    'count': np.uint16,
+    'mean': np.float32,
+    'm2': np.float32,
+    'min': np.float32,
+    'max': np.float32
+}
+
+
+def grid_signature(path):
+    stat = os.stat(path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def calendar_index(month):
+    """'2024-07' -> 6"""
+    return int(month[5:7]) - 1
+
+
+class RunningClimatology:
+    """In-memory accumulators for all 12 calendar months"""
+
+    def __init__(self, rows, cols, arrays=None):
+        self.rows = rows
+        self.cols = cols
+        if arrays is None:
+            arrays = {
+                'count': np.zeros((12, rows, cols), dtype=FIELDS['count']),
+                'mean': np.zeros((12, rows, cols), dtype=FIELDS['mean']),
+                'm2': np.zeros((12, rows, cols), dtype=FIELDS['m2']),
+                'min': np.full((12, rows, cols), np.nan, dtype=FIELDS['min']),
+                'max': np.full((12, rows, cols), np.nan, dtype=FIELDS['max'])
+            }
+        self.arrays = arrays
+
+    def add(self, month, grid):
+        """Fold one month's grid (NaN = no data) into its calendar month (Welford update)"""
+        c = calendar_index(month)
+        x = np.asarray(grid, dtype=np.float64)
+        valid = ~np.isnan(x)
+
+        count = self.arrays['count'][c].astype(np.int64) + valid
+        mean = self.arrays['mean'][c].astype(np.float64)
+        delta = np.where(valid, x - mean, 0.0)
+        mean += np.divide(delta, count, out=np.zeros_like(delta), where=count > 0)
+        m2 = self.arrays['m2'][c] + delta * np.where(valid, x - mean, 0.0)
+
+        self.arrays['count'][c] = count
+        self.arrays['mean'][c] = mean
+        self.arrays['m2'][c] = m2
+        self.arrays['min'][c] = np.fmin(self.arrays['min'][c], x)
+        self.arrays['max'][c] = np.fmax(self.arrays['max'][c], x)
+
+
+def _load_meta(output_dir):
+    path = os.path.join(output_dir, CLIMATOLOGY_DIR, CLIMATOLOGY_META)
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def update_climatology(output_dir, force=False):
+    """Fold any new month grids into the climatology; rebuild if a grid changed
+
+    Returns the metadata dict, or None when there are no grids/cube yet.
+    """
+    grids_dir = os.path.join(output_dir, GRIDS_DIR)
+    try:
+        with open(os.path.join(output_dir, CUBE_META_FILE), 'r') as f:
+            cube_meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    signatures = {
+        name[:-4]: grid_signature(os.path.join(grids_dir, name))
+        for name in os.listdir(grids_dir) if name.endswith('.npy')
+    }
+    clim_dir = os.path.join(output_dir, CLIMATOLOGY_DIR)
+    meta = None if force else _load_meta(output_dir)
+
+    # Incremental only if every month already folded in is unchanged on disk
+    incremental = (
+        meta is not None
+        and meta['rows'] == cube_meta['rows'] and meta['cols'] == cube_meta['cols']
+        and all(signatures.get(month) == sig for month, sig in meta['months'].items())
+    )
+    if incremental:
+        pending = sorted(set(signatures) - set(meta['months']))
+        if not pending:
+            return meta
+        arrays = {name: np.load(os.path.join(clim_dir, f'{name}.npy')) for name in FIELDS}
+        running = RunningClimatology(meta['rows'], meta['cols'], arrays)
+        included = dict(meta['months'])
+    else:
+        pending = sorted(signatures)
+        running = RunningClimatology(cube_meta['rows'], cube_meta['cols'])
+        included = {}
+
+    for month in pending:
+        running.add(month, np.load(os.path.join(grids_dir, f'{month}.npy')))
+        included[month] = signatures[month]
+
+    os.makedirs(clim_dir, exist_ok=True)
+    for name, array in running.arrays.items():
+        path = os.path.join(clim_dir, f'{name}.npy')
+        with open(f'{path}.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(f'{path}.tmp', path)
+
+    meta = {
+        'rows': running.rows,
+        'cols': running.cols,
+        'bbox': cube_meta['bbox'],
+        'resolution': cube_meta['resolution'],
+        'months': dict(sorted(included.items()))
+    }
+    meta_path = os.path.join(clim_dir, CLIMATOLOGY_META)
+    with open(f'{meta_path}.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f'{meta_path}.tmp', meta_path)
+    print(f"🌡️  Climatology: {len(pending)} month(s) {'added' if incremental else 'rebuilt'}, "
+          f"{len(included)} in total")
+    return meta
+
+
+class Climatology:
+    """Read-only memory-mapped normals on the cube grid"""
+
+    def __init__(self, data_dir):
+        clim_dir = os.path.join(data_dir, CLIMATOLOGY_DIR)
+        meta_path = os.path.join(clim_dir, CLIMATOLOGY_META)
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+
+        self.bbox = meta['bbox']
+        self.resolution = meta['resolution']
+        self.rows = meta['rows']
+        self.cols = meta['cols']
+        self.months = sorted(meta['months'])
+        self.version = format(os.stat(meta_path).st_mtime_ns, 'x')
+        for name in FIELDS:
+            setattr(self, name, np.load(os.path.join(clim_dir, f'{name}.npy'), mmap_mode='r'))
+
+    @classmethod
+    def open(cls, data_dir):
+        if not os.path.exists(os.path.join(data_dir, CLIMATOLOGY_DIR, CLIMATOLOGY_META)):
+            return None
+        return cls(data_dir)
+
+    def pixel_index(self, lat, lng):
+        row = int(math.floor((self.bbox['north'] - lat) / self.resolution))
+        col = int(math.floor((lng - self.bbox['west']) / self.resolution))
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def normal(self, lat, lng, calendar_month):
+        """Normal for one calendar month (0-11) at a point, or None without data"""
+        index = self.pixel_index(lat, lng)
+        if index is None:
+            return None
+        row, col = index
+        count = int(self.count[calendar_month, row, col])
+        if count == 0:
+            return None
+        m2 = float(self.m2[calendar_month, row, col])
+        return {
+            'calendar_month': calendar_month + 1,
+            'name': calendar.month_name[calendar_month + 1],
+            'mean': round(float(self.mean[calendar_month, row, col]), 2),
+            'std_dev': round(math.sqrt(max(m2, 0.0) / (count - 1)), 2) if count > 1 else None,
+            'min': round(float(self.min[calendar_month, row, col]), 2),
+            'max': round(float(self.max[calendar_month, row, col]), 2),
+            'years': count
+        }
+
+    def normals(self, lat, lng):
+        """All 12 calendar-month normals at a point (None for months without data)"""
+        return [self.normal(lat, lng, c) for c in range(12)]
+
+    def anomaly(self, lat, lng, month, value):
+        """value minus the normal for month's calendar month, with a z-score when defined"""
+        normal = self.normal(lat, lng, calendar_index(month))
+        if normal is None or value is None:
+            return None
+        anomaly = value - normal['mean']
+        return {
+            'anomaly': round(anomaly, 2),
+            'z_score': round(anomaly / normal['std_dev'], 2) if normal['std_dev'] else None,
+            'normal': normal
+        }
+
+    def stats(self):
+        return {
+            'months': len(self.months),
+            'first': self.months[0] if self.months else None,
+            'last': self.months[-1] if self.months else None
+        }
+
+
+def main():
+    meta = update_climatology('precomputed_data')
+    if meta is None:
+        print("✗ No LST cube/grids in precomputed_data - run Preprocess_as_jasen.py first")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Per-month value distributions: fixed-bin histograms and quantile sketches
+For every month (and every region in an optional regions GeoJSON) the
+precompute stores a 1°C histogram and a DDSketch-style log-bucket quantile
+sketch over all valid cube pixels, inside the state polygon once the precompute
+has exported it (like the month statistics). Both are plain count arrays on
+fixed global bins, so any month range is merged by summing rows, and
+percentiles come back within SKETCH_ALPHA relative error (about ±0.06°C) in
+microseconds.
+
+Rebuild after a precompute or ingest run:  python distributions.py
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+from lst_cube import GRIDS_DIR, STATE_GEOMETRY_FILE, LSTCube
+from climatology import grid_signature
+from zonal import polygon_rings, rasterize_polygon
+
+DISTRIBUTIONS_FILE = 'distributions.npz'
+REGIONS_FILE = os.getenv('LST_REGIONS_FILE', 'regions.geojson')   # relative to the data dir
+ALL_REGION = 'all'
+
+# Histogram: 1°C bins from -30 to 60°C plus underflow/overflow bins
+HIST_MIN, HIST_MAX, HIST_WIDTH = -30, 60, 1
+HIST_BINS = (HIST_MAX - HIST_MIN) // HIST_WIDTH
+
+# Quantile sketch: bucket i holds Kelvin values in (gamma^(i-1), gamma^i]
+SKETCH_ALPHA = 0.0002
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+SKETCH_LOG_GAMMA = math.log(SKETCH_GAMMA)
+KELVIN_MIN, KELVIN_MAX = 223.15, 353.15   # -50 to 80°C; values outside are clamped
+SKETCH_OFFSET = math.ceil(math.log(KELVIN_MIN) / SKETCH_LOG_GAMMA)
+SKETCH_BUCKETS = math.ceil(math.log(KELVIN_MAX) / SKETCH_LOG_GAMMA) - SKETCH_OFFSET + 1
+
+
+def histogram_counts(values):
+    """[underflow, HIST_BINS bins, overflow] counts for °C values"""
+    index = np.floor((values - HIST_MIN) / HIST_WIDTH).astype(np.int64) + 1
+    return np.bincount(np.clip(index, 0, HIST_BINS + 1), minlength=HIST_BINS + 2)
+
+
+def sketch_counts(values):
+    kelvin = np.clip(values + 273.15, KELVIN_MIN, KELVIN_MAX)
+    index = np.ceil(np.log(kelvin) / SKETCH_LOG_GAMMA).astype(np.int64) - SKETCH_OFFSET
+    return np.bincount(index, minlength=SKETCH_BUCKETS)
+
+
+def sketch_quantiles(counts, quantiles, low=None, high=None):
+    """Values (°C) at the given quantiles of a sketch, clamped to the exact min/max"""
+    total = counts.sum()
+    if total == 0:
+        return [None] * len(quantiles)
+    cumulative = np.cumsum(counts)
+    values = []
+    for q in quantiles:
+        bucket = int(np.searchsorted(cumulative, q * (total - 1), side='right'))
+        value = 2 * SKETCH_GAMMA ** (bucket + SKETCH_OFFSET) / (SKETCH_GAMMA + 1) - 273.15
+        if low is not None:
+            value = min(max(value, low), high)
+        values.append(value)
+    return values
+
+
+def load_regions(data_dir, cube):
+    """[(name, ZoneMask)] for the features of data_dir/REGIONS_FILE, if present"""
+    path = os.path.join(data_dir, REGIONS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        collection = json.load(f)
+    regions = []
+    for i, feature in enumerate(collection.get('features', [])):
+        name = str((feature.get('properties') or {}).get('name') or f'region_{i}')
+        regions.append((name, rasterize_polygon(cube, polygon_rings(feature))))
+    return regions
+
+
+def load_state_zone(data_dir, cube):
+    """ZoneMask of the state polygon in data_dir/STATE_GEOMETRY_FILE, or None if absent"""
+    path = os.path.join(data_dir, STATE_GEOMETRY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return rasterize_polygon(cube, polygon_rings(json.load(f)))
+
+
+def month_distribution(grid, regions, state=None):
+    """(hist, sketch, minmax) rows for the state (or the whole grid) followed by each region"""
+    whole = grid[state.rows, state.cols][state.mask] if state is not None else grid.ravel()
+    selections = [whole] + [grid[zone.rows, zone.cols][zone.mask] for _, zone in regions]
+    hist = np.zeros((len(selections), HIST_BINS + 2), dtype=np.uint32)
+    sketch = np.zeros((len(selections), SKETCH_BUCKETS), dtype=np.uint32)
+    minmax = np.full((len(selections), 2), np.nan, dtype=np.float32)
+    for r, values in enumerate(selections):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size:
+            hist[r] = histogram_counts(values)
+            sketch[r] = sketch_counts(values)
+            minmax[r] = values.min(), values.max()
+    return hist, sketch, minmax
+
+
+def build_distributions(output_dir):
+    """Write distributions.npz for every month grid; months whose grid (and the
+    regions and state files) are unchanged are copied from the previous file.
+    Returns (path, months) or None without a cube."""
+    cube = LSTCube.open(output_dir)
+    grids_dir = os.path.join(output_dir, GRIDS_DIR)
+    if cube is None or not os.path.isdir(grids_dir):
+        return None
+
+    regions = load_regions(output_dir, cube)
+    state = load_state_zone(output_dir, cube)
+    names = [ALL_REGION] + [name for name, _ in regions]
+    regions_path = os.path.join(output_dir, REGIONS_FILE)
+    regions_signature = grid_signature(regions_path) if regions else ''
+    if state is not None:
+        regions_signature += '|state:' + grid_signature(os.path.join(output_dir, STATE_GEOMETRY_FILE))
+    signatures = {name[:-4]: grid_signature(os.path.join(grids_dir, name))
+                  for name in os.listdir(grids_dir) if name.endswith('.npy')}
+    months = sorted(signatures)
+
+    previous = {}
+    path = os.path.join(output_dir, DISTRIBUTIONS_FILE)
+    if os.path.exists(path):
+        with np.load(path) as old:
+            if (old['regions'].tolist() == names and str(old['regions_signature']) == regions_signature
+                    and old['sketch'].shape[2] == SKETCH_BUCKETS):
+                for i, (month, signature) in enumerate(zip(old['months'].tolist(), old['signatures'].tolist())):
+                    if signatures.get(month) == signature:
+                        previous[month] = (old['hist'][i], old['sketch'][i], old['minmax'][i])
+
+    hist = np.zeros((len(months), len(names), HIST_BINS + 2), dtype=np.uint32)
+    sketch = np.zeros((len(months), len(names), SKETCH_BUCKETS), dtype=np.uint32)
+    minmax = np.full((len(months), len(names), 2), np.nan, dtype=np.float32)
+    for i, month in enumerate(months):
+        if month not in previous:
+            previous[month] = month_distribution(np.load(os.path.join(grids_dir, f'{month}.npy')), regions, state)
+        hist[i], sketch[i], minmax[i] = previous[month]
+
+    with open(f'{path}.tmp', 'wb') as f:
+        np.savez_compressed(f, months=np.array(months), signatures=np.array([signatures[m] for m in months]),
+                            regions=np.array(names), regions_signature=np.array(regions_signature),
+                            hist=hist, sketch=sketch, minmax=minmax)
+    os.replace(f'{path}.tmp', path)
+    return path, len(months)
+
+
+class Distributions:
+    """In-memory per-month histograms and sketches, merged on request"""
+
+    def __init__(self, data_dir):
+        path = os.path.join(data_dir, DISTRIBUTIONS_FILE)
+        with np.load(path) as data:
+            self.months = data['months'].tolist()
+            self.regions = data['regions'].tolist()
+            self.hist = data['hist']
+            self.sketch = data['sketch']
+            self.minmax = data['minmax']
+        self.month_index = {m: i for i, m in enumerate(self.months)}
+        self.region_index = {r: i for i, r in enumerate(self.regions)}
+        self.version = format(os.stat(path).st_mtime_ns, 'x')
+
+    @classmethod
+    def open(cls, data_dir):
+        if not os.path.exists(os.path.join(data_dir, DISTRIBUTIONS_FILE)):
+            return None
+        return cls(data_dir)
+
+    def summary(self, months, region=ALL_REGION, quantiles=(0.02, 0.25, 0.5, 0.75, 0.98)):
+        """Merged count/min/max/quantiles/histogram over months (unknown months are skipped)"""
+        r = self.region_index[region]
+        rows = [self.month_index[m] for m in months if m in self.month_index]
+        if not rows:
+            return None
+        hist = self.hist[rows, r].sum(axis=0, dtype=np.int64)
+        sketch = self.sketch[rows, r].sum(axis=0, dtype=np.int64)
+        count = int(sketch.sum())
+        if count == 0:
+            return None
+        low = float(np.nanmin(self.minmax[rows, r, 0]))
+        high = float(np.nanmax(self.minmax[rows, r, 1]))
+        values = sketch_quantiles(sketch, quantiles, low, high)
+        return {
+            'count': count,
+            'min': round(low, 2),
+            'max': round(high, 2),
+            'quantiles': {f'p{q * 100:g}': round(v, 2) for q, v in zip(quantiles, values)},
+            'histogram': {
+                'bin_start': HIST_MIN,
+                'bin_width': HIST_WIDTH,
+                'below': int(hist[0]),
+                'counts': hist[1:-1].tolist(),
+                'above': int(hist[-1])
+            }
+        }
+
+    def stats(self):
+        return {'months': len(self.months), 'regions': self.regions}
+
+
+def main():
+    result = build_distributions('precomputed_data')
+    if result is None:
+        print("✗ No LST cube/grids in precomputed_data - run Preprocess_as_jasen.py first")
+    else:
+        path, count = result
+        print(f"✓ Distributions for {count} months: {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
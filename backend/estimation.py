@@ -0,0 +1,172 @@
+"""
+Heuristic LST estimation used when no sampled value is available
+estimate_pixel_value is the scalar version; estimate_pixel_values computes the
+same numbers for whole arrays of coordinates in one vectorized call
+"""
+
+import json
+import math
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+# Urban heat islands with actual city locations
+URBAN_ADJUSTMENTS = [
+    (40.7128, -74.0060, 3.0),   # NYC - strongest
+    (40.6892, -74.0445, 2.5),   # Jersey City
+    (40.7614, -73.9776, 2.8),   # Manhattan
+    (40.6782, -73.9442, 2.2),   # Brooklyn
+    (40.7282, -73.7949, 2.0),   # Queens
+    (40.8448, -73.8648, 1.8),   # Bronx
+    (42.8864, -78.8784, 1.5),   # Buffalo
+    (43.0481, -76.1474, 1.2),   # Syracuse
+    (42.6526, -73.7562, 1.2),   # Albany
+    (43.1566, -77.6088, 1.2),   # Rochester
+    (42.0987, -75.9180, 0.8),   # Binghamton
+    (44.9808, -74.7095, 0.5),   # Massena
+    (43.1009, -75.2327, 0.8),   # Utica
+]
+URBAN_RADIUS = 0.3  # ~30km
+
+# Elevation effects for major geographic features, checked in order:
+# (lat_min, lat_max, lng_min, lng_max, effect) with exclusive bounds
+ELEVATION_ZONES = [
+    (43.5, 44.8, -74.7, -73.5, -3.5),              # Adirondacks High Peaks
+    (43.0, 43.5, -74.5, -73.8, -2.5),              # Southern Adirondacks
+    (41.9, 42.3, -74.5, -74.0, -2.0),              # Catskills
+    (43.5, math.inf, -76.0, -75.0, -1.8),          # Tug Hill Plateau
+    (42.0, 42.5, -77.0, -76.0, -0.5),              # Finger Lakes region
+]
+
+_URBAN = np.array(URBAN_ADJUSTMENTS, dtype=np.float64)
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+@lru_cache(maxsize=256)
+def _digest_items(items):
+    return zlib.crc32(json.dumps(items).encode())
+
+
+def statistics_digest(statistics):
+    """Stable 32-bit digest of a statistics dict (same in every process)"""
+    return _digest_items(tuple(sorted(statistics.items())))
+
+
+def _mix64(x):
+    """splitmix64 finalizer on a Python int"""
+    x &= _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _mix64_array(x):
+    """splitmix64 finalizer on a uint64 array (wrapping arithmetic)"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _jitter(lat, lng, digest):
+    """Deterministic variation in [-0.5, 0.5) for a location and month"""
+    h = _mix64(int(lat * 10000 + lng * 10000) + digest)
+    return (h >> 11) / 9007199254740992.0 - 0.5
+
+
+def _jitter_array(lats, lngs, digests):
+    seeds = np.trunc(lats * 10000 + lngs * 10000).astype(np.int64) + digests
+    with np.errstate(over='ignore'):
+        h = _mix64_array(seeds.view(np.uint64))
+    return (h >> np.uint64(11)).astype(np.float64) / 9007199254740992.0 - 0.5
+
+
+def estimate_pixel_value(lat, lng, statistics):
+    """Enhanced estimation with detailed geographic variation"""
+    mean = statistics.get('mean', 20)
+    min_val = statistics.get('min', mean - 5)
+    max_val = statistics.get('max', mean + 5)
+
+    # Temperature decreases ~0.6°C per degree latitude northward
+    lat_effect = (43.0 - lat) * 0.6
+
+    # Lake effect - cooler near Great Lakes
+    lake_effect = 0
+    if lng < -77 and lat > 43:  # Near Lake Ontario
+        lake_effect = -1.0
+    elif lng < -79 and lat > 42:  # Near Lake Erie
+        lake_effect = -0.8
+
+    urban_effect = 0
+    for city_lat, city_lng, intensity in URBAN_ADJUSTMENTS:
+        distance = math.sqrt((lat - city_lat)**2 + (lng - city_lng)**2)
+        if distance < URBAN_RADIUS:
+            effect = intensity * (URBAN_RADIUS - distance) / URBAN_RADIUS
+            urban_effect = max(urban_effect, effect)
+
+    elevation_effect = 0
+    for lat_min, lat_max, lng_min, lng_max, effect in ELEVATION_ZONES:
+        if lat_min < lat < lat_max and lng_min < lng < lng_max:
+            elevation_effect = effect
+            break
+
+    # Calculate final temperature
+    temperature = mean + lat_effect + lake_effect + urban_effect + elevation_effect
+
+    # Add small consistent variation for realism (stable across processes)
+    temperature += _jitter(lat, lng, statistics_digest(statistics))
+
+    # Clamp to realistic range
+    return max(min_val, min(max_val, temperature))
+
+
+def estimate_pixel_values(lats, lngs, statistics):
+    """Vectorized estimate_pixel_value
+
+    statistics is either one dict for all points or a sequence with one dict
+    per point (e.g. the statistics of each point's month).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+
+    if isinstance(statistics, dict):
+        statistics = [statistics]
+        index = np.zeros(lats.shape, dtype=np.int64)
+    else:
+        # Deduplicate so each distinct statistics dict is digested once
+        unique, index = {}, []
+        for stats in statistics:
+            index.append(unique.setdefault(id(stats), (len(unique), stats))[0])
+        statistics = [stats for _, stats in unique.values()]
+        index = np.asarray(index, dtype=np.int64)
+
+    means = np.array([s.get('mean', 20) for s in statistics], dtype=np.float64)
+    mins = np.array([s.get('min', m - 5) for s, m in zip(statistics, means)], dtype=np.float64)
+    maxs = np.array([s.get('max', m + 5) for s, m in zip(statistics, means)], dtype=np.float64)
+    digests = np.array([statistics_digest(s) for s in statistics], dtype=np.int64)
+
+    lat_effect = (43.0 - lats) * 0.6
+
+    lake_effect = np.select(
+        [(lngs < -77) & (lats > 43), (lngs < -79) & (lats > 42)],
+        [-1.0, -0.8],
+        default=0.0
+    )
+
+    distance = np.sqrt((lats[:, None] - _URBAN[:, 0])**2 + (lngs[:, None] - _URBAN[:, 1])**2)
+    effect = np.where(distance < URBAN_RADIUS, _URBAN[:, 2] * (URBAN_RADIUS - distance) / URBAN_RADIUS, 0.0)
+    urban_effect = effect.max(axis=1, initial=0.0)
+
+    elevation_effect = np.select(
+        [(lat_min < lats) & (lats < lat_max) & (lng_min < lngs) & (lngs < lng_max)
+         for lat_min, lat_max, lng_min, lng_max, _ in ELEVATION_ZONES],
+        [zone[4] for zone in ELEVATION_ZONES],
+        default=0.0
+    )
+
+    temperature = means[index] + lat_effect + lake_effect + urban_effect + elevation_effect
+    temperature += _jitter_array(lats, lngs, digests[index])
+
+    return np.maximum(mins[index], np.minimum(maxs[index], temperature))
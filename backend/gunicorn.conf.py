@@ -0,0 +1,52 @@
+"""
+Gunicorn settings (picked up automatically by `gunicorn app:app` from this directory)
+The master imports the app once (preload_app) and builds the read-mostly
+state before forking, so month payloads, prepared responses, spatial indexes
+and distributions are shared copy-on-write, and the memory-mapped cube and
+climatology share one page cache. Sampled values go to a hash table in shared
+memory (result_cache.SharedMemoryResultStore), so a value fetched by one worker
+is a cache hit in all of them. The table is private to this master: its file
+is named after the master's pid (or LST_DEPLOY_ID) and sampler backend, and is
+unlinked once the workers can no longer need the name.
+"""
+
+import os
+
+os.environ.setdefault('LST_PRELOAD', '1')
+os.environ.setdefault('LST_SHARED_CACHE', '1')
+os.environ.setdefault('LST_DEPLOY_ID', str(os.getpid()))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+preload_app = os.environ['LST_PRELOAD'] == '1'
+
+
+def _lst_app():
+    import app
+    return app
+
+
+def _remove_shared_cache():
+    from result_cache import remove_shared_cache
+    remove_shared_cache()
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before any worker forks
+    if preload_app:
+        _lst_app().prepare_for_fork()
+        # The master already maps the table and workers inherit the mapping, so
+        # the name can go now; the memory is freed when the last process exits
+        _remove_shared_cache()
+
+
+def on_exit(server):
+    # Without preload each worker opens the table by name
+    _remove_shared_cache()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        _lst_app().after_fork()
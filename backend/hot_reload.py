@@ -0,0 +1,149 @@
+"""
+Hot reload of precomputed data without restarting workers
+DataWatcher polls precomputed_data/ and calls back once a changed set of
+files has stopped changing; the app then validates the new data off the
+request path and swaps it in, invalidating only the entries for months that
+changed. invalidatable_lru_cache is functools.lru_cache with per-key
+invalidation, for caches keyed by month.
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def invalidatable_lru_cache(maxsize=128):
+    """lru_cache replacement adding fn.cache_invalidate(*args) for one entry"""
+
+    def decorator(fn):
+        entries = OrderedDict()
+        lock = threading.Lock()
+        counts = {'hits': 0, 'misses': 0}
+
+        @wraps(fn)
+        def wrapper(*args):
+            with lock:
+                if args in entries:
+                    entries.move_to_end(args)
+                    counts['hits'] += 1
+                    return entries[args]
+                counts['misses'] += 1
+            value = fn(*args)
+            with lock:
+                entries[args] = value
+                entries.move_to_end(args)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return value
+
+        def cache_invalidate(*args):
+            with lock:
+                return entries.pop(args, None) is not None
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        def cache_info():
+            with lock:
+                return CacheInfo(counts['hits'], counts['misses'], maxsize, len(entries))
+
+        wrapper.cache_invalidate = cache_invalidate
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_info = cache_info
+        return wrapper
+
+    return decorator
+
+
+def directory_fingerprint(data_dir, subdirs=()):
+    """{relative path: (size, mtime_ns)} for the files directly in data_dir and subdirs"""
+    fingerprint = {}
+    for subdir in ('',) + tuple(subdirs):
+        path = os.path.join(data_dir, subdir)
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.endswith('.tmp') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            fingerprint[os.path.join(subdir, entry.name)] = (stat.st_size, stat.st_mtime_ns)
+    return fingerprint
+
+
+class DataWatcher:
+    """Background poller that calls on_change(changed_paths) for settled changes
+
+    A change is only reported once two consecutive polls agree, so a
+    precompute run that is still writing files triggers one reload at the end
+    rather than one per file.
+    """
+
+    def __init__(self, data_dir, on_change, interval=30.0, subdirs=()):
+        self.data_dir = data_dir
+        self.on_change = on_change
+        self.interval = interval
+        self.subdirs = subdirs
+        self._applied = directory_fingerprint(data_dir, subdirs)
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.checks = 0
+        self.reloads = 0
+        self.last_error = None
+
+    def start(self):
+        if (self._thread is None or not self._thread.is_alive()) and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='data-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Poll once; returns True if on_change ran"""
+        self.checks += 1
+        current = directory_fingerprint(self.data_dir, self.subdirs)
+        if current == self._applied:
+            self._pending = None
+            return False
+        if current != self._pending:
+            self._pending = current  # still changing, wait for it to settle
+            return False
+
+        changed = sorted(path for path in set(current) | set(self._applied)
+                         if current.get(path) != self._applied.get(path))
+        self._pending = None
+        try:
+            self.on_change(changed)
+        except Exception as e:
+            # _applied is left as it was, so the same change is retried on the next polls
+            self.last_error = str(e)
+            print(f"✗ Reload after changes to {len(changed)} file(s) failed, will retry: {e}")
+            return True
+        self._applied = current
+        self.reloads += 1
+        self.last_error = None
+        return True
+
+    def stats(self):
+        return {
+            'interval_seconds': self.interval,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'checks': self.checks,
+            'reloads': self.reloads,
+            'last_error': self.last_error
+        }
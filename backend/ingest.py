@@ -0,0 +1,367 @@
+"""
+Offline ingest of raw MOD11A2 granules (no Earth Engine session needed)
+Reads local 8-day LST granules, applies the same QC mask and scaling as the
+Earth Engine pipeline (QC_Day bits 0-1 <= 1, DN x 0.02 - 273.15) with NumPy in
+fixed-size row chunks, and averages them per month on the 1km cube grid. Months
+run in parallel across a process pool; the output is the same month JSON,
+grids, snapshot and cube that Preprocess_as_jasen.py writes. Month statistics
+and grid points are restricted to the NY state polygon (ny_state.geojson, written
+by the precompute) like reduceRegion over NY_GEOM; without it they cover the
+whole cube bbox.
+
+Granules are matched by their MODIS name (MOD11A2.AYYYYDDD.hHHvVV...):
+  *.hdf                                   HDF4-EOS granules (rasterio with HDF4 support)
+  *LST_Day_1km*.tif + *QC_Day*.tif        per-band GeoTIFF exports (rasterio)
+  *.npz with LST_Day_1km and QC_Day       pre-extracted arrays (NumPy only)
+
+    python ingest.py /data/mod11a2 --start 2000-02 --end 2024-12 --workers 16
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from lst_cube import NY_BBOX, CUBE_RESOLUTION, GRIDS_DIR, STATE_GEOMETRY_FILE, cube_shape, save_month_grid, build_cube
+from climatology import update_climatology
+from distributions import build_distributions
+from month_store import build_snapshot, month_label
+from zonal import polygon_rings, rasterize_polygon
+
+try:
+    import rasterio
+    from rasterio.windows import Window
+except ImportError:
+    rasterio = None
+
+INGEST_VERSION = 2
+CHUNK_ROWS = int(os.getenv('LST_INGEST_CHUNK_ROWS', '240'))  # granule rows read at a time
+
+# Same as the grid in Preprocess_as_jasen.py
+GRID_LATS = range(41, 45)
+GRID_LNGS = range(-79, -72)
+
+# MODIS sinusoidal grid (10 x 10 degree tiles of 1200 x 1200 pixels at 1km)
+SPHERE_RADIUS = 6371007.181
+GRID_ORIGIN_X = -20015109.354
+GRID_ORIGIN_Y = 10007554.677
+TILE_SIZE_M = 1111950.5197665554
+TILE_PIXELS = 1200
+PIXEL_SIZE_M = TILE_SIZE_M / TILE_PIXELS
+
+GRANULE_PATTERN = re.compile(r'MOD11A2\.A(\d{4})(\d{3})\.h(\d{2})v(\d{2})')
+LST_SCALE = 0.02
+KELVIN_OFFSET = 273.15
+
+
+def cube_pixel_sources(bbox=NY_BBOX, resolution=CUBE_RESOLUTION):
+    """Map every cube pixel centre to its MODIS (h, v) tile and row/col in that tile
+
+    Returns {(h, v): (cube_flat_index, tile_row, tile_col)} with entries sorted by
+    tile_row, so a chunk of granule rows maps to a contiguous slice.
+    """
+    rows, cols = cube_shape(bbox, resolution)
+    lats = bbox['north'] - (np.arange(rows) + 0.5) * resolution
+    lngs = bbox['west'] + (np.arange(cols) + 0.5) * resolution
+    lat_grid, lng_grid = np.meshgrid(np.radians(lats), np.radians(lngs), indexing='ij')
+
+    x = SPHERE_RADIUS * lng_grid * np.cos(lat_grid)
+    y = SPHERE_RADIUS * lat_grid
+    h = np.floor((x - GRID_ORIGIN_X) / TILE_SIZE_M).astype(np.int64)
+    v = np.floor((GRID_ORIGIN_Y - y) / TILE_SIZE_M).astype(np.int64)
+    tile_col = np.floor((x - (GRID_ORIGIN_X + h * TILE_SIZE_M)) / PIXEL_SIZE_M).astype(np.int64)
+    tile_row = np.floor(((GRID_ORIGIN_Y - v * TILE_SIZE_M) - y) / PIXEL_SIZE_M).astype(np.int64)
+    tile_col = np.clip(tile_col, 0, TILE_PIXELS - 1)
+    tile_row = np.clip(tile_row, 0, TILE_PIXELS - 1)
+
+    flat = np.arange(rows * cols)
+    h, v, tile_row, tile_col = h.ravel(), v.ravel(), tile_row.ravel(), tile_col.ravel()
+    sources = {}
+    for tile in set(zip(h.tolist(), v.tolist())):
+        selected = np.flatnonzero((h == tile[0]) & (v == tile[1]))
+        order = np.argsort(tile_row[selected], kind='stable')
+        selected = selected[order]
+        sources[tile] = (flat[selected], tile_row[selected], tile_col[selected])
+    return sources
+
+
+def parse_granule_name(path):
+    """(start date, (h, v)) from a MOD11A2 file name, or None"""
+    match = GRANULE_PATTERN.search(os.path.basename(path))
+    if not match:
+        return None
+    year, doy, h, v = (int(g) for g in match.groups())
+    return date(year, 1, 1) + timedelta(days=doy - 1), (h, v)
+
+
+def find_granules(input_dir):
+    """{month: [(path, (h, v))]} keyed by each composite's start date, like filterDate in EE"""
+    months = {}
+    for path in sorted(glob.glob(os.path.join(input_dir, '**', 'MOD11A2.*'), recursive=True)):
+        lower = path.lower()
+        if lower.endswith('.tif') and 'lst_day_1km' not in lower:
+            continue  # the QC_Day half of a GeoTIFF pair
+        if not lower.endswith(('.hdf', '.tif', '.npz')):
+            continue
+        parsed = parse_granule_name(path)
+        if parsed is None:
+            continue
+        start, tile = parsed
+        months.setdefault(start.strftime('%Y-%m'), []).append((path, tile))
+    return months
+
+
+class GranuleReader:
+    """Reads LST_Day_1km and QC_Day of one granule in row chunks"""
+
+    def __init__(self, path):
+        self.path = path
+        lower = path.lower()
+        if lower.endswith('.npz'):
+            self._arrays = np.load(path)
+            self._sources = None
+        else:
+            if rasterio is None:
+                raise RuntimeError(f'Reading {os.path.basename(path)} requires rasterio (pip install rasterio)')
+            self._arrays = None
+            if lower.endswith('.hdf'):
+                subdataset = 'HDF4_EOS:EOS_GRID:"{}":MODIS_Grid_8Day_1km_LST:{}'
+                self._sources = [rasterio.open(subdataset.format(path, band)) for band in ('LST_Day_1km', 'QC_Day')]
+            else:
+                qc_path = re.sub('LST_Day_1km', 'QC_Day', path, flags=re.IGNORECASE)
+                self._sources = [rasterio.open(path), rasterio.open(qc_path)]
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        """Yield (first_row, lst_dn, qc) blocks of at most chunk_rows rows"""
+        if self._arrays is not None:
+            lst, qc = self._arrays['LST_Day_1km'], self._arrays['QC_Day']
+            for row in range(0, lst.shape[0], chunk_rows):
+                yield row, lst[row:row + chunk_rows], qc[row:row + chunk_rows]
+            return
+
+        lst_src, qc_src = self._sources
+        for row in range(0, lst_src.height, chunk_rows):
+            window = Window(0, row, lst_src.width, min(chunk_rows, lst_src.height - row))
+            yield row, lst_src.read(1, window=window), qc_src.read(1, window=window)
+
+    def close(self):
+        if self._arrays is not None:
+            self._arrays.close()
+        for source in self._sources or []:
+            source.close()
+
+
+def scale_lst(lst_dn, qc):
+    """Vectorized lst_celsius / lst_celsius_qc: (celsius, valid, good_quality)"""
+    lst_dn = np.asarray(lst_dn)
+    valid = lst_dn > 0  # 0 is the fill value
+    celsius = lst_dn.astype(np.float64) * LST_SCALE - KELVIN_OFFSET
+    good = valid & ((np.asarray(qc) & 3) <= 1)
+    return celsius, valid, good
+
+
+def accumulate_granule(path, tile, sources, sums, counts, chunk_rows=CHUNK_ROWS):
+    """Add one granule into the running per-pixel sums/counts
+
+    sums/counts hold two rows: [0] all valid pixels (the unmasked monthly
+    mean used for statistics), [1] good/marginal QC pixels (the cube grid).
+    """
+    if tile not in sources:
+        return False
+    flat, tile_rows, tile_cols = sources[tile]
+
+    reader = GranuleReader(path)
+    try:
+        for first_row, lst_dn, qc in reader.chunks(chunk_rows):
+            low = np.searchsorted(tile_rows, first_row)
+            high = np.searchsorted(tile_rows, first_row + lst_dn.shape[0])
+            if low == high:
+                continue
+            rows = tile_rows[low:high] - first_row
+            cols = tile_cols[low:high]
+            celsius, valid, good = scale_lst(lst_dn[rows, cols], qc[rows, cols])
+            targets = flat[low:high]
+
+            # Each cube pixel maps to one source pixel per granule, so plain
+            # fancy-index adds are safe (no duplicate targets)
+            sums[0, targets[valid]] += celsius[valid]
+            counts[0, targets[valid]] += 1
+            sums[1, targets[good]] += celsius[good]
+            counts[1, targets[good]] += 1
+    finally:
+        reader.close()
+    return True
+
+
+def load_state_mask(path, bbox=NY_BBOX, resolution=CUBE_RESOLUTION):
+    """rows x cols mask of the cube pixels inside a GeoJSON state polygon (clip(NY_GEOM))"""
+    with open(path, 'r') as f:
+        geometry = json.load(f)
+    rows, cols = cube_shape(bbox, resolution)
+    grid = SimpleNamespace(bbox=bbox, resolution=resolution, rows=rows, cols=cols,
+                           pixel_index=lambda lat, lng: None)
+    zone = rasterize_polygon(grid, polygon_rings(geometry))
+    mask = np.zeros((rows, cols), dtype=bool)
+    mask[zone.rows, zone.cols] = zone.mask
+    if not mask.any():
+        raise ValueError(f'{path} does not cover any cube pixel')
+    return mask
+
+
+def sample_grid_points(grid, bbox=NY_BBOX, resolution=CUBE_RESOLUTION):
+    """grid_points from the pixels under GRID_LATS x GRID_LNGS (like reduceRegions at 1km)"""
+    points = []
+    for lat in GRID_LATS:
+        for lng in GRID_LNGS:
+            row = int(math.floor((bbox['north'] - lat) / resolution))
+            col = int(math.floor((lng - bbox['west']) / resolution))
+            if 0 <= row < grid.shape[0] and 0 <= col < grid.shape[1] and not np.isnan(grid[row, col]):
+                points.append({'lat': lat, 'lng': lng, 'temp': round(float(grid[row, col]), 2)})
+    return points
+
+
+def granule_fingerprint(granules, state_mask=None):
+    """Hash of the granule files (name, size, mtime), state mask and ingest settings"""
+    files = []
+    for path, _ in sorted(granules):
+        stat = os.stat(path)
+        files.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    inputs = {
+        'version': INGEST_VERSION,
+        'files': files,
+        'cube': [NY_BBOX, CUBE_RESOLUTION],
+        'state_mask': None if state_mask is None else hashlib.sha256(np.packbits(state_mask)).hexdigest()
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def ingest_month(output_dir, month, granules, state_mask=None):
+    """Compute and save one month from its granules (runs in a worker process)
+
+    state_mask limits the statistics and grid points to the state, as the
+    Earth Engine pipeline does; the saved cube grid keeps the whole bbox.
+    """
+    started = time.perf_counter()
+    rows, cols = cube_shape(NY_BBOX, CUBE_RESOLUTION)
+    sources = cube_pixel_sources()
+    sums = np.zeros((2, rows * cols), dtype=np.float64)
+    counts = np.zeros((2, rows * cols), dtype=np.int32)
+
+    used = {os.path.basename(path) for path, tile in granules
+            if accumulate_granule(path, tile, sources, sums, counts)}
+    if not used:
+        return month, None, round(time.perf_counter() - started, 2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan).reshape(2, rows, cols)
+    all_valid, qc_grid = means[0], means[1]
+    if state_mask is not None:
+        all_valid = np.where(state_mask, all_valid, np.nan)
+    values = all_valid[~np.isnan(all_valid)]
+    if not values.size:
+        return month, None, round(time.perf_counter() - started, 2)
+    save_month_grid(output_dir, month, qc_grid.astype(np.float32))
+
+    dates = {GRANULE_PATTERN.search(name).group(1, 2) for name in used}
+    data = {
+        'label': month_label(month),
+        'value': month,
+        'tile_url': None,
+        'map_id': None,
+        'token': '',
+        'statistics': {
+            'mean': round(float(values.mean()), 2),
+            'min': round(float(values.min()), 2),
+            'max': round(float(values.max()), 2),
+            'stdDev': round(float(values.std()), 2),
+            'pixelCount': int(values.size)
+        },
+        'grid_points': sample_grid_points(all_valid),
+        'image_count': len(dates),
+        'source': 'offline_ingest',
+        'input_fingerprint': granule_fingerprint(granules, state_mask),
+        'computed_at': datetime.now().isoformat()
+    }
+
+    month_file = os.path.join(output_dir, f'{month}.json')
+    tmp_path = f'{month_file}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, month_file)
+    return month, data['statistics'], round(time.perf_counter() - started, 2)
+
+
+def is_up_to_date(output_dir, month, granules, state_mask=None):
+    month_file = os.path.join(output_dir, f'{month}.json')
+    if not os.path.exists(os.path.join(output_dir, GRIDS_DIR, f'{month}.npy')):
+        return False
+    try:
+        with open(month_file, 'r') as f:
+            return json.load(f).get('input_fingerprint') == granule_fingerprint(granules, state_mask)
+    except (OSError, ValueError):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build month data from local MOD11A2 granules')
+    parser.add_argument('input_dir', help='directory searched recursively for MOD11A2 granules')
+    parser.add_argument('--output-dir', default='precomputed_data')
+    parser.add_argument('--start', help='first month (YYYY-MM)')
+    parser.add_argument('--end', help='last month (YYYY-MM, inclusive)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='months ingested in parallel')
+    parser.add_argument('--force', action='store_true', help='re-ingest months even if up to date')
+    parser.add_argument('--state-geometry', help=f'GeoJSON state polygon (default: OUTPUT_DIR/{STATE_GEOMETRY_FILE})')
+    args = parser.parse_args()
+
+    granules = find_granules(args.input_dir)
+    months = sorted(m for m in granules
+                    if (not args.start or m >= args.start) and (not args.end or m <= args.end))
+    if not months:
+        print(f"✗ No MOD11A2 granules found in {args.input_dir}")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    geometry_file = args.state_geometry or os.path.join(args.output_dir, STATE_GEOMETRY_FILE)
+    if os.path.exists(geometry_file):
+        state_mask = load_state_mask(geometry_file)
+        print(f"✓ Statistics masked to {geometry_file} ({int(state_mask.sum())} pixels)")
+    else:
+        state_mask = None
+        print(f"⚠️ No state polygon at {geometry_file}: statistics cover the whole bbox, "
+              f"unlike the Earth Engine precompute")
+
+    pending = [m for m in months if args.force or not is_up_to_date(args.output_dir, m, granules[m], state_mask)]
+    print(f"Ingesting {len(pending)} of {len(months)} months with {args.workers} workers "
+          f"({sum(len(granules[m]) for m in pending)} granules)")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(ingest_month, args.output_dir, m, granules[m], state_mask) for m in pending]
+        for future in as_completed(futures):
+            month, statistics, seconds = future.result()
+            if statistics is None:
+                print(f"  ⚠️ {month}: no valid pixels over the cube")
+            else:
+                print(f"  ✅ {month}: mean {statistics['mean']}°C over {statistics['pixelCount']} pixels ({seconds}s)")
+
+    path, count = build_snapshot(args.output_dir)
+    cube_meta = build_cube(args.output_dir)
+    print(f"✓ Snapshot with {count} months: {path}")
+    if cube_meta:
+        print(f"🧊 LST cube: {len(cube_meta['months'])} months, {cube_meta['rows']}x{cube_meta['cols']} pixels")
+    update_climatology(args.output_dir)
+    build_distributions(args.output_dir)
+    print(f"⏱️  Wall clock: {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Memory-mapped LST raster cube
+Monthly 1km daytime LST composites for the New York bounding box stored as
+float32 arrays (NaN for masked pixels) so point lookups are plain array indexing
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+CUBE_META_FILE = 'lst_cube.json'
+CUBE_FILE = 'lst_cube.npy'                # months x rows x cols
+CUBE_PIXEL_FILE = 'lst_cube_pixels.npy'   # rows x cols x months
+GRIDS_DIR = 'grids'                       # one rows x cols grid per month
+STATE_GEOMETRY_FILE = 'ny_state.geojson'  # NY_GEOM boundary exported by the precompute
+
+# New York bounding box and grid step (~1km, MODIS LST resolution)
+NY_BBOX = {'west': -79.8, 'south': 40.45, 'east': -71.75, 'north': 45.05}
+CUBE_RESOLUTION = 0.009
+PIXEL_BLOCK_ROWS = 64                     # rows transposed at a time when building the cube
+
+
+def cube_shape(bbox=NY_BBOX, resolution=CUBE_RESOLUTION):
+    """Number of (rows, cols) covering the bounding box"""
+    rows = int(math.ceil((bbox['north'] - bbox['south']) / resolution))
+    cols = int(math.ceil((bbox['east'] - bbox['west']) / resolution))
+    return rows, cols
+
+
+def _save_npy_atomic(path, array):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def save_month_grid(output_dir, month, grid):
+    """Save a single month grid (rows x cols, NaN = masked) for cube assembly"""
+    grids_dir = os.path.join(output_dir, GRIDS_DIR)
+    os.makedirs(grids_dir, exist_ok=True)
+    path = os.path.join(grids_dir, f'{month}.npy')
+    _save_npy_atomic(path, np.asarray(grid, dtype=np.float32))
+    return path
+
+
+def build_cube(output_dir, bbox=NY_BBOX, resolution=CUBE_RESOLUTION):
+    """Assemble all saved month grids into month-major and pixel-major cubes"""
+    grids_dir = os.path.join(output_dir, GRIDS_DIR)
+    if not os.path.isdir(grids_dir):
+        return None
+
+    months = sorted(name[:-4] for name in os.listdir(grids_dir) if name.endswith('.npy'))
+    if not months:
+        return None
+
+    rows, cols = cube_shape(bbox, resolution)
+    cube_path = os.path.join(output_dir, CUBE_FILE)
+    pixel_path = os.path.join(output_dir, CUBE_PIXEL_FILE)
+
+    # Written through memmaps so decades of months never have to fit in RAM
+    cube = np.lib.format.open_memmap(f'{cube_path}.tmp', mode='w+', dtype=np.float32,
+                                     shape=(len(months), rows, cols))
+    for i, month in enumerate(months):
+        grid = np.load(os.path.join(grids_dir, f'{month}.npy'))
+        if grid.shape != (rows, cols):
+            raise ValueError(f'Grid for {month} has shape {grid.shape}, expected {(rows, cols)}')
+        cube[i] = grid
+    cube.flush()
+
+    # Pixel-major copy: all months for one pixel are contiguous on disk
+    pixels = np.lib.format.open_memmap(f'{pixel_path}.tmp', mode='w+', dtype=np.float32,
+                                       shape=(rows, cols, len(months)))
+    for row in range(0, rows, PIXEL_BLOCK_ROWS):
+        pixels[row:row + PIXEL_BLOCK_ROWS] = cube[:, row:row + PIXEL_BLOCK_ROWS, :].transpose(1, 2, 0)
+    pixels.flush()
+    del cube, pixels
+
+    os.replace(f'{cube_path}.tmp', cube_path)
+    os.replace(f'{pixel_path}.tmp', pixel_path)
+
+    meta = {
+        'months': months,
+        'bbox': bbox,
+        'resolution': resolution,
+        'rows': rows,
+        'cols': cols,
+        'dtype': 'float32'
+    }
+    meta_path = os.path.join(output_dir, CUBE_META_FILE)
+    with open(f'{meta_path}.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f'{meta_path}.tmp', meta_path)
+    return meta
+
+
+class LSTCube:
+    """Read-only memory-mapped view of the monthly LST cube"""
+
+    def __init__(self, data_dir):
+        with open(os.path.join(data_dir, CUBE_META_FILE), 'r') as f:
+            meta = json.load(f)
+
+        self.data_dir = data_dir
+        self.months = meta['months']
+        self.month_index = {m: i for i, m in enumerate(self.months)}
+        self.bbox = meta['bbox']
+        self.resolution = meta['resolution']
+        self.rows = meta['rows']
+        self.cols = meta['cols']
+
+        # mmap_mode='r' lets every worker share the same page cache
+        cube_path = os.path.join(data_dir, CUBE_FILE)
+        self.cube = np.load(cube_path, mmap_mode='r')
+        self.version = format(os.stat(cube_path).st_mtime_ns, 'x')
+        self.pixels = np.load(os.path.join(data_dir, CUBE_PIXEL_FILE), mmap_mode='r')
+
+    @classmethod
+    def open(cls, data_dir):
+        """Open the cube in data_dir, or return None if it has not been exported"""
+        if not os.path.exists(os.path.join(data_dir, CUBE_META_FILE)):
+            return None
+        return cls(data_dir)
+
+    def has_month(self, month):
+        return month in self.month_index
+
+    def pixel_index(self, lat, lng):
+        """(row, col) of the pixel containing lat/lng, or None if outside the cube"""
+        row = int(math.floor((self.bbox['north'] - lat) / self.resolution))
+        col = int(math.floor((lng - self.bbox['west']) / self.resolution))
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def pixel_indices(self, lats, lngs):
+        """Vectorized pixel_index: returns rows, cols and an in-bounds mask"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        rows = np.floor((self.bbox['north'] - lats) / self.resolution).astype(np.int64)
+        cols = np.floor((lngs - self.bbox['west']) / self.resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return np.where(inside, rows, 0), np.where(inside, cols, 0), inside
+
+    def covers(self, lat, lng, month):
+        """True if the cube holds data for this month and location"""
+        return self.has_month(month) and self.pixel_index(lat, lng) is not None
+
+    def value(self, lat, lng, month):
+        """Temperature at lat/lng for month, or None if masked / not covered"""
+        index = self.pixel_index(lat, lng)
+        if index is None or month not in self.month_index:
+            return None
+        value = float(self.cube[self.month_index[month], index[0], index[1]])
+        return None if math.isnan(value) else value
+
+    def series(self, lat, lng):
+        """All monthly values for the pixel containing lat/lng (one contiguous read)"""
+        index = self.pixel_index(lat, lng)
+        if index is None:
+            return None
+        return dict(zip(self.months, np.array(self.pixels[index[0], index[1]]).tolist()))
+
+    def values(self, lats, lngs, month):
+        """Vectorized lookup for one month; NaN where masked or outside the cube"""
+        rows, cols, inside = self.pixel_indices(lats, lngs)
+        result = np.full(rows.shape, np.nan, dtype=np.float32)
+        if month in self.month_index:
+            grid = self.cube[self.month_index[month]]
+            result[inside] = grid[rows[inside], cols[inside]]
+        return result
@@ -0,0 +1,131 @@
+"""
+Cross-request micro-batching of point lookups
+Lookups for the same month that arrive within max_wait of each other are
+resolved together by one batch call and the results fanned back out; on the
+async path, identical in-flight lookups share one awaited task
+"""
+
+import asyncio
+import threading
+
+
+class _Batch:
+    def __init__(self, month):
+        self.month = month
+        self.coords = []
+        self.results = None
+        self.error = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class PointBatcher:
+    """Leader/follower batching queue keyed by month
+
+    The first request for a month becomes the leader: it waits up to max_wait
+    (or until max_batch_size lookups have joined), runs batch_fn(month, coords)
+    once and wakes the followers. No background thread, so it is fork-safe.
+    Followers give up after timeout seconds rather than wait on a hung call.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=64, max_wait=0.005, timeout=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._open = {}
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.max_fill = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def submit(self, month, lat, lng):
+        """Resolve one lookup, possibly together with concurrent ones"""
+        with self._lock:
+            batch = self._open.get(month)
+            leader = batch is None
+            if leader:
+                batch = _Batch(month)
+                self._open[month] = batch
+            index = len(batch.coords)
+            batch.coords.append((lat, lng))
+            if len(batch.coords) >= self.max_batch_size:
+                # Close the batch so new arrivals start the next one
+                self._open.pop(month, None)
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._open.get(month) is batch:
+                    del self._open[month]
+            self._run(batch)
+        elif not batch.done.wait(self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f'micro-batch for {month} did not complete within {self.timeout}s')
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _run(self, batch):
+        try:
+            batch.results = list(self.batch_fn(batch.month, batch.coords))
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch.coords)
+                self.max_fill = max(self.max_fill, len(batch.coords))
+                if batch.error is not None:
+                    self.errors += 1
+            batch.done.set()
+
+    def stats(self):
+        """Batch fill metrics"""
+        with self._lock:
+            mean_size = self.items / self.batches if self.batches else 0.0
+            return {
+                'batches': self.batches,
+                'lookups': self.items,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'mean_batch_size': round(mean_size, 2),
+                'mean_fill_ratio': round(mean_size / self.max_batch_size, 3),
+                'max_batch_size_seen': self.max_fill,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one awaited task"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self):
+        return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._inflight)}
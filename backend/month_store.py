@@ -0,0 +1,319 @@
+"""
+Lazily loaded month data
+Month payloads come from a compact binary snapshot (months_snapshot.npz, written
+by the precompute) and the per-month JSON files: a JSON file newer than the
+snapshot, or for a month the snapshot lacks, takes precedence. Only the month
+keys are read at startup; payloads are loaded one month at a time on first
+access and kept in a bounded LRU, so serving decades of months costs no more
+startup time or memory than serving one year.
+
+Build a snapshot from existing JSON files:  python month_store.py
+"""
+
+import bisect
+import glob
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from datetime import datetime
+
+import numpy as np
+
+SNAPSHOT_FILE = 'months_snapshot.npz'
+MONTH_FILE_PATTERN = re.compile(r'^(\d{4}-(?:0[1-9]|1[0-2]))\.json$')
+MONTH_PATTERN = re.compile(r'^\d{4}-(?:0[1-9]|1[0-2])$')
+
+# Result of MonthStore.prepare_refresh: everything needed to swap in new months
+MonthUpdate = namedtuple('MonthUpdate', ['source', 'signatures', 'snapshot', 'loaded', 'changed'])
+
+
+def month_label(month):
+    """'2024-01' -> 'January 2024'"""
+    return datetime.strptime(month, '%Y-%m').strftime('%B %Y')
+
+
+def write_snapshot(output_dir, all_data):
+    """Pack month payloads into one npz with a JSON metadata and a (lat, lng, temp)
+    grid point array per month, so a single month can be read without the rest"""
+    months = sorted(all_data)
+    arrays = {'months': np.array(months)}
+
+    for month in months:
+        data = dict(all_data[month])
+        points = data.pop('grid_points', None) or []
+        arrays[f'meta_{month}'] = np.frombuffer(json.dumps(data).encode(), dtype=np.uint8)
+        arrays[f'grid_{month}'] = np.array(
+            [(p['lat'], p['lng'], p['temp']) for p in points], dtype=np.float64
+        ).reshape(-1, 3)
+
+    path = os.path.join(output_dir, SNAPSHOT_FILE)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def unpack_month(snapshot, month):
+    """One month's payload (with grid_points list) from an open snapshot"""
+    payload = json.loads(snapshot[f'meta_{month}'].tobytes().decode())
+    payload['grid_points'] = [
+        {'lat': lat, 'lng': lng, 'temp': temp} for lat, lng, temp in snapshot[f'grid_{month}'].tolist()
+    ]
+    return payload
+
+
+def read_snapshot(path):
+    """Unpack a whole snapshot into {month: payload}"""
+    with np.load(path) as snapshot:
+        return {str(month): unpack_month(snapshot, str(month)) for month in snapshot['months']}
+
+
+def snapshot_months(path):
+    """Month keys in a snapshot without unpacking the payloads"""
+    with np.load(path) as snapshot:
+        return [str(m) for m in snapshot['months']]
+
+
+def snapshot_signatures(path):
+    """{month: CRCs of its members} - read from the zip directory, nothing is decompressed"""
+    with np.load(path) as snapshot:
+        return {
+            str(m): (snapshot.zip.getinfo(f'meta_{m}.npy').CRC, snapshot.zip.getinfo(f'grid_{m}.npy').CRC)
+            for m in snapshot['months']
+        }
+
+
+def json_signatures(data_dir):
+    """{month: (size, mtime)} of the YYYY-MM.json files in data_dir"""
+    signatures = {}
+    for json_file in glob.glob(os.path.join(data_dir, '*.json')):
+        match = MONTH_FILE_PATTERN.match(os.path.basename(json_file))
+        if match:
+            stat = os.stat(json_file)
+            signatures[match.group(1)] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+
+def build_snapshot(data_dir):
+    """Write a snapshot of every YYYY-MM.json file in data_dir; returns (path, months)"""
+    all_data = {}
+    for json_file in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
+        match = MONTH_FILE_PATTERN.match(os.path.basename(json_file))
+        if match:
+            with open(json_file, 'r') as f:
+                all_data[match.group(1)] = json.load(f)
+    return write_snapshot(data_dir, all_data), len(all_data)
+
+
+class MonthStore(Mapping):
+    """Read-only {month: payload} mapping over any number of YYYY-MM months
+
+    Keys are discovered at startup; payloads are read per month on first use
+    and at most max_months of them are kept in memory (LST_MONTH_CACHE_SIZE).
+    A month whose file turns out to be unreadable is dropped from the keys
+    until a refresh finds it changed.
+    """
+
+    def __init__(self, data_dir, max_months=None):
+        self.data_dir = data_dir
+        self.snapshot_path = os.path.join(data_dir, SNAPSHOT_FILE)
+        self.max_months = max_months or int(os.getenv('LST_MONTH_CACHE_SIZE', '120'))
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._snapshot = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+        self.dropped = 0
+        self.source, self._signatures = self._discover()
+        self._keys = sorted(self._signatures)
+        self._key_set = set(self._keys)
+
+    def _discover(self):
+        """(source, {month: signature}); a signature starts with where the month
+        is read from ('snapshot' or 'json') and changes when the month's data does"""
+        signatures = {}
+        snapshot_mtime = None
+        if os.path.exists(self.snapshot_path):
+            try:
+                snapshot_mtime = os.stat(self.snapshot_path).st_mtime_ns
+                signatures = {m: ('snapshot',) + crcs for m, crcs in snapshot_signatures(self.snapshot_path).items()}
+            except Exception as e:
+                print(f"Warning: Could not read snapshot, using JSON files: {e}")
+                snapshot_mtime = None
+                signatures = {}
+
+        # JSON files written after the snapshot (an added or patched month) win over it
+        for month, (size, mtime) in json_signatures(self.data_dir).items():
+            if month not in signatures or mtime > snapshot_mtime:
+                signatures[month] = ('json', size, mtime)
+
+        kinds = {signature[0] for signature in signatures.values()}
+        source = '+'.join(kind for kind in ('snapshot', 'json') if kind in kinds) or 'json'
+        return source, signatures
+
+    def _read_month(self, month, signature=None, snapshot=None):
+        if (signature or self._signatures[month])[0] == 'snapshot':
+            if snapshot is None:
+                # Opened on first use so forked workers don't share a file position
+                if self._snapshot is None:
+                    self._snapshot = np.load(self.snapshot_path)
+                snapshot = self._snapshot
+            return unpack_month(snapshot, month)
+        with open(os.path.join(self.data_dir, f'{month}.json'), 'r') as f:
+            return json.load(f)
+
+    def after_fork(self):
+        """Forked workers must not share the parent's snapshot handle (file position) or lock"""
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def prepare_refresh(self):
+        """Re-discover months on disk and load the changed ones without touching
+        what is being served; returns a MonthUpdate for apply_refresh, or None
+
+        A month file that fails to load is logged and skipped: the month keeps
+        its current data (or stays unlisted if it is new) until the file is
+        fixed, instead of failing the whole reload.
+        """
+        source, signatures = self._discover()
+        changed = [m for m in set(signatures) | set(self._signatures)
+                   if signatures.get(m) != self._signatures.get(m)]
+        if not changed:
+            return None
+
+        snapshot = None
+        if any(signatures.get(m, ('',))[0] == 'snapshot' for m in changed):
+            snapshot = np.load(self.snapshot_path)
+
+        loaded = {}
+        for month in changed:
+            if month not in signatures:
+                continue
+            try:
+                loaded[month] = self._read_month(month, signatures[month], snapshot)
+            except Exception as e:
+                print(f"✗ Skipping {month}: could not load it from {signatures[month][0]}: {e}")
+                if month in self._signatures:
+                    signatures[month] = self._signatures[month]
+                else:
+                    del signatures[month]
+
+        changed = sorted(m for m in changed if signatures.get(m) != self._signatures.get(m))
+        return MonthUpdate(source, signatures, snapshot, loaded, changed)
+
+    def apply_refresh(self, update):
+        """Swap in a prepare_refresh() result; returns the months added, removed
+        or changed. Cached payloads of unchanged months are kept."""
+        if update is None:
+            return []
+
+        with self._lock:
+            if update.snapshot is not None or 'snapshot' not in update.source:
+                if self._snapshot is not None:
+                    self._snapshot.close()
+                self._snapshot = update.snapshot
+            self.source, self._signatures = update.source, update.signatures
+            self._keys = sorted(update.signatures)
+            self._key_set = set(self._keys)
+            for month in update.changed:
+                self._cache.pop(month, None)
+            for month, payload in update.loaded.items():
+                if month in update.changed:
+                    self._cache[month] = payload
+            while len(self._cache) > self.max_months:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+            self.reloads += 1
+        return update.changed
+
+    @staticmethod
+    def discard_refresh(update):
+        """Release a prepare_refresh() result that will not be applied"""
+        if update is not None and update.snapshot is not None:
+            update.snapshot.close()
+
+    def refresh(self):
+        """prepare_refresh + apply_refresh; returns the months added, removed or changed"""
+        return self.apply_refresh(self.prepare_refresh())
+
+    def __getitem__(self, month):
+        if month not in self._key_set:
+            raise KeyError(month)
+
+        with self._lock:
+            payload = self._cache.get(month)
+            if payload is not None:
+                self._cache.move_to_end(month)
+                self.hits += 1
+                return payload
+
+            self.misses += 1
+            try:
+                payload = self._read_month(month)
+            except Exception as e:
+                print(f"✗ Dropping {month}: could not load it from {self._signatures[month][0]}: {e}")
+                # Forgetting its signature makes the next refresh list it again once the file is fixed
+                del self._signatures[month]
+                self._keys = [m for m in self._keys if m != month]
+                self._key_set = set(self._keys)
+                self.dropped += 1
+                raise KeyError(month) from e
+
+            self._cache[month] = payload
+            if len(self._cache) > self.max_months:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+            return payload
+
+    def __contains__(self, month):
+        return month in self._key_set
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        return list(self._keys)
+
+    def latest(self):
+        return self._keys[-1] if self._keys else None
+
+    def range(self, start=None, end=None):
+        """Months between start and end (inclusive YYYY-MM, either may be None)"""
+        low = bisect.bisect_left(self._keys, start) if start else 0
+        high = bisect.bisect_right(self._keys, end) if end else len(self._keys)
+        return self._keys[low:high]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'source': self.source,
+                'months': len(self._keys),
+                'first': self._keys[0] if self._keys else None,
+                'last': self.latest(),
+                'cached': len(self._cache),
+                'max_cached': self.max_months,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'reloads': self.reloads,
+                'dropped': self.dropped
+            }
+
+
+def main():
+    data_dir = 'precomputed_data'
+    path, count = build_snapshot(data_dir)
+    print(f"✓ Wrote {count} months to {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""
+Pixel-snapped cache of sampled LST values
+Keys are (month, MODIS 1km pixel) so every click inside the same pixel reuses
+one remote query. Entries expire after a TTL and are evicted LRU; an optional
+backing store lets all gunicorn workers share results: a hash table in shared
+memory for the workers on one host, or Redis across hosts.
+"""
+
+import json
+import math
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; writers are then only serialized within a process
+    fcntl = None
+
+# MODIS sinusoidal grid (MOD11A2 1km): sphere radius and pixel size in metres
+MODIS_EARTH_RADIUS = 6371007.181
+MODIS_PIXEL_SIZE = 926.625433055833
+MODIS_X_MIN = -20015109.354
+MODIS_Y_MAX = 10007554.677
+
+MISSING = object()
+
+
+def modis_pixel_index(lat, lng):
+    """(row, col) of the global MODIS 1km sinusoidal pixel containing lat/lng"""
+    lat_rad = math.radians(lat)
+    x = MODIS_EARTH_RADIUS * math.radians(lng) * math.cos(lat_rad)
+    y = MODIS_EARTH_RADIUS * lat_rad
+    row = int((MODIS_Y_MAX - y) // MODIS_PIXEL_SIZE)
+    col = int((x - MODIS_X_MIN) // MODIS_PIXEL_SIZE)
+    return row, col
+
+
+class RedisResultStore:
+    """Shared backing store so results sampled by one worker serve all of them"""
+
+    def __init__(self, url, prefix='lst:px:'):
+        if redis is None:
+            raise ImportError('redis package is required for a shared result cache')
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self.prefix = prefix
+
+    def _key(self, key):
+        month, (row, col) = key
+        return f'{self.prefix}{month}:{row}:{col}'
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return MISSING if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self._key(key), json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete_month(self, month):
+        for redis_key in self.client.scan_iter(f'{self.prefix}{month}:*'):
+            self.client.delete(redis_key)
+
+
+SLOT_DTYPE = np.dtype([
+    ('month', '<i4'), ('row', '<i4'), ('col', '<i4'), ('kind', '<i4'),
+    ('value', '<f8'), ('expires', '<f8'), ('check', '<i8')
+])
+EMPTY, VALUE, NO_DATA = 0, 1, 2
+SHARED_PROBES = 8
+
+
+def _month_code(month):
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+
+def _slot_check(month, row, col, kind, value, expires):
+    # Tuples of ints/floats hash the same in every process (no hash randomization)
+    return hash((month, row, col, kind, value, expires))
+
+
+class SharedMemoryResultStore:
+    """Fixed-size hash table in a memory-mapped file (under /dev/shm by default)
+
+    Every worker on the host maps the same pages, so a value sampled by one
+    worker is a hit for all of them, with no copies or pickling. Readers take
+    no lock: each slot carries a checksum and a torn or stale slot is just a
+    miss. Writers are serialized with a lock on the file. Each key can live in
+    SHARED_PROBES slots; a full neighbourhood overwrites the entry closest to
+    expiry. An existing table is used at its current size, never resized under
+    processes that map it.
+    """
+
+    def __init__(self, path, slots=262144):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._write_lock():
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                size = slots * SLOT_DTYPE.itemsize
+                os.ftruncate(self._fd, size)
+            elif size != slots * SLOT_DTYPE.itemsize:
+                print(f"Warning: {path} already holds {size // SLOT_DTYPE.itemsize} slots, using that size")
+        self.slots = size // SLOT_DTYPE.itemsize
+        self._mmap = mmap.mmap(self._fd, self.slots * SLOT_DTYPE.itemsize)
+        self.table = np.frombuffer(self._mmap, dtype=SLOT_DTYPE)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX)  # per process, so it also holds across fork
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _probe(self, month, row, col):
+        start = hash((month, row, col)) % self.slots
+        return [(start + i) % self.slots for i in range(SHARED_PROBES)]
+
+    def get(self, key):
+        month, (row, col) = key
+        month = _month_code(month)
+        now = time.time()
+        for i in self._probe(month, row, col):
+            m, r, c, kind, value, expires, check = self.table[i].item()
+            if (m, r, c) == (month, row, col) and kind != EMPTY and expires > now \
+                    and check == _slot_check(m, r, c, kind, value, expires):
+                return None if kind == NO_DATA else value
+        return MISSING
+
+    def set(self, key, value, ttl):
+        month, (row, col) = key
+        month = _month_code(month)
+        if value is not None and math.isnan(value):
+            value = None  # NaN hashes differently in every process
+        kind = NO_DATA if value is None else VALUE
+        value = 0.0 if value is None else float(value)
+        expires = time.time() + ttl
+        record = (month, row, col, kind, value, expires, _slot_check(month, row, col, kind, value, expires))
+
+        with self._write_lock():
+            now = time.time()
+            target = None
+            for i in self._probe(month, row, col):
+                m, r, c, slot_kind, _, slot_expires, _ = self.table[i].item()
+                if (m, r, c) == (month, row, col):
+                    target = i
+                    break
+                if target is None and (slot_kind == EMPTY or slot_expires <= now):
+                    target = i
+            if target is None:
+                probes = self._probe(month, row, col)
+                target = probes[int(np.argmin(self.table['expires'][probes]))]
+            self.table[target] = record
+
+    def delete_month(self, month):
+        month = _month_code(month)
+        with self._write_lock():
+            self.table['kind'][self.table['month'] == month] = EMPTY
+
+    def stats(self):
+        live = (self.table['kind'] != EMPTY) & (self.table['expires'] > time.time())
+        return {'path': self.path, 'slots': self.slots, 'entries': int(live.sum()),
+                'bytes': self.slots * SLOT_DTYPE.itemsize}
+
+
+def default_shared_cache_path():
+    """Per deployment and sampler backend, so a restart, another server on the
+    host or a fake-backend benchmark never reads this one's values.
+    LST_DEPLOY_ID is set to the gunicorn master's pid by gunicorn.conf.py."""
+    shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    backend = os.getenv('LST_EE_BACKEND', 'earth_engine')
+    deploy_id = os.getenv('LST_DEPLOY_ID') or str(os.getpid())
+    return os.path.join(shm_dir, f'lst-result-cache-{backend}-{deploy_id}')
+
+
+def shared_cache_path():
+    return os.getenv('LST_SHARED_CACHE_PATH') or default_shared_cache_path()
+
+
+def remove_shared_cache():
+    """Unlink the shared table file; processes that already map it keep sharing it"""
+    try:
+        os.unlink(shared_cache_path())
+    except FileNotFoundError:
+        pass
+
+
+class PixelResultCache:
+    """Bounded LRU + TTL cache of sampled values keyed by (month, MODIS pixel)"""
+
+    def __init__(self, maxsize=20000, ttl=6 * 3600, backing_store=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backing_store = backing_store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(month, lat, lng):
+        return month, modis_pixel_index(lat, lng)
+
+    def get(self, month, lat, lng):
+        """Cached value (may be None for a masked pixel) or MISSING"""
+        key = self.key(month, lat, lng)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.backing_store is not None:
+            try:
+                value = self.backing_store.get(key)
+            except Exception as e:
+                print(f"Shared cache read failed: {e}")
+                value = MISSING
+            if value is not MISSING:
+                self._store_local(key, value, now)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return MISSING
+
+    def contains(self, month, lat, lng):
+        """Whether a fresh value is cached, without counting a hit or miss"""
+        key = self.key(month, lat, lng)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return True
+        if self.backing_store is not None:
+            try:
+                return self.backing_store.get(key) is not MISSING
+            except Exception:
+                return False
+        return False
+
+    def put(self, month, lat, lng, value):
+        key = self.key(month, lat, lng)
+        self._store_local(key, value, time.monotonic())
+        if self.backing_store is not None:
+            try:
+                self.backing_store.set(key, value, self.ttl)
+            except Exception as e:
+                print(f"Shared cache write failed: {e}")
+
+    def _store_local(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_month(self, month):
+        """Drop every cached value for one month"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == month]:
+                del self._entries[key]
+        if self.backing_store is not None:
+            try:
+                self.backing_store.delete_month(month)
+            except Exception as e:
+                print(f"Shared cache invalidation failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'shared_store': type(self.backing_store).__name__ if self.backing_store else None,
+                'shared': self.backing_store.stats() if hasattr(self.backing_store, 'stats') else None
+            }
+
+
+def create_result_cache():
+    """Build the cache from LST_CACHE_SIZE / LST_CACHE_TTL and, for a shared
+    backing store, LST_CACHE_REDIS_URL or LST_SHARED_CACHE=1 (LST_SHARED_CACHE_PATH,
+    LST_SHARED_CACHE_SLOTS)"""
+    backing_store = None
+    redis_url = os.getenv('LST_CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            backing_store = RedisResultStore(redis_url)
+        except Exception as e:
+            print(f"✗ Shared result cache unavailable: {e}")
+    elif os.getenv('LST_SHARED_CACHE', '0') == '1':
+        try:
+            backing_store = SharedMemoryResultStore(
+                shared_cache_path(),
+                slots=int(os.getenv('LST_SHARED_CACHE_SLOTS', '262144'))
+            )
+        except OSError as e:
+            print(f"✗ Shared memory result cache unavailable: {e}")
+
+    return PixelResultCache(
+        maxsize=int(os.getenv('LST_CACHE_SIZE', '20000')),
+        ttl=float(os.getenv('LST_CACHE_TTL', str(6 * 3600))),
+        backing_store=backing_store
+    )
@@ -0,0 +1,168 @@
+"""
+Spatial index over sampled grid points
+A small KD-tree answers k-nearest queries in O(log n) for single points; batches
+walk the same tree once, carrying every query that reaches a node as one NumPy
+array and scanning subtrees of at most LEAF_SIZE points in one vectorized step.
+Both back inverse-distance-weighted interpolation.
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+# Distances are computed in an equirectangular plane scaled at NY's latitude
+REFERENCE_LAT = 42.9
+LEAF_SIZE = 64   # batch queries scan subtrees this small instead of descending them
+BATCH_BLOCK = 16384   # queries walked together (bounds the leaf distance matrices)
+
+
+class PointIndex:
+    """KD-tree over (lat, lng, value) samples"""
+
+    def __init__(self, lats, lngs, values, reference_lat=REFERENCE_LAT):
+        self.lng_scale = math.cos(math.radians(reference_lat))
+        self.xy = np.column_stack([
+            np.asarray(lngs, dtype=np.float64) * self.lng_scale,
+            np.asarray(lats, dtype=np.float64)
+        ])
+        self.values = np.asarray(values, dtype=np.float64)
+
+        # Nodes as parallel lists: point index, split axis, left child, right child,
+        # and every point of the subtree for subtrees of at most LEAF_SIZE points
+        self._point, self._axis, self._left, self._right, self._leaf = [], [], [], [], []
+        self._root = self._build(np.arange(len(self.values)), 0)
+
+    @classmethod
+    def from_grid_points(cls, grid_points):
+        """Index for a month's grid_points list, or None if it is empty"""
+        if not grid_points:
+            return None
+        return cls([p['lat'] for p in grid_points],
+                   [p['lng'] for p in grid_points],
+                   [p['temp'] for p in grid_points])
+
+    def __len__(self):
+        return len(self.values)
+
+    def _build(self, indices, depth):
+        if len(indices) == 0:
+            return -1
+        axis = depth % 2
+        indices = indices[np.argsort(self.xy[indices, axis], kind='stable')]
+        mid = len(indices) // 2
+
+        node = len(self._point)
+        self._point.append(int(indices[mid]))
+        self._axis.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._leaf.append(indices if len(indices) <= LEAF_SIZE else None)
+        self._left[node] = self._build(indices[:mid], depth + 1)
+        self._right[node] = self._build(indices[mid + 1:], depth + 1)
+        return node
+
+    def query(self, lat, lng, k=1):
+        """(distances, indices) of the k nearest samples, nearest first"""
+        target = (lng * self.lng_scale, lat)
+        heap = []  # max-heap of (-squared distance, index)
+        k = min(k, len(self.values))
+
+        def visit(node):
+            if node < 0:
+                return
+            point = self._point[node]
+            px, py = self.xy[point]
+            d2 = (px - target[0]) ** 2 + (py - target[1]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, point))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, point))
+
+            diff = target[self._axis[node]] - self.xy[point, self._axis[node]]
+            near, far = (self._left[node], self._right[node]) if diff < 0 else (self._right[node], self._left[node])
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        visit(self._root)
+        best = sorted((-d2, point) for d2, point in heap)
+        return [math.sqrt(d2) for d2, _ in best], [point for _, point in best]
+
+    def query_many(self, lats, lngs, k=1):
+        """Vectorized k-nearest: (distances, indices) arrays of shape (m, k)
+
+        The tree is walked once for the whole batch: each node updates the
+        k-best lists of the queries that reach it, then sends them to the near
+        child and only those still within reach to the far one, as query() does.
+        Small subtrees are merged in with one distance matrix instead.
+        """
+        targets = np.column_stack([np.asarray(lngs, dtype=np.float64) * self.lng_scale,
+                                   np.asarray(lats, dtype=np.float64)])
+        k = min(k, len(self.values))
+        best_d2 = np.full((len(targets), k), np.inf)
+        best = np.zeros((len(targets), k), dtype=np.int64)
+
+        def visit(node, queries):
+            if node < 0 or not len(queries):
+                return
+            leaf = self._leaf[node]
+            if leaf is not None:
+                d2 = ((targets[queries, None, :] - self.xy[None, leaf, :]) ** 2).sum(axis=2)
+                merged, merged_d2 = np.broadcast_to(leaf, d2.shape), d2
+                if len(leaf) < k or np.isfinite(best_d2[queries, 0]).any():
+                    merged_d2 = np.concatenate([best_d2[queries], d2], axis=1)
+                    merged = np.concatenate([best[queries], merged], axis=1)
+                nearest = np.argpartition(merged_d2, k - 1, axis=1)[:, :k]
+                nearest_d2 = np.take_along_axis(merged_d2, nearest, axis=1)
+                order = np.argsort(nearest_d2, axis=1)
+                best_d2[queries] = np.take_along_axis(nearest_d2, order, axis=1)
+                best[queries] = np.take_along_axis(np.take_along_axis(merged, nearest, axis=1), order, axis=1)
+                return
+
+            point = self._point[node]
+            d2 = ((targets[queries] - self.xy[point]) ** 2).sum(axis=1)
+            closer = d2 < best_d2[queries, -1]
+            if closer.any():
+                # Insert into the sorted k-best rows, shifting the worse entries right
+                rows, d2 = queries[closer], d2[closer, None]
+                row_d2, row_best = best_d2[rows], best[rows]
+                position = (row_d2 <= d2).sum(axis=1, keepdims=True)
+                shifted_d2 = np.concatenate([d2, row_d2[:, :-1]], axis=1)
+                shifted = np.concatenate([np.full(d2.shape, -1), row_best[:, :-1]], axis=1)
+                columns = np.arange(k)
+                best_d2[rows] = np.where(columns < position, row_d2, np.where(columns == position, d2, shifted_d2))
+                best[rows] = np.where(columns < position, row_best, np.where(columns == position, point, shifted))
+
+            axis = self._axis[node]
+            diff = targets[queries, axis] - self.xy[point, axis]
+            left_first, right_first = diff < 0, diff >= 0
+            visit(self._left[node], queries[left_first])
+            visit(self._right[node], queries[right_first])
+            # Far sides, for the queries whose k-th best still reaches across the split
+            within = diff * diff < best_d2[queries, -1]
+            visit(self._right[node], queries[left_first & within])
+            visit(self._left[node], queries[right_first & within])
+
+        for start in range(0, len(targets), BATCH_BLOCK):
+            visit(self._root, np.arange(start, min(len(targets), start + BATCH_BLOCK)))
+        return np.sqrt(best_d2), best
+
+    def idw(self, lat, lng, k=8, power=2):
+        """(interpolated value, distance to nearest sample)"""
+        distances, indices = self.query(lat, lng, k)
+        if distances[0] == 0:
+            return float(self.values[indices[0]]), 0.0
+        weights = 1.0 / np.power(distances, power)
+        return float(np.dot(weights, self.values[indices]) / weights.sum()), distances[0]
+
+    def idw_many(self, lats, lngs, k=8, power=2):
+        """Vectorized idw: (values, nearest distances) arrays"""
+        distances, indices = self.query_many(lats, lngs, k)
+        exact = distances[:, 0] == 0
+        with np.errstate(divide='ignore'):
+            weights = 1.0 / np.power(distances, power)
+        weights[exact] = 0.0
+        weights[exact, 0] = 1.0
+        values = (weights * self.values[indices]).sum(axis=1) / weights.sum(axis=1)
+        return values, distances[:, 0]
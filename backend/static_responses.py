@@ -0,0 +1,156 @@
+"""
+Pre-serialized responses for data that only changes when month files change
+Each body is serialized once and kept as raw, gzip and (if available) brotli
+bytes, each with its own strong ETag, so repeat requests cost a dict lookup or
+a 304.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+ENCODING_SUFFIXES = {None: '', 'gzip': '-gz', 'br': '-br'}
+
+
+def accepted_encodings(accept_encoding):
+    """{coding: q} from an Accept-Encoding header; '*' applies to codings not listed"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+class PreparedResponse:
+    """One JSON body in every encoding we serve"""
+
+    def __init__(self, payload, max_age=3600):
+        self.raw = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+        self.gzip = gzip.compress(self.raw, compresslevel=9, mtime=0)
+        self.br = brotli.compress(self.raw, quality=11) if brotli is not None else None
+        self.digest = hashlib.sha256(self.raw).hexdigest()[:32]
+        self.cache_control = f'public, max-age={max_age}'
+
+    def etag(self, encoding=None):
+        """Strong ETag of one representation (each encoding has its own)"""
+        return f'"{self.digest}{ENCODING_SUFFIXES[encoding]}"'
+
+    def _encoding(self, accept_encoding):
+        """Best accepted encoding by q-value (br before gzip on ties); never one with q=0"""
+        accepted = accepted_encodings(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        best, best_q = (None, self.raw), 0.0
+        for coding, body in (('br', self.br), ('gzip', self.gzip)):
+            q = accepted.get(coding, wildcard)
+            if body is not None and q > best_q:
+                best, best_q = (coding, body), q
+        return best
+
+    def to_response(self, request):
+        """Flask response honouring Accept-Encoding and If-None-Match (weak comparison)"""
+        encoding, body = self._encoding(request.headers.get('Accept-Encoding', ''))
+        etag = self.etag(encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if etag in tags or if_none_match.strip() == '*':
+            return Response(status=304, headers=headers)
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype='application/json', headers=headers)
+
+
+class ResponseCache:
+    """Prepared responses keyed by tuple, built on first request; at most
+    maxsize are kept, least recently used first out"""
+
+    def __init__(self, max_age=3600, maxsize=256):
+        self.max_age = max_age
+        self.maxsize = maxsize
+        self._responses = OrderedDict()
+        self._builders = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, build_payload):
+        prepared = self._responses.get(key)
+        if prepared is None:
+            prepared = PreparedResponse(build_payload(), self.max_age)
+            with self._lock:
+                prepared = self._responses.setdefault(key, prepared)
+                self._builders[key] = build_payload
+                while len(self._responses) > self.maxsize:
+                    evicted, _ = self._responses.popitem(last=False)
+                    self._builders.pop(evicted, None)
+        else:
+            with self._lock:
+                if key in self._responses:
+                    self._responses.move_to_end(key)
+        return prepared
+
+    def rebuild(self, predicate):
+        """Re-prepare the cached responses whose key matches predicate and swap
+        them in, so requests never see a cold entry; returns the number rebuilt"""
+        with self._lock:
+            builders = {k: b for k, b in self._builders.items() if predicate(k)}
+        rebuilt = 0
+        for key, build_payload in builders.items():
+            try:
+                prepared = PreparedResponse(build_payload(), self.max_age)
+            except Exception as e:
+                print(f"Warning: Could not rebuild response {key}: {e}")
+                self.invalidate(lambda k: k == key)
+                continue
+            with self._lock:
+                if key in self._responses:
+                    self._responses[key] = prepared
+            rebuilt += 1
+        return rebuilt
+
+    def invalidate(self, predicate=None):
+        """Drop all prepared responses, or those whose key matches predicate"""
+        with self._lock:
+            if predicate is None:
+                self._responses.clear()
+                self._builders.clear()
+            else:
+                for key in [k for k in self._responses if predicate(k)]:
+                    del self._responses[key]
+                    self._builders.pop(key, None)
+
+    def __len__(self):
+        return len(self._responses)
+
+
+def columnar_grid_points(grid_points):
+    """Parallel lat/lng/temp arrays instead of one object per point"""
+    return {
+        'lat': [p['lat'] for p in grid_points],
+        'lng': [p['lng'] for p in grid_points],
+        'temp': [p['temp'] for p in grid_points]
+    }
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Deadline
+
+
+def wait_for_state(breaker, state, timeout=2.0):
+    expires = time.monotonic() + timeout
+    while breaker.state != state and time.monotonic() < expires:
+        time.sleep(0.01)
+    return breaker.state
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)   # a success resets the run
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    stats = breaker.stats()
+    assert stats['times_opened'] == 1 and stats['rejected'] == 1 and stats['failures'] == 5
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=2, slow_call_threshold=0.5, reset_timeout=60)
+    breaker.record_success(1.0)
+    breaker.record_success(2.0)
+    assert breaker.state == OPEN
+    assert breaker.stats()['slow_calls'] == 2 and breaker.stats()['successes'] == 0
+
+
+def test_half_open_probe_closes_breaker():
+    probed = threading.Event()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, probe_fn=probed.set)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    assert not breaker.allow()   # starts the probe; callers still fall back meanwhile
+    assert probed.wait(2.0)
+    assert wait_for_state(breaker, CLOSED) == CLOSED
+    assert breaker.allow() and breaker.consecutive_failures == 0
+
+
+def test_failed_probe_reopens_breaker():
+    def probe():
+        raise RuntimeError('still down')
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, probe_fn=probe)
+    breaker.record_failure()
+    breaker.allow()
+    assert wait_for_state(breaker, OPEN) == OPEN
+    assert breaker.stats()['times_opened'] == 2
+
+
+def test_only_one_probe_while_half_open():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def probe():
+        calls.append(1)
+        started.set()
+        release.wait(2.0)
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, probe_fn=probe)
+    breaker.record_failure()
+    breaker.allow()
+    assert started.wait(2.0)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow() and not breaker.allow()
+    release.set()
+    assert wait_for_state(breaker, CLOSED) == CLOSED
+    assert len(calls) == 1
+
+
+def test_deadline():
+    deadline = Deadline(0.05)
+    assert not deadline.expired() and 0 < deadline.remaining() <= 0.05
+    time.sleep(0.06)
+    assert deadline.expired() and deadline.remaining() == 0.0
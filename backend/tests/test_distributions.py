@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from distributions import (HIST_BINS, HIST_MAX, HIST_MIN, SKETCH_ALPHA, histogram_counts,
+                           sketch_counts, sketch_quantiles)
+
+QUANTILES = (0.0, 0.02, 0.1, 0.25, 0.5, 0.75, 0.9, 0.98, 1.0)
+
+
+def values(seed, size=20000):
+    rng = np.random.default_rng(seed)
+    return np.concatenate([rng.normal(18, 9, size), rng.uniform(-45, 75, size // 10)])
+
+
+def assert_within_alpha(estimates, data):
+    """Every estimate within SKETCH_ALPHA relative error (in Kelvin) of the exact quantile"""
+    exact = np.quantile(data, QUANTILES, method='lower')
+    kelvin = exact + 273.15
+    errors = np.abs(np.array(estimates) - exact)
+    assert np.all(errors <= SKETCH_ALPHA * kelvin + 1e-9), errors.max()
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_sketch_quantiles_within_error_bound(seed):
+    data = values(seed)
+    assert_within_alpha(sketch_quantiles(sketch_counts(data), QUANTILES), data)
+
+
+def test_merged_sketches_equal_sketch_of_union():
+    parts = [values(seed, 5000) for seed in (4, 5, 6)]
+    merged = sum(sketch_counts(part) for part in parts)
+    union = np.concatenate(parts)
+    np.testing.assert_array_equal(merged, sketch_counts(union))
+    assert_within_alpha(sketch_quantiles(merged, QUANTILES), union)
+
+
+def test_quantiles_clamped_to_exact_range():
+    data = np.array([10.0, 10.5, 11.0])
+    low, high = sketch_quantiles(sketch_counts(data), (0.0, 1.0), data.min(), data.max())
+    assert low >= 10.0 and high <= 11.0
+    assert sketch_quantiles(np.zeros_like(sketch_counts(data)), (0.5,)) == [None]
+
+
+def test_histogram_counts_with_overflow_bins():
+    data = np.array([HIST_MIN - 5, HIST_MIN, HIST_MIN + 0.99, 0.0, HIST_MAX - 0.01, HIST_MAX, HIST_MAX + 30])
+    counts = histogram_counts(data)
+    assert len(counts) == HIST_BINS + 2 and counts.sum() == len(data)
+    assert counts[0] == 1 and counts[1] == 2 and counts[-2] == 1 and counts[-1] == 2
+    assert counts[1 - HIST_MIN] == 1   # 0°C
@@ -0,0 +1,39 @@
+import numpy as np
+
+from estimation import URBAN_ADJUSTMENTS, estimate_pixel_value, estimate_pixel_values
+
+STATISTICS = {'mean': 21.4, 'min': 12.0, 'max': 31.5}
+
+
+def sample_points():
+    """Random points over NY plus the cities, zone corners and lake-effect edges"""
+    rng = np.random.default_rng(7)
+    lats = list(rng.uniform(40.4, 45.1, 500))
+    lngs = list(rng.uniform(-79.9, -71.7, 500))
+    for lat, lng, _ in URBAN_ADJUSTMENTS:
+        lats += [lat, lat + 0.1, lat - 0.29]
+        lngs += [lng, lng - 0.1, lng]
+    lats += [43.5, 44.8, 43.0, 42.3, 43.01, 42.01, 45.0]
+    lngs += [-74.7, -73.5, -74.5, -74.0, -77.01, -79.01, -75.5]
+    return np.array(lats), np.array(lngs)
+
+
+def test_vectorized_matches_scalar():
+    lats, lngs = sample_points()
+    expected = [estimate_pixel_value(lat, lng, STATISTICS) for lat, lng in zip(lats, lngs)]
+    np.testing.assert_allclose(estimate_pixel_values(lats, lngs, STATISTICS), expected, rtol=0, atol=1e-9)
+
+
+def test_vectorized_per_point_statistics():
+    lats, lngs = sample_points()
+    months = [{'mean': 5.0}, {'mean': 25.0, 'min': 24.0, 'max': 26.0}, STATISTICS]
+    statistics = [months[i % len(months)] for i in range(len(lats))]
+    expected = [estimate_pixel_value(lat, lng, s) for lat, lng, s in zip(lats, lngs, statistics)]
+    np.testing.assert_allclose(estimate_pixel_values(lats, lngs, statistics), expected, rtol=0, atol=1e-9)
+
+
+def test_estimates_are_clamped_and_stable():
+    lats, lngs = sample_points()
+    values = estimate_pixel_values(lats, lngs, STATISTICS)
+    assert values.min() >= STATISTICS['min'] and values.max() <= STATISTICS['max']
+    np.testing.assert_array_equal(values, estimate_pixel_values(lats, lngs, dict(STATISTICS)))
@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+import pytest
+
+from export import coordinate_blocks, grid_blocks, grid_size, stream_export
+
+BBOX = '-75.0,42.0,-74.0,42.55'
+STEP = 0.05
+
+
+def test_grid_size():
+    assert grid_size(BBOX, STEP) == (11, 20)
+    assert grid_size([-75, 42, -74.99, 42.01], 1) == (1, 1)
+    for step in (0, -0.1, 'nan'):
+        with pytest.raises(ValueError):
+            grid_size(BBOX, step)
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 20, 64, 220, 5000])
+def test_grid_blocks_sizes_and_order(block_size):
+    rows, cols = grid_size(BBOX, STEP)
+    blocks = list(grid_blocks(BBOX, STEP, block_size))
+    sizes = [len(lats) for lats, _ in blocks]
+    assert sum(sizes) == rows * cols
+    assert all(size == block_size for size in sizes[:-1]) and 0 < sizes[-1] <= block_size
+    assert len(blocks) == -(-rows * cols // block_size)
+
+    # Row-major cell centres, north to south, whatever the block boundaries
+    lats = np.concatenate([b[0] for b in blocks])
+    lngs = np.concatenate([b[1] for b in blocks])
+    expected_lats = np.repeat(42.55 - (np.arange(rows) + 0.5) * STEP, cols)
+    expected_lngs = np.tile(-75.0 + (np.arange(cols) + 0.5) * STEP, rows)
+    np.testing.assert_allclose(lats, expected_lats)
+    np.testing.assert_allclose(lngs, expected_lngs)
+
+
+def test_coordinate_blocks():
+    lats, lngs = np.linspace(40, 45, 10), np.linspace(-79, -72, 10)
+    blocks = list(coordinate_blocks(lats, lngs, 4))
+    assert [len(b[0]) for b in blocks] == [4, 4, 2]
+    np.testing.assert_array_equal(np.concatenate([b[1] for b in blocks]), lngs)
+
+
+def test_stream_export_rows():
+    months = ['2024-06', '2024-07']
+
+    def sample_block(lats, lngs, month):
+        temperatures = lats + (1 if month == '2024-07' else 0)
+        temperatures[0] = np.nan
+        return temperatures, np.array(['cube'] * len(lats), dtype=object)
+
+    lines = ''.join(stream_export(grid_blocks('0,0,2,1', 1, 5), months, sample_block)).splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [(r['lat'], r['lng']) for r in rows] == [(0.5, 0.5), (0.5, 1.5)]
+    assert rows[0]['series'][0] == {'month': '2024-06', 'temperature': None, 'source': 'cube'}
+    assert rows[1]['series'][1]['temperature'] == 1.5
+
+    csv = ''.join(stream_export(grid_blocks('0,0,2,1', 1, 5), months, sample_block, 'csv')).splitlines()
+    assert csv[0] == 'lat,lng,month,temperature,source'
+    assert csv[1:] == ['0.5,0.5,2024-06,,cube', '0.5,0.5,2024-07,,cube',
+                       '0.5,1.5,2024-06,0.5,cube', '0.5,1.5,2024-07,1.5,cube']
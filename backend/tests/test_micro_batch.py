@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from micro_batch import PointBatcher, SingleFlight
+
+
+def submit_concurrently(batcher, lookups):
+    """Run batcher.submit for every (month, lat, lng) at once; returns results or exceptions"""
+    barrier = threading.Barrier(len(lookups))
+    results = [None] * len(lookups)
+
+    def run(i, month, lat, lng):
+        barrier.wait()
+        try:
+            results[i] = batcher.submit(month, lat, lng)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, *lookup)) for i, lookup in enumerate(lookups)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_point_batcher_coalesces_one_month():
+    calls = []
+
+    def batch_fn(month, coords):
+        calls.append((month, list(coords)))
+        return [lat + lng for lat, lng in coords]
+
+    batcher = PointBatcher(batch_fn, max_batch_size=8, max_wait=1.0)
+    lookups = [('2024-07', float(i), 100.0) for i in range(8)]
+    results = submit_concurrently(batcher, lookups)
+
+    assert len(calls) == 1 and len(calls[0][1]) == 8
+    assert results == [lat + lng for _, lat, lng in lookups]
+    stats = batcher.stats()
+    assert stats['batches'] == 1 and stats['lookups'] == 8 and stats['max_batch_size_seen'] == 8
+
+
+def test_point_batcher_splits_by_month_and_size():
+    calls = []
+
+    def batch_fn(month, coords):
+        calls.append(month)
+        return [f'{month}:{lat}' for lat, _ in coords]
+
+    batcher = PointBatcher(batch_fn, max_batch_size=3, max_wait=0.2)
+    lookups = [('2024-06' if i % 2 else '2024-07', float(i), 0.0) for i in range(12)]
+    results = submit_concurrently(batcher, lookups)
+
+    assert results == [f'{month}:{lat}' for month, lat, _ in lookups]
+    assert calls.count('2024-06') >= 2 and calls.count('2024-07') >= 2
+    assert batcher.stats()['max_batch_size_seen'] <= 3
+
+
+def test_point_batcher_error_reaches_every_caller():
+    def batch_fn(month, coords):
+        raise RuntimeError('upstream failed')
+
+    batcher = PointBatcher(batch_fn, max_batch_size=4, max_wait=1.0)
+    results = submit_concurrently(batcher, [('2024-07', 1.0, 2.0)] * 4)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.stats()['errors'] == 1
+
+
+def test_point_batcher_follower_timeout():
+    def batch_fn(month, coords):
+        time.sleep(0.3)
+        return [0.0] * len(coords)
+
+    batcher = PointBatcher(batch_fn, max_batch_size=2, max_wait=1.0, timeout=0.05)
+    results = submit_concurrently(batcher, [('2024-07', 1.0, 2.0)] * 2)
+    assert sum(isinstance(r, TimeoutError) for r in results) == 1
+    assert batcher.stats()['timeouts'] == 1
+
+
+def test_single_flight_coalesces_identical_keys():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await release.wait()
+            return {'key': key}
+
+        tasks = [asyncio.ensure_future(flight.do(key, lambda key=key: fetch(key)))
+                 for key in ['a'] * 5 + ['b'] * 2]
+        await asyncio.sleep(0)
+        assert flight.stats() == {'calls': 2, 'coalesced': 5, 'in_flight': 2}
+        release.set()
+        results = await asyncio.gather(*tasks)
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert sorted(calls) == ['a', 'b']
+    assert results == [{'key': 'a'}] * 5 + [{'key': 'b'}] * 2
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_single_flight_error_and_next_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            raise RuntimeError('boom')
+
+        async def succeed():
+            return 42
+
+        results = await asyncio.gather(flight.do('k', fail), flight.do('k', fail), return_exceptions=True)
+        return results, await flight.do('k', succeed), flight.stats()
+
+    results, value, stats = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert value == 42 and stats['calls'] == 2 and stats['in_flight'] == 0
+
+
+def test_single_flight_cancelled_waiter_keeps_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 'done'
+
+        first = asyncio.ensure_future(flight.do('k', fetch))
+        second = asyncio.ensure_future(flight.do('k', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == 'done'
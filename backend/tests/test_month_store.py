@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+from month_store import MonthStore, read_snapshot, write_snapshot
+
+
+def month_payload(month, mean=20.0):
+    return {'month': month, 'statistics': {'mean': mean},
+            'grid_points': [{'lat': 42.0, 'lng': -75.0, 'temp': mean}]}
+
+
+def write_month(data_dir, month, payload=None, mtime_ns=None):
+    path = os.path.join(data_dir, f'{month}.json')
+    with open(path, 'w') as f:
+        json.dump(payload if payload is not None else month_payload(month), f)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_discovers_month_files_only(tmp_path):
+    for month in ['2024-02', '2023-12', '2024-01']:
+        write_month(tmp_path, month)
+    for name in ['2024-13.json', '2024-00.json', 'notes.json', '2024-1.json', '2024-03.json.tmp']:
+        (tmp_path / name).write_text('{}')
+
+    store = MonthStore(str(tmp_path))
+    assert store.keys() == ['2023-12', '2024-01', '2024-02']
+    assert store.latest() == '2024-02'
+    assert store.range('2024-01', None) == ['2024-01', '2024-02']
+    assert store.source == 'json'
+    assert store['2024-01']['month'] == '2024-01'
+
+
+def test_snapshot_and_newer_json(tmp_path):
+    write_snapshot(str(tmp_path), {m: month_payload(m, 10.0) for m in ['2024-01', '2024-02']})
+    snapshot_mtime = os.stat(tmp_path / 'months_snapshot.npz').st_mtime_ns
+    write_month(tmp_path, '2024-01', month_payload('2024-01', 30.0), mtime_ns=snapshot_mtime - 10**9)
+    write_month(tmp_path, '2024-02', month_payload('2024-02', 40.0), mtime_ns=snapshot_mtime + 10**9)
+    write_month(tmp_path, '2024-03', month_payload('2024-03', 50.0), mtime_ns=snapshot_mtime - 10**9)
+
+    store = MonthStore(str(tmp_path))
+    assert store.source == 'snapshot+json'
+    assert store['2024-01']['statistics']['mean'] == 10.0   # older JSON loses to the snapshot
+    assert store['2024-02']['statistics']['mean'] == 40.0   # newer JSON wins
+    assert store['2024-03']['statistics']['mean'] == 50.0   # only in JSON
+    assert store['2024-01']['grid_points'] == month_payload('2024-01', 10.0)['grid_points']
+    assert read_snapshot(str(tmp_path / 'months_snapshot.npz'))['2024-02']['statistics']['mean'] == 10.0
+
+
+def test_lru_keeps_max_months(tmp_path):
+    for month in ['2024-01', '2024-02', '2024-03']:
+        write_month(tmp_path, month)
+    store = MonthStore(str(tmp_path), max_months=2)
+    for month in ['2024-01', '2024-02', '2024-01', '2024-03']:
+        store[month]
+    stats = store.stats()
+    assert stats['cached'] == 2 and stats['evictions'] == 1
+    assert stats['hits'] == 1 and stats['misses'] == 3
+
+
+def test_refresh_adds_changes_and_removes(tmp_path):
+    write_month(tmp_path, '2024-01', month_payload('2024-01', 1.0))
+    write_month(tmp_path, '2024-02', month_payload('2024-02', 2.0))
+    store = MonthStore(str(tmp_path))
+    assert store['2024-01']['statistics']['mean'] == 1.0
+    assert store.refresh() == []
+
+    write_month(tmp_path, '2024-01', month_payload('2024-01', 11.5))
+    write_month(tmp_path, '2024-03', month_payload('2024-03', 3.0))
+    os.remove(tmp_path / '2024-02.json')
+
+    assert store.refresh() == ['2024-01', '2024-02', '2024-03']
+    assert store.keys() == ['2024-01', '2024-03']
+    assert store['2024-01']['statistics']['mean'] == 11.5
+    assert '2024-02' not in store
+    assert store.stats()['reloads'] == 1
+
+
+def test_refresh_keeps_current_data_for_a_broken_file(tmp_path):
+    write_month(tmp_path, '2024-01', month_payload('2024-01', 1.0))
+    store = MonthStore(str(tmp_path))
+    assert store['2024-01']['statistics']['mean'] == 1.0
+
+    (tmp_path / '2024-01.json').write_text('{"month": ')
+    (tmp_path / '2024-02.json').write_text('not json')
+    assert store.refresh() == []
+    assert store.keys() == ['2024-01']
+    assert store['2024-01']['statistics']['mean'] == 1.0
+
+
+def test_unreadable_month_is_dropped_until_fixed(tmp_path):
+    write_month(tmp_path, '2024-01')
+    (tmp_path / '2024-02.json').write_text('{"month": ')
+    store = MonthStore(str(tmp_path))
+    assert store.keys() == ['2024-01', '2024-02']
+
+    with pytest.raises(KeyError):
+        store['2024-02']
+    assert '2024-02' not in store
+    assert store.keys() == ['2024-01'] and store.stats()['dropped'] == 1
+    assert store.get('2024-02') is None
+
+    write_month(tmp_path, '2024-02', month_payload('2024-02', 7.0))
+    assert store.refresh() == ['2024-02']
+    assert store['2024-02']['statistics']['mean'] == 7.0
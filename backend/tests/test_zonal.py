@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from lst_cube import LSTCube, build_cube, save_month_grid
+from zonal import MaskCache, parse_bbox, polygon_rings, rasterize_bbox, rasterize_polygon, zonal_stats
+
+BBOX = {'west': 0.0, 'south': 0.0, 'east': 1.0, 'north': 1.0}
+RESOLUTION = 0.1
+MONTHS = ['2024-01', '2024-02', '2024-03']
+
+
+@pytest.fixture
+def cube(tmp_path):
+    """10 x 10 cube over the unit square, one NaN pixel per month"""
+    for i, month in enumerate(MONTHS):
+        grid = np.arange(100, dtype=np.float32).reshape(10, 10) + 100 * i
+        grid[i, i] = np.nan
+        save_month_grid(str(tmp_path), month, grid)
+    build_cube(str(tmp_path), BBOX, RESOLUTION)
+    return LSTCube(str(tmp_path))
+
+
+def full_mask(cube, zone):
+    mask = np.zeros((cube.rows, cube.cols), dtype=bool)
+    mask[zone.rows, zone.cols] = zone.mask
+    return mask
+
+
+def even_odd(rings, lat, lng):
+    """Reference point-in-polygon test, one point at a time"""
+    inside = False
+    for ring in rings:
+        for (x0, y0), (x1, y1) in zip(ring, np.roll(ring, -1, axis=0)):
+            if (y0 > lat) != (y1 > lat) and lng < x0 + (lat - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+    return inside
+
+
+def centres(cube):
+    lats = BBOX['north'] - (np.arange(cube.rows) + 0.5) * RESOLUTION
+    lngs = BBOX['west'] + (np.arange(cube.cols) + 0.5) * RESOLUTION
+    return lats, lngs
+
+
+def test_bbox_selects_pixel_centres(cube):
+    zone = rasterize_bbox(cube, parse_bbox('0.2,0.2,0.5,0.5'))
+    expected = np.zeros((10, 10), dtype=bool)
+    expected[5:8, 2:5] = True   # centres 0.25..0.45
+    np.testing.assert_array_equal(full_mask(cube, zone), expected)
+    assert zone.pixel_count == 9
+
+
+def test_polygon_matches_reference(cube):
+    rings = polygon_rings({'type': 'Polygon', 'coordinates': [
+        [[0.03, 0.07], [0.97, 0.13], [0.41, 0.93], [0.03, 0.07]]
+    ]})
+    zone = rasterize_polygon(cube, rings)
+    lats, lngs = centres(cube)
+    expected = np.array([[even_odd(rings, lat, lng) for lng in lngs] for lat in lats])
+    np.testing.assert_array_equal(full_mask(cube, zone), expected)
+    assert 0 < zone.pixel_count < 100
+
+
+def test_polygon_hole_and_multipolygon(cube):
+    square = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+    hole = [[0.2, 0.2], [0.5, 0.2], [0.5, 0.5], [0.2, 0.5], [0.2, 0.2]]
+    zone = rasterize_polygon(cube, polygon_rings({'type': 'Polygon', 'coordinates': [square, hole]}))
+    assert zone.pixel_count == 100 - 9
+
+    multi = {'type': 'Feature', 'geometry': {'type': 'MultiPolygon', 'coordinates': [
+        [[[0.0, 0.0], [0.3, 0.0], [0.3, 0.3], [0.0, 0.3]]],   # unclosed ring
+        [[[0.6, 0.6], [1.0, 0.6], [1.0, 1.0], [0.6, 1.0], [0.6, 0.6]]]
+    ]}}
+    assert rasterize_polygon(cube, polygon_rings(multi)).pixel_count == 9 + 16
+
+
+def test_small_zone_falls_back_to_centre_pixel(cube):
+    zone = rasterize_bbox(cube, parse_bbox([0.51, 0.31, 0.54, 0.34]))
+    assert zone.pixel_count == 1
+    assert (zone.row0, zone.col0) == cube.pixel_index(0.325, 0.525)
+
+
+def test_invalid_shapes():
+    with pytest.raises(ValueError):
+        parse_bbox('1,0,0,1')
+    with pytest.raises(ValueError):
+        parse_bbox('0,0,nan,1')
+    with pytest.raises(ValueError):
+        polygon_rings({'type': 'Point', 'coordinates': [0, 0]})
+    with pytest.raises(ValueError):
+        polygon_rings({'type': 'Polygon', 'coordinates': [[[0, 0], [1, 1]]]})
+
+
+def test_zonal_stats_match_numpy(cube):
+    zone = rasterize_bbox(cube, parse_bbox([0.0, 0.0, 0.35, 0.35]))
+    for months in (MONTHS, ['2024-01', '2024-03']):   # contiguous block and per-month reads
+        monthly, overall, missing = zonal_stats(cube, zone, months + ['1999-01'])
+        assert missing == ['1999-01']
+        values = np.stack([np.asarray(cube.cube[cube.month_index[m]])[full_mask(cube, zone)] for m in months])
+        for row, month_values in zip(monthly, values):
+            assert row['mean'] == round(float(np.nanmean(month_values)), 2)
+            assert row['p50'] == round(float(np.nanpercentile(month_values, 50)), 2)
+            assert row['pixel_count'] == int(np.sum(~np.isnan(month_values)))
+        assert overall['max'] == round(float(np.nanmax(values)), 2)
+        assert overall['pixel_count'] == int(np.sum(~np.isnan(values)))
+
+
+def test_mask_cache_reuses_zones(cube):
+    cache = MaskCache(maxsize=1)
+    first = cache.get(cube, bbox='0,0,0.5,0.5')
+    assert cache.get(cube, bbox=[0, 0, 0.5, 0.5]) is first
+    cache.get(cube, geometry='{"type": "Polygon", "coordinates": [[[0,0],[1,0],[1,1],[0,0]]]}')
+    assert len(cache) == 1 and cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
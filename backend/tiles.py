@@ -0,0 +1,390 @@
+"""
+XYZ tile rendering from the local LST cube
+Tiles use the same palette and 0-40°C range as the Earth Engine map layers
+(VIS_PARAMS in Preprocess_as_jasen.py) but never depend on expiring map IDs.
+
+Pre-seed the disk cache:  python tiles.py --zooms 5-10
+"""
+
+import argparse
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from lst_cube import LSTCube
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; scans are then only serialized within a process
+    fcntl = None
+
+TILE_SIZE = 256
+# The cube is 1km data; past z14 a tile pixel is under 10m and adds nothing
+MIN_ZOOM, MAX_ZOOM = 0, 14
+
+# Same as VIS_PARAMS in Preprocess_as_jasen.py
+VIS_PARAMS = {
+    'min': 0,
+    'max': 40,
+    'palette': ['blue', 'limegreen', 'yellow', 'darkorange', 'red']
+}
+
+# Diverging palette for anomalies (°C from the calendar-month normal)
+ANOMALY_VIS_PARAMS = {
+    'min': -10,
+    'max': 10,
+    'palette': ['blue', 'white', 'red']
+}
+
+NAMED_COLORS = {
+    'blue': (0, 0, 255),
+    'limegreen': (50, 205, 50),
+    'yellow': (255, 255, 0),
+    'darkorange': (255, 140, 0),
+    'red': (255, 0, 0),
+    'white': (255, 255, 255),
+}
+
+
+def parse_color(color):
+    if color in NAMED_COLORS:
+        return NAMED_COLORS[color]
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def build_palette_lut(palette, steps=256):
+    """RGB lookup table linearly interpolated between evenly spaced palette stops"""
+    stops = np.array([parse_color(c) for c in palette], dtype=np.float64)
+    positions = np.linspace(0, 1, len(stops))
+    t = np.linspace(0, 1, steps)
+    return np.stack([np.interp(t, positions, stops[:, i]) for i in range(3)], axis=1).round().astype(np.uint8)
+
+
+def encode_png(rgba):
+    """Minimal RGBA PNG encoder (no imaging dependency needed)"""
+    height, width = rgba.shape[:2]
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # filter byte 0 per row
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xFFFFFFFF)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+# One fully transparent tile, served for every tile without data and never cached
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of a Web Mercator tile in degrees"""
+    n = 2 ** z
+    west = x / n * 360 - 180
+    east = (x + 1) / n * 360 - 180
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def tiles_for_bbox(bbox, z):
+    """All (x, y) tiles at zoom z intersecting the bounding box"""
+    n = 2 ** z
+
+    def to_tile(lat, lng):
+        x = int((lng + 180) / 360 * n)
+        lat_rad = math.radians(lat)
+        y = int((1 - math.asinh(math.tan(lat_rad)) / math.pi) / 2 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+    x0, y0 = to_tile(bbox['north'], bbox['west'])
+    x1, y1 = to_tile(bbox['south'], bbox['east'])
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+class TileRenderer:
+    """Colours cube grids into 256x256 PNG tiles"""
+
+    def __init__(self, vis_params=VIS_PARAMS):
+        self.vmin = vis_params['min']
+        self.vmax = vis_params['max']
+        self.lut = build_palette_lut(vis_params['palette'])
+
+    def empty_tile(self):
+        return EMPTY_TILE
+
+    def sample_tile(self, grid, grid_bbox, resolution, z, x, y):
+        """Nearest-neighbour values of a lat/lng grid at each tile pixel (NaN outside)"""
+        n = 2 ** z * TILE_SIZE
+        pixels = np.arange(TILE_SIZE) + 0.5
+        lngs = (x * TILE_SIZE + pixels) / n * 360 - 180
+        lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y * TILE_SIZE + pixels) / n))))
+
+        # Longitude depends only on the column and latitude only on the row
+        rows = np.floor((grid_bbox['north'] - lats) / resolution).astype(np.int64)
+        cols = np.floor((lngs - grid_bbox['west']) / resolution).astype(np.int64)
+        row_ok = (rows >= 0) & (rows < grid.shape[0])
+        col_ok = (cols >= 0) & (cols < grid.shape[1])
+
+        values = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+        if row_ok.any() and col_ok.any():
+            values[np.ix_(row_ok, col_ok)] = grid[np.ix_(rows[row_ok], cols[col_ok])]
+        return values
+
+    def colorize(self, values):
+        """RGBA image for a value array; NaN becomes transparent"""
+        valid = ~np.isnan(values)
+        scaled = (np.nan_to_num(values, nan=self.vmin) - self.vmin) / (self.vmax - self.vmin)
+        index = np.clip(scaled * (len(self.lut) - 1), 0, len(self.lut) - 1).round().astype(np.int64)
+
+        rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+        rgba[..., :3] = self.lut[index]
+        rgba[..., 3] = np.where(valid, 255, 0)
+        return rgba
+
+    def render(self, grid, grid_bbox, resolution, z, x, y):
+        values = self.sample_tile(grid, grid_bbox, resolution, z, x, y)
+        if np.isnan(values).all():
+            return self.empty_tile()
+        return encode_png(self.colorize(values))
+
+
+class TileCache:
+    """Size-bounded on-disk PNG cache shared by every worker process
+
+    The bound is enforced from what is on disk, not per-process bookkeeping: a
+    background scan (one process at a time, under a lock file) measures the
+    cache and removes the least recently used tiles whenever this process's
+    running estimate passes max_bytes (at most every MIN_SCAN_INTERVAL seconds)
+    or scan_interval has elapsed. A hit refreshes a tile's mtime at most once
+    per TOUCH_INTERVAL seconds.
+    """
+
+    TOUCH_INTERVAL = 3600
+    MIN_SCAN_INTERVAL = 5.0
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, scan_interval=300.0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._last_scan = 0.0
+        self.tiles = 0
+        self.total_bytes = 0
+        self.evicted = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.scan()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, *key) + '.png'
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+                modified = os.fstat(f.fileno()).st_mtime
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        if time.time() - modified > self.TOUCH_INTERVAL:
+            try:
+                os.utime(path)  # mtime doubles as last access for eviction
+            except OSError:
+                pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.tiles += 1
+            self.total_bytes += len(data)
+            interval = self.MIN_SCAN_INTERVAL if self.total_bytes > self.max_bytes else self.scan_interval
+            due = time.monotonic() - self._last_scan >= interval
+            if due:
+                self._last_scan = time.monotonic()
+        if due:
+            threading.Thread(target=self.scan, name='tile-cache-scan', daemon=True).start()
+
+    def scan(self):
+        """Measure the cache on disk and, past max_bytes, remove the oldest tiles
+        until it is back under 90% of its budget"""
+        if not self._scan_lock.acquire(blocking=False):
+            return
+        lock_fd = None
+        try:
+            lock_fd = os.open(os.path.join(self.cache_dir, '.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+            if fcntl is not None:
+                try:
+                    fcntl.lockf(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return  # another process is scanning
+            tiles = []
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith('.png'):
+                        path = os.path.join(root, name)
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            continue
+                        tiles.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in tiles)
+
+            evicted = 0
+            if total > self.max_bytes:
+                tiles.sort()
+                target = self.max_bytes * 0.9
+                for _, size, path in tiles:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    evicted += 1
+
+            with self._lock:
+                self.tiles = len(tiles) - evicted
+                self.total_bytes = total
+                self.evicted += evicted
+                self._last_scan = time.monotonic()
+        finally:
+            if lock_fd is not None:
+                os.close(lock_fd)  # also releases the lockf lock
+            self._scan_lock.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tiles': self.tiles,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'evicted': self.evicted,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class TileService:
+    """Serves cached or freshly rendered tiles for a cube"""
+
+    def __init__(self, cube, cache, renderer=None, climatology=None):
+        self.cube = cube
+        self.cache = cache
+        self.renderer = renderer or TileRenderer()
+        self.climatology = climatology
+        self.anomaly_renderer = TileRenderer(ANOMALY_VIS_PARAMS)
+
+    def covers(self, z, x, y):
+        """True if the tile overlaps the cube's bounding box"""
+        west, south, east, north = tile_bounds(z, x, y)
+        bbox = self.cube.bbox
+        return west < bbox['east'] and east > bbox['west'] and south < bbox['north'] and north > bbox['south']
+
+    def tile(self, month, z, x, y):
+        """PNG bytes for a tile, or None if the month is not in the cube; tiles
+        without data are the shared EMPTY_TILE and never reach the disk cache"""
+        if not self.cube.has_month(month) or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return None
+        if not self.covers(z, x, y):
+            return EMPTY_TILE
+
+        key = (self.cube.version, month, str(z), str(x), str(y))
+        data = self.cache.get(key)
+        if data is None:
+            grid = self.cube.cube[self.cube.month_index[month]]
+            data = self.renderer.render(grid, self.cube.bbox, self.cube.resolution, z, x, y)
+            if data is not EMPTY_TILE:
+                self.cache.put(key, data)
+        return data
+
+    def anomaly_tile(self, month, z, x, y):
+        """PNG of month minus its calendar-month normal, or None without cube/climatology data"""
+        clim = self.climatology
+        if clim is None or not self.cube.has_month(month) or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return None
+        if not self.covers(z, x, y):
+            return EMPTY_TILE
+
+        key = ('anomaly', clim.version, self.cube.version, month, str(z), str(x), str(y))
+        data = self.cache.get(key)
+        if data is None:
+            c = int(month[5:7]) - 1
+            render = self.anomaly_renderer
+            values = render.sample_tile(self.cube.cube[self.cube.month_index[month]],
+                                        self.cube.bbox, self.cube.resolution, z, x, y)
+            normal = render.sample_tile(clim.mean[c], clim.bbox, clim.resolution, z, x, y)
+            years = render.sample_tile(clim.count[c], clim.bbox, clim.resolution, z, x, y)
+            anomaly = np.where(years > 0, values - normal, np.nan)
+            if np.isnan(anomaly).all():
+                return EMPTY_TILE
+            data = encode_png(render.colorize(anomaly))
+            self.cache.put(key, data)
+        return data
+
+    def seed(self, months, zooms):
+        """Render every tile over the cube's bounding box for the given zooms"""
+        rendered = 0
+        for month in months:
+            for z in zooms:
+                for x, y in tiles_for_bbox(self.cube.bbox, z):
+                    self.tile(month, z, x, y)
+                    rendered += 1
+        return rendered
+
+
+def create_tile_service(cube, climatology=None):
+    """Tile service from LST_TILE_CACHE_DIR / LST_TILE_CACHE_MB, or None without a cube"""
+    if cube is None:
+        return None
+    cache = TileCache(
+        os.getenv('LST_TILE_CACHE_DIR', 'tile_cache'),
+        max_bytes=int(os.getenv('LST_TILE_CACHE_MB', '256')) * 1024 * 1024
+    )
+    return TileService(cube, cache, climatology=climatology)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-seed the LST tile cache')
+    parser.add_argument('--data-dir', default='precomputed_data')
+    parser.add_argument('--zooms', default='5-10', help='zoom range, e.g. 5-10')
+    parser.add_argument('--months', nargs='*', help='months to seed (default: all in the cube)')
+    args = parser.parse_args()
+
+    cube = LSTCube.open(args.data_dir)
+    if cube is None:
+        print(f"✗ No LST cube in {args.data_dir} - run Preprocess_as_jasen.py first")
+        return
+
+    low, _, high = args.zooms.partition('-')
+    zooms = range(max(int(low), MIN_ZOOM), min(int(high or low), MAX_ZOOM) + 1)
+    service = create_tile_service(cube)
+    rendered = service.seed(args.months or cube.months, zooms)
+    print(f"✓ Seeded {rendered} tiles ({service.cache.stats()['bytes'] / 1e6:.1f} MB on disk)")
+
+
+if __name__ == '__main__':
+    main()
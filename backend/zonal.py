@@ -0,0 +1,243 @@
+"""
+Zonal statistics over the local LST cube
+A bbox or GeoJSON (Multi)Polygon is rasterized once onto the cube grid (pixel
+centres, even-odd rule) and the boolean mask is cached, so region statistics
+for any month range are a single masked read of the memory-mapped cube.
+"""
+
+import hashlib
+import json
+import math
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def parse_bbox(bbox):
+    """[west, south, east, north] from a list, dict or 'w,s,e,n' string"""
+    if isinstance(bbox, str):
+        bbox = bbox.split(',')
+    if isinstance(bbox, dict):
+        bbox = [bbox['west'], bbox['south'], bbox['east'], bbox['north']]
+    west, south, east, north = (float(v) for v in bbox)
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise ValueError('bbox values must be finite numbers')
+    if west >= east or south >= north:
+        raise ValueError('bbox must be west,south,east,north with west < east and south < north')
+    return [west, south, east, north]
+
+
+def parse_geometry(geometry):
+    """GeoJSON object from a dict or a JSON string (as sent in a query string)"""
+    if isinstance(geometry, str):
+        geometry = json.loads(geometry)
+    if isinstance(geometry, dict) and geometry.get('type') == 'Feature':
+        geometry = geometry.get('geometry')
+    if not isinstance(geometry, dict):
+        raise ValueError('geometry must be a GeoJSON Polygon, MultiPolygon or Feature')
+    return geometry
+
+
+def polygon_rings(geometry):
+    """Every ring (exterior and holes) of a GeoJSON Polygon/MultiPolygon/Feature"""
+    geometry = parse_geometry(geometry)
+    kind = geometry.get('type')
+    if kind == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif kind == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        raise ValueError(f'Unsupported geometry type: {kind}')
+
+    rings = []
+    for polygon in polygons:
+        for ring in polygon:
+            ring = np.asarray(ring, dtype=np.float64)
+            if ring.ndim != 2 or ring.shape[0] < 3 or ring.shape[1] < 2:
+                raise ValueError('Polygon rings need at least 3 [lng, lat] positions')
+            rings.append(ring[:, :2])
+    if not rings:
+        raise ValueError('Polygon has no rings')
+    return rings
+
+
+class ZoneMask:
+    """Boolean mask over a window [row0:row1, col0:col1] of the cube grid"""
+
+    def __init__(self, row0, col0, mask):
+        self.row0 = row0
+        self.col0 = col0
+        self.mask = mask
+        self.pixel_count = int(mask.sum())
+
+    @property
+    def rows(self):
+        return slice(self.row0, self.row0 + self.mask.shape[0])
+
+    @property
+    def cols(self):
+        return slice(self.col0, self.col0 + self.mask.shape[1])
+
+
+def _window(cube, west, south, east, north):
+    """Row/col range of the pixels whose centres can fall inside the bounds"""
+    res, bbox = cube.resolution, cube.bbox
+    row0 = max(0, int(math.floor((bbox['north'] - north) / res)))
+    row1 = min(cube.rows, int(math.ceil((bbox['north'] - south) / res)))
+    col0 = max(0, int(math.floor((west - bbox['west']) / res)))
+    col1 = min(cube.cols, int(math.ceil((east - bbox['west']) / res)))
+    return row0, max(row0, row1), col0, max(col0, col1)
+
+
+def _centres(cube, row0, row1, col0, col1):
+    lats = cube.bbox['north'] - (np.arange(row0, row1) + 0.5) * cube.resolution
+    lngs = cube.bbox['west'] + (np.arange(col0, col1) + 0.5) * cube.resolution
+    return lats, lngs
+
+
+def rasterize_bbox(cube, bbox):
+    west, south, east, north = bbox
+    row0, row1, col0, col1 = _window(cube, west, south, east, north)
+    lats, lngs = _centres(cube, row0, row1, col0, col1)
+    mask = ((lats >= south) & (lats <= north))[:, None] & ((lngs >= west) & (lngs <= east))[None, :]
+    return _with_fallback(cube, ZoneMask(row0, col0, mask), (south + north) / 2, (west + east) / 2)
+
+
+def rasterize_polygon(cube, rings):
+    """Even-odd scanline fill: one vectorized crossing test per grid row"""
+    points = np.concatenate(rings)
+    west, south = points.min(axis=0)
+    east, north = points.max(axis=0)
+    row0, row1, col0, col1 = _window(cube, west, south, east, north)
+    lats, lngs = _centres(cube, row0, row1, col0, col1)
+
+    # Every ring edge as (x0, y0) -> (x1, y1), closing rings that aren't closed
+    starts = points
+    ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    x0, y0 = starts[:, 0], starts[:, 1]
+    x1, y1 = ends[:, 0], ends[:, 1]
+    slope = np.divide(x1 - x0, y1 - y0, out=np.zeros_like(x0), where=y1 != y0)
+
+    mask = np.zeros((len(lats), len(lngs)), dtype=bool)
+    for i, lat in enumerate(lats):
+        crossing = (y0 > lat) != (y1 > lat)
+        if not crossing.any():
+            continue
+        xs = np.sort(x0[crossing] + (lat - y0[crossing]) * slope[crossing])
+        mask[i] = np.searchsorted(xs, lngs) % 2 == 1
+
+    return _with_fallback(cube, ZoneMask(row0, col0, mask), (south + north) / 2, (west + east) / 2)
+
+
+def _with_fallback(cube, zone, lat, lng):
+    """Zones smaller than one pixel use the pixel under their centre"""
+    if zone.pixel_count:
+        return zone
+    index = cube.pixel_index(lat, lng)
+    if index is None:
+        return zone
+    return ZoneMask(index[0], index[1], np.ones((1, 1), dtype=bool))
+
+
+class MaskCache:
+    """LRU of rasterized zones keyed by geometry and cube version"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cube, bbox=None, geometry=None):
+        if geometry is not None:
+            geometry = parse_geometry(geometry)
+            shape = json.dumps(geometry, sort_keys=True, separators=(',', ':'))
+        else:
+            shape = json.dumps(parse_bbox(bbox))
+        key = (cube.version, hashlib.sha1(shape.encode()).hexdigest())
+
+        with self._lock:
+            zone = self._masks.get(key)
+            if zone is not None:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return zone
+            self.misses += 1
+
+        if geometry is not None:
+            zone = rasterize_polygon(cube, polygon_rings(geometry))
+        else:
+            zone = rasterize_bbox(cube, parse_bbox(bbox))
+
+        with self._lock:
+            self._masks[key] = zone
+            if len(self._masks) > self.maxsize:
+                self._masks.popitem(last=False)
+        return zone
+
+    def __len__(self):
+        return len(self._masks)
+
+    def stats(self):
+        return {'size': len(self._masks), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def _summary(values, axis=None):
+    """mean/min/max/stdDev/percentiles/pixel_count along axis, NaN-aware"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        stats = {
+            'mean': np.nanmean(values, axis=axis),
+            'min': np.nanmin(values, axis=axis),
+            'max': np.nanmax(values, axis=axis),
+            'stdDev': np.nanstd(values, axis=axis),
+        }
+        percentiles = np.nanpercentile(values, PERCENTILES, axis=axis)
+    for p, value in zip(PERCENTILES, percentiles):
+        stats[f'p{p}'] = value
+    stats['pixel_count'] = np.sum(~np.isnan(values), axis=axis)
+    return stats
+
+
+def _rounded(value):
+    value = float(value)
+    return None if math.isnan(value) else round(value, 2)
+
+
+def zonal_stats(cube, zone, months):
+    """Per-month and whole-range statistics of the cube inside zone
+
+    Returns (monthly, overall, missing) where missing lists requested months
+    the cube doesn't hold.
+    """
+    present = [m for m in months if cube.has_month(m)]
+    missing = [m for m in months if not cube.has_month(m)]
+    if not present or not zone.pixel_count:
+        return [], None, missing
+
+    indices = [cube.month_index[m] for m in present]
+    if indices == list(range(indices[0], indices[-1] + 1)):
+        block = cube.cube[indices[0]:indices[-1] + 1, zone.rows, zone.cols]
+        values = np.asarray(block[:, zone.mask], dtype=np.float64)  # months x pixels
+    else:
+        # Window each month separately; fancy-indexing the months first would copy whole grids
+        values = np.empty((len(indices), zone.pixel_count))
+        for k, i in enumerate(indices):
+            values[k] = cube.cube[i, zone.rows, zone.cols][zone.mask]
+
+    per_month = _summary(values, axis=1)
+    monthly = []
+    for i, month in enumerate(present):
+        row = {'month': month}
+        for name, column in per_month.items():
+            row[name] = int(column[i]) if name == 'pixel_count' else _rounded(column[i])
+        monthly.append(row)
+
+    overall = {name: int(value) if name == 'pixel_count' else _rounded(value)
+               for name, value in _summary(values.ravel()).items()}
+    return monthly, overall, missing
@@ -715,21 +715,6 @@ const [currentMonth, setCurrentMonth] = useState(null);
   };
   // API Functions
  // API Functions
-  const fetchTimeSeries = async (lat, lng) => {
-    try {
-      const response = await fetch(`${API_URL}/api/time-series?lat=${lat}&lng=${lng}`);
-      const data = await response.json();
-      // Remove this line - it's overwriting currentMonth with wrong data
-      // setCurrentMonth(data);
-
-      if (data.time_series) {
-        setTimeSeriesData(data.time_series);
-      }
-    } catch (err) {
-      console.error('Error fetching time series:', err);
-    }
-  };
-
 const loadMonth = async (month) => {
     try {
       setLoading(true);
@@ -748,12 +733,15 @@ const loadMonth = async (month) => {
         setStatistics(data.statistics);
       }
       
-      if (mapInstance && data.tile_url) {
+      // Prefer tiles rendered by the backend; Earth Engine map IDs expire
+      const tileUrl = data.local_tile_url ? `${API_URL}${data.local_tile_url}` : data.tile_url;
+      
+      if (mapInstance && tileUrl) {
         if (currentLayerRef.current) {
           mapInstance.removeLayer(currentLayerRef.current);
         }
         
-        const tempLayer = window.L.tileLayer(data.tile_url, { 
+        const tempLayer = window.L.tileLayer(tileUrl, { 
           opacity: layerOpacity / 100,
           maxZoom: 12,
           minZoom: 5,
@@ -796,14 +784,13 @@ const loadMonth = async (month) => {
     marker.bindPopup('<div style="padding: 12px;">Loading data...</div>').openPopup();
     
     try {
-      // Fetch data
-      const [pointResponse, statsResponse] = await Promise.all([
-        fetch(`${API_URL}/api/point?month=${selectedMonth}&lat=${lat}&lng=${lng}`),
-        fetch(`${API_URL}/api/pixel-stats?lat=${lat}&lng=${lng}`)
-      ]);
+      // Fetch point value, time series and stats in a single request
+      const response = await fetch(`${API_URL}/api/location?month=${selectedMonth}&lat=${lat}&lng=${lng}`);
+      if (!response.ok) throw new Error(`Backend returned ${response.status}`);
       
-      const pointData = await pointResponse.json();
-      const statsData = statsResponse.ok ? await statsResponse.json() : null;
+      const locationData = await response.json();
+      const pointData = locationData.point || {};
+      const statsData = locationData.pixel_stats;
       
       // Update popup with simplified info (removed Annual Avg and Annual Range)
       const temp = pointData.temperature;
@@ -838,8 +825,7 @@ const loadMonth = async (month) => {
       
       setSelectedPoint({ lat, lng, temperature: temp });
       if (statsData) setPixelStats(statsData);
-      
-      fetchTimeSeries(lat, lng);
+      if (locationData.time_series) setTimeSeriesData(locationData.time_series);
       
     } catch (err) {
       console.error('Error:', err);